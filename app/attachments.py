@@ -0,0 +1,351 @@
+import asyncio
+import base64
+import hashlib
+import ipaddress
+import mimetypes
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Union
+from urllib.parse import unquote_to_bytes, urljoin, urlsplit, urlunsplit
+
+from . import http_client
+
+TEXT_EXTENSIONS = ('.txt', '.md', '.csv', '.json')
+
+# Base64 is decoded in slices of the input; characters outside the alphabet
+# (MIME line breaks) are dropped and any partial 4-character group carries over
+_DECODE_CHUNK = 64 * 1024
+_NOT_BASE64 = re.compile(r"[^A-Za-z0-9+/=]")
+_MAX_REDIRECTS = 5
+# Downloads are written in batches of about this many bytes, off the event loop
+_WRITE_BATCH = 1024 * 1024
+# Partial downloads older than this were left by a crash
+_STALE_PART_SECONDS = 3600
+
+
+class AttachmentError(Exception):
+    """An attachment could not be ingested"""
+
+
+class AttachmentHandle:
+    """A spooled attachment on disk, identified by the SHA-256 of its content"""
+
+    def __init__(self, name: str, path: str, sha256: str, size: int, media_type: str, source: str):
+        self.name = name
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+        self.media_type = media_type
+        self.source = source
+
+    @property
+    def is_text(self) -> bool:
+        return self.name.endswith(TEXT_EXTENSIONS) or self.media_type.startswith("text/") \
+            or self.media_type in ("application/json", "application/csv")
+
+    def read_text(self, limit: Optional[int] = None) -> str:
+        """Read (at most limit bytes of) the content as UTF-8 text"""
+        with open(self.path, "rb") as f:
+            data = f.read() if limit is None else f.read(limit)
+        return data.decode("utf-8", errors="replace")
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "sha256": self.sha256, "size": self.size,
+                "media_type": self.media_type, "source": self.source}
+
+
+class AttachmentStore:
+    """
+    Content-addressed spool for request attachments. Data URIs are decoded
+    in slices straight to disk and http(s) URLs are streamed concurrently,
+    so memory per attachment stays bounded by the slice size. Identical
+    content is stored once and shared across requests.
+
+    Remote URLs may only resolve to public addresses, unless their host is
+    in `allowed_hosts`, and are fetched from the address that was checked.
+    Handles returned by ingest() are pinned, so the
+    files can't be evicted until release() is called with them.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 20 * 1024 * 1024,
+                 max_total_bytes: int = 512 * 1024 * 1024, fetch_concurrency: int = 8,
+                 fetch_timeout: float = 30.0, allowed_hosts: List[str] = ()):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_total_bytes = max_total_bytes
+        self.fetch_timeout = fetch_timeout
+        self.allowed_hosts = {host.lower() for host in allowed_hosts}
+        self.counters = {"ingested": 0, "deduplicated": 0, "failed": 0, "evicted": 0}
+        self._fetch_slots = asyncio.Semaphore(max(1, fetch_concurrency))
+        self._lock = threading.Lock()
+        self._pins: Dict[str, int] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._remove_stale_parts()
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    async def ingest(self, attachments: List[Dict]) -> List[AttachmentHandle]:
+        """
+        Spool every attachment concurrently; failed ones are skipped with a
+        warning. The caller must release() the returned handles when done.
+        """
+        tasks = [asyncio.ensure_future(self._ingest_one(att["name"], att["url"])) for att in attachments]
+        try:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        except asyncio.CancelledError:
+            for task in tasks:
+                if task.done() and not task.cancelled() and task.exception() is None:
+                    self.release([task.result()])
+            raise
+        handles = []
+        for att, result in zip(attachments, results):
+            if isinstance(result, Exception):
+                self.counters["failed"] += 1
+                print(f"⚠️ Failed to process attachment {att['name']}: {result}")
+            else:
+                handles.append(result)
+        return handles
+
+    def release(self, handles: List[AttachmentHandle]):
+        """Unpin handles returned by ingest(); their files may be evicted again"""
+        with self._lock:
+            for handle in handles:
+                self._unpin(handle.path)
+
+    def _unpin(self, path: str):
+        count = self._pins.get(path, 0) - 1
+        if count > 0:
+            self._pins[path] = count
+        else:
+            self._pins.pop(path, None)
+
+    def reopen(self, entries: List[Dict]) -> Optional[List[AttachmentHandle]]:
+        """
+        Pinned handles for attachments spooled earlier, from their to_dict()
+        form; None if any of them has been evicted since.
+        """
+        handles = []
+        with self._lock:
+            for entry in entries:
+                path = self._path(entry["sha256"])
+                if not os.path.exists(path):
+                    for handle in handles:
+                        self._unpin(handle.path)
+                    return None
+                self._pins[path] = self._pins.get(path, 0) + 1
+                os.utime(path, None)
+                handles.append(AttachmentHandle(entry["name"], path, entry["sha256"], entry["size"],
+                                                entry["media_type"], entry["source"]))
+        return handles
+
+    def stats(self) -> Dict:
+        return {**self.counters, "spool_bytes": self._total_bytes, "pinned": len(self._pins)}
+
+    async def _ingest_one(self, name: str, url: str) -> AttachmentHandle:
+        if url.startswith("data:"):
+            work = asyncio.ensure_future(asyncio.to_thread(self._from_data_uri, name, url))
+            try:
+                return await asyncio.shield(work)
+            except asyncio.CancelledError:
+                # The thread finishes anyway; unpin what it spools
+                work.add_done_callback(
+                    lambda t: t.cancelled() or t.exception() is not None or self.release([t.result()]))
+                raise
+        if url.startswith(("http://", "https://")):
+            async with self._fetch_slots:
+                return await self._from_remote(name, url)
+        raise AttachmentError(f"Unsupported attachment URL scheme: {url[:30]}")
+
+    def _from_data_uri(self, name: str, url: str) -> AttachmentHandle:
+        comma = url.find(",")
+        if comma == -1:
+            raise AttachmentError("Malformed data URI")
+        header = url[5:comma]
+        media_type = header.split(";")[0] or self._guess_type(name)
+        is_base64 = header.endswith(";base64")
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if is_base64:
+                    pending = ""
+                    for start in range(comma + 1, len(url), _DECODE_CHUNK):
+                        text = pending + _NOT_BASE64.sub("", url[start:start + _DECODE_CHUNK])
+                        whole = len(text) - len(text) % 4
+                        pending = text[whole:]
+                        data = base64.b64decode(text[:whole])
+                        size += len(data)
+                        if size > self.max_bytes:
+                            raise AttachmentError(f"Attachment exceeds {self.max_bytes} bytes")
+                        digest.update(data)
+                        f.write(data)
+                    if pending:
+                        # Unpadded tail: invalid, as it is for a whole-string decode
+                        base64.b64decode(pending)
+                else:
+                    data = unquote_to_bytes(url[comma + 1:])
+                    size = len(data)
+                    if size > self.max_bytes:
+                        raise AttachmentError(f"Attachment exceeds {self.max_bytes} bytes")
+                    digest.update(data)
+                    f.write(data)
+            return self._commit(name, tmp_path, digest.hexdigest(), size, media_type, "data")
+        except BaseException:
+            self._discard(tmp_path)
+            raise
+
+    async def _check_host(self, url: str) -> Optional[Union[ipaddress.IPv4Address, ipaddress.IPv6Address]]:
+        """
+        Refuse URLs whose host resolves to a loopback, private, link-local or
+        reserved address; returns the address to connect to (None for an
+        allowed host, which is fetched by name)
+        """
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        if not host:
+            raise AttachmentError(f"No host in attachment URL {url[:60]}")
+        if host in self.allowed_hosts:
+            return None
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                host, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise AttachmentError(f"Cannot resolve {host}: {e}")
+        addresses = [ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos]
+        for address in addresses:
+            if not address.is_global or address.is_multicast:
+                raise AttachmentError(f"Attachment host {host} resolves to non-public address {address}")
+        if not addresses:
+            raise AttachmentError(f"Cannot resolve {host}")
+        return addresses[0]
+
+    def _request(self, url: str, address):
+        """
+        A GET of url sent to the checked address, so a second DNS answer
+        (rebinding) can't redirect the connection; Host and TLS SNI keep the name
+        """
+        client = http_client.get_client()
+        if address is None:
+            return client.build_request("GET", url, timeout=self.fetch_timeout)
+        parts = urlsplit(url)
+        host = f"[{address}]" if address.version == 6 else str(address)
+        port = f":{parts.port}" if parts.port else ""
+        return client.build_request(
+            "GET", urlunsplit(parts._replace(netloc=host + port)), timeout=self.fetch_timeout,
+            headers={"Host": parts.hostname + port}, extensions={"sni_hostname": parts.hostname})
+
+    async def _from_remote(self, name: str, url: str) -> AttachmentHandle:
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = await asyncio.to_thread(tempfile.mkstemp, dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                # Redirects are followed by hand so every hop's host is checked
+                for _ in range(_MAX_REDIRECTS + 1):
+                    address = await self._check_host(url)
+                    response = await http_client.get_client().send(self._request(url, address), stream=True)
+                    if not response.is_redirect:
+                        break
+                    await response.aclose()
+                    url = urljoin(url, response.headers["Location"])
+                else:
+                    raise AttachmentError(f"Too many redirects fetching {name}")
+                try:
+                    if response.status_code != 200:
+                        raise AttachmentError(f"GET {url} returned {response.status_code}")
+                    media_type = response.headers.get("Content-Type", "").split(";")[0] \
+                        or self._guess_type(name)
+                    batch = []
+                    batched = 0
+                    async for data in response.aiter_bytes():
+                        size += len(data)
+                        if size > self.max_bytes:
+                            raise AttachmentError(f"Attachment exceeds {self.max_bytes} bytes")
+                        digest.update(data)
+                        batch.append(data)
+                        batched += len(data)
+                        if batched >= _WRITE_BATCH:
+                            await asyncio.to_thread(f.writelines, batch)
+                            batch, batched = [], 0
+                    await asyncio.to_thread(f.writelines, batch)
+                finally:
+                    await response.aclose()
+            return await asyncio.to_thread(
+                self._commit, name, tmp_path, digest.hexdigest(), size, media_type, "remote")
+        except BaseException:
+            self._discard(tmp_path)
+            raise
+
+    def _commit(self, name: str, tmp_path: str, sha256: str, size: int,
+                media_type: str, source: str) -> AttachmentHandle:
+        """Move a finished download to its content address (reusing an existing copy) and pin it"""
+        path = self._path(sha256)
+        with self._lock:
+            self._pins[path] = self._pins.get(path, 0) + 1
+            if os.path.exists(path):
+                self._discard(tmp_path)
+                os.utime(path, None)
+                self.counters["deduplicated"] += 1
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+                self._total_bytes += size
+                self.counters["ingested"] += 1
+                self._evict()
+        return AttachmentHandle(name, path, sha256, size, media_type, source)
+
+    def _path(self, sha256: str) -> str:
+        return os.path.join(self.directory, sha256[:2], sha256)
+
+    def _evict(self):
+        """Drop least recently used spool files beyond the total size cap, except pinned ones"""
+        if self._total_bytes <= self.max_total_bytes:
+            return
+        for path, size, _ in sorted(self._entries(), key=lambda e: e[2]):
+            if self._total_bytes <= self.max_total_bytes:
+                break
+            if path in self._pins:
+                continue
+            self._discard(path)
+            self._total_bytes -= size
+            self.counters["evicted"] += 1
+
+    def _remove_stale_parts(self):
+        """Delete partial downloads a crashed process left behind"""
+        cutoff = time.time() - _STALE_PART_SECONDS
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    if name.endswith(".part") and os.stat(path).st_mtime < cutoff:
+                        os.remove(path)
+                except OSError:
+                    continue
+
+    def _entries(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".part"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    @staticmethod
+    def _discard(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _guess_type(name: str) -> str:
+        return mimetypes.guess_type(name)[0] or "application/octet-stream"
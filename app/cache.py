@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class GenerationCache:
+    """
+    Two-tier cache of generated file maps: an in-memory LRU in front of a
+    size-bounded on-disk store that survives restarts. Disk reads and
+    writes run in worker threads; disk usage is tracked in memory.
+    """
+
+    def __init__(self, directory: str, memory_entries: int = 128,
+                 disk_max_bytes: int = 256 * 1024 * 1024, ttl: float = 7 * 24 * 3600):
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                          "stores": 0, "evictions": 0, "expired": 0}
+        os.makedirs(directory, exist_ok=True)
+        # Disk tier index, least recently used first: path -> size
+        self._disk: "OrderedDict[str, int]" = OrderedDict(
+            (path, size) for path, size, _ in sorted(self._disk_entries(), key=lambda e: e[2]))
+        self._disk_bytes = sum(self._disk.values())
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, brief: str,
+                 attachments: Iterable[Tuple[str, bytes]]) -> str:
+        """Hash everything that determines the generation into a cache key"""
+        digest = hashlib.sha256()
+        parts = [model.encode(), system_prompt.encode(), brief.encode()]
+        for name, data in attachments:
+            parts.append(name.encode())
+            parts.append(data)
+        for part in parts:
+            # Length-prefix each part so adjacent fields can't collide
+            digest.update(len(part).to_bytes(8, "big"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, str]]:
+        """Look up the memory tier, then the disk tier off the event loop"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, files = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return dict(files)
+                del self._memory[key]
+                self._counters["expired"] += 1
+        return await asyncio.to_thread(self._get_disk, key, now)
+
+    def _get_disk(self, key: str, now: float) -> Optional[Dict[str, str]]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        with self._lock:
+            if now - record["created_at"] > self.ttl:
+                self._remove_file(path)
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None
+            # Touch the file so disk eviction is least-recently-used, across restarts too
+            os.utime(path, None)
+            if path in self._disk:
+                self._disk.move_to_end(path)
+            self._remember(key, record["created_at"], record["files"])
+            self._counters["disk_hits"] += 1
+        return dict(record["files"])
+
+    async def set(self, key: str, files: Dict[str, str]):
+        """Store in memory now and on disk off the event loop"""
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, dict(files))
+        await asyncio.to_thread(self._set_disk, key, created_at, files)
+
+    def _set_disk(self, key: str, created_at: float, files: Dict[str, str]):
+        data = json.dumps({"created_at": created_at, "files": files}).encode("utf-8")
+        if len(data) > self.disk_max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            self._remove_file(path)
+            os.replace(tmp_path, path)
+            self._disk[path] = len(data)
+            self._disk_bytes += len(data)
+            self._counters["stores"] += 1
+            self._evict_disk()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _remember(self, key: str, created_at: float, files: Dict[str, str]):
+        self._memory[key] = (created_at, files)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """Drop least recently used files until the disk tier fits, without walking the directory"""
+        while self._disk_bytes > self.disk_max_bytes and self._disk:
+            self._remove_file(next(iter(self._disk)))
+            self._counters["evictions"] += 1
+
+    def _disk_entries(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _remove_file(self, path: str):
+        size = self._disk.pop(path, None)
+        try:
+            if size is None:
+                size = os.path.getsize(path)
+            os.remove(path)
+            self._disk_bytes -= size
+        except OSError:
+            pass
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
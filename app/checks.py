@@ -0,0 +1,437 @@
+import asyncio
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+REQUIRED_FILES = ("index.html", "README.md", "LICENSE")
+
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+              "param", "source", "track", "wbr"}
+_JS_TYPES = {"", "text/javascript", "application/javascript", "module"}
+
+_COMPOUND = re.compile(
+    r"(?P<tag>\*|[a-zA-Z][\w-]*)?(?P<rest>(?:#[\w-]+|\.[\w-]+|\[[^\]]+\]|::?[\w-]+(?:\([^)]*\))?)*)"
+)
+_PART = re.compile(r"#([\w-]+)|\.([\w-]+)|\[\s*([\w:-]+)\s*(?:([~|^$*]?=)\s*(['\"]?)(.*?)\5)?\s*\]|::?[\w-]+(?:\([^)]*\))?")
+
+_QUERY = re.compile(r"querySelector(?:All)?\(\s*(['\"`])(.+?)\1\s*\)")
+_BY_ID = re.compile(r"getElementById\(\s*(['\"`])(.+?)\1\s*\)")
+_INCLUDES = re.compile(r"(?:textContent|innerText|innerHTML|body\.text)\S*?\.includes\(\s*(['\"`])(.+?)\1\s*\)")
+_BACKTICKED = re.compile(r"`([^`]+)`")
+_ID_TOKEN = re.compile(r"(?<![\w&/])#([A-Za-z][\w-]*)")
+_QUOTED = re.compile(r"\"([^\"]{2,80})\"|(?<!\w)'([^']{2,80})'(?!\w)")
+_REGEX = re.compile(r"(?:regex:|matches)\s*/(.+)/([imsx]*)\s*$", re.IGNORECASE)
+_REPO_FILE = re.compile(r"\b(?:repo|repository)\b.*?\b(?:has|contains|includes)\b.*?([\w./-]+\.[A-Za-z0-9]{1,8})\b",
+                        re.IGNORECASE)
+# A brief's regex runs on Python's backtracking engine; these bound how much
+# work one pattern can ask for (the runner's timeout stops the rest)
+_MAX_PATTERN = 200
+_MAX_REGEX_INPUT = 200_000
+
+
+class DocumentIndex(HTMLParser):
+    """
+    index.html parsed once into a flat element list (tag, id, classes,
+    attributes, parent, text span) plus visible text and inline scripts,
+    so every check is a lookup rather than another parse.
+    """
+
+    def __init__(self, html: str):
+        super().__init__(convert_charrefs=True)
+        self.elements: List[Dict] = []
+        self.scripts: List[Dict] = []
+        self._texts: List[str] = []
+        self._stack: List[int] = []
+        self._raw: Optional[Dict] = None
+        self.feed(html)
+        self.close()
+        for index in self._stack:
+            self.elements[index]["end"] = len(self._texts)
+        self.text = " ".join(" ".join(self._texts).split())
+        self.title = next((self.element_text(i) for i, e in enumerate(self.elements) if e["tag"] == "title"), "")
+
+    def handle_starttag(self, tag, attrs):
+        attributes = {name: value or "" for name, value in attrs}
+        element = {
+            "tag": tag,
+            "id": attributes.get("id"),
+            "classes": set(attributes.get("class", "").split()),
+            "attrs": attributes,
+            "parent": self._stack[-1] if self._stack else None,
+            "start": len(self._texts),
+            "end": None,
+        }
+        self.elements.append(element)
+        if tag in ("script", "style"):
+            self._raw = {"tag": tag, "type": attributes.get("type", "").lower(),
+                         "src": attributes.get("src"), "content": []}
+        if tag not in _VOID_TAGS:
+            self._stack.append(len(self.elements) - 1)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self._raw is not None and self._raw["tag"] == tag:
+            if tag == "script":
+                self.scripts.append({**self._raw, "content": "".join(self._raw["content"])})
+            self._raw = None
+        # Close up to the matching element; unmatched end tags are ignored
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self.elements[self._stack[depth]]["tag"] == tag:
+                for index in self._stack[depth:]:
+                    self.elements[index]["end"] = len(self._texts)
+                del self._stack[depth:]
+                return
+
+    def handle_data(self, data):
+        if self._raw is not None:
+            self._raw["content"].append(data)
+        else:
+            self._texts.append(data)
+
+    def element_text(self, index: int) -> str:
+        element = self.elements[index]
+        end = element["end"] if element["end"] is not None else len(self._texts)
+        return " ".join(" ".join(self._texts[element["start"]:end]).split())
+
+    def select(self, selector: str) -> Optional[List[int]]:
+        """
+        Indices of elements matching a CSS selector: tag, #id, .class and
+        [attr], [attr=v], [attr^=v], [attr$=v], [attr*=v], [attr~=v],
+        joined by descendant or child combinators, comma-separated groups.
+        Pseudo-classes are ignored. None if the selector is beyond that.
+        """
+        matches = set()
+        for group in selector.split(","):
+            steps = self._parse_selector(group.strip())
+            if steps is None:
+                return None
+            for index in range(len(self.elements)):
+                if self._matches(index, steps, len(steps) - 1):
+                    matches.add(index)
+        return sorted(matches)
+
+    @staticmethod
+    def _parse_selector(selector: str):
+        tokens = re.findall(r">|[^\s>]+", selector)
+        steps, combinator = [], " "
+        for token in tokens:
+            if token == ">":
+                combinator = ">"
+                continue
+            match = _COMPOUND.fullmatch(token)
+            if match is None or not token:
+                return None
+            parts = []
+            for part in _PART.finditer(match.group("rest")):
+                if part.group(1):
+                    parts.append(("id", part.group(1)))
+                elif part.group(2):
+                    parts.append(("class", part.group(2)))
+                elif part.group(3):
+                    parts.append(("attr", part.group(3).lower(), part.group(4), part.group(6)))
+            steps.append((combinator, (match.group("tag") or "*").lower(), parts))
+            combinator = " "
+        return steps or None
+
+    def _matches(self, index: int, steps, position: int) -> bool:
+        combinator, tag, parts = steps[position]
+        if not self._compound(self.elements[index], tag, parts):
+            return False
+        if position == 0:
+            return True
+        parent = self.elements[index]["parent"]
+        if combinator == ">":
+            return parent is not None and self._matches(parent, steps, position - 1)
+        while parent is not None:
+            if self._matches(parent, steps, position - 1):
+                return True
+            parent = self.elements[parent]["parent"]
+        return False
+
+    @staticmethod
+    def _compound(element: Dict, tag: str, parts) -> bool:
+        if tag != "*" and element["tag"] != tag:
+            return False
+        for part in parts:
+            if part[0] == "id" and element["id"] != part[1]:
+                return False
+            if part[0] == "class" and part[1] not in element["classes"]:
+                return False
+            if part[0] == "attr":
+                _, name, op, value = part
+                actual = element["attrs"].get(name)
+                if actual is None:
+                    return False
+                if op == "=" and actual != value:
+                    return False
+                if op == "^=" and not actual.startswith(value):
+                    return False
+                if op == "$=" and not actual.endswith(value):
+                    return False
+                if op == "*=" and value not in actual:
+                    return False
+                if op == "~=" and value not in actual.split():
+                    return False
+                if op == "|=" and actual != value and not actual.startswith(value + "-"):
+                    return False
+        return True
+
+
+def js_syntax_error(source: str) -> Optional[str]:
+    """
+    Cheap sanity scan of inline JavaScript: unbalanced brackets and
+    unterminated strings, template literals or comments (the usual marks of
+    truncated or spliced output). Not a parser; None when nothing is wrong.
+    """
+    stack = []
+    i, n = 0, len(source)
+    last = ""  # last significant character, to tell a regex literal from division
+    while i < n:
+        ch = source[i]
+        if ch in " \t\r\n":
+            i += 1
+            continue
+        if source.startswith("//", i):
+            end = source.find("\n", i)
+            i = n if end == -1 else end
+            continue
+        if source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            if end == -1:
+                return "unterminated block comment"
+            i = end + 2
+            continue
+        if ch in "'\"":
+            j = i + 1
+            while j < n and source[j] != ch and source[j] != "\n":
+                j += 2 if source[j] == "\\" else 1
+            if j >= n or source[j] != ch:
+                return f"unterminated string at offset {i}"
+            i, last = j + 1, ch
+            continue
+        if ch == "`" or (ch == "}" and stack and stack[-1] == "${"):
+            if ch == "}":
+                stack.pop()
+            j = i + 1
+            while j < n and source[j] != "`" and not source.startswith("${", j):
+                j += 2 if source[j] == "\\" else 1
+            if j >= n:
+                return f"unterminated template literal at offset {i}"
+            if source[j] == "`":
+                i, last = j + 1, "`"
+            else:
+                stack.append("${")
+                i, last = j + 2, "{"
+            continue
+        if ch == "/" and (not last or last in "(,=:[!&|?{};+-*%<>~^"):
+            j = i + 1
+            in_class = False
+            while j < n and source[j] != "\n" and (in_class or source[j] != "/"):
+                if source[j] == "\\":
+                    j += 1
+                elif source[j] == "[":
+                    in_class = True
+                elif source[j] == "]":
+                    in_class = False
+                j += 1
+            if j >= n or source[j] != "/":
+                return f"unterminated regular expression at offset {i}"
+            i, last = j + 1, "/"
+            continue
+        if ch in "([{":
+            stack.append(ch)
+        elif ch in ")]}":
+            opener = {")": "(", "]": "[", "}": "{"}[ch]
+            if not stack or stack[-1] != opener:
+                return f"unexpected '{ch}' at offset {i}"
+            stack.pop()
+        last = ch if not (ch.isalnum() or ch in "_$") else "a"
+        i += 1
+    if stack:
+        return f"unclosed '{stack[-1]}'"
+    return None
+
+
+def _result(check: str, status: str, detail: str = "") -> Dict:
+    return {"check": check, "status": status, "detail": detail}
+
+
+def _builtin_checks(files: Dict[str, str], document: Optional[DocumentIndex]) -> List[Dict]:
+    results = []
+    for name in REQUIRED_FILES:
+        if not (files.get(name) or "").strip():
+            results.append(_result(f"{name} exists", "failed", f"{name} is missing or empty"))
+    if document is not None:
+        for number, script in enumerate(document.scripts, 1):
+            if script["src"] or script["type"] not in _JS_TYPES:
+                continue
+            error = js_syntax_error(script["content"])
+            if error:
+                results.append(_result(f"inline script {number} is well-formed", "failed", error))
+    return results
+
+
+def evaluate_check(check: str, files: Dict[str, str], document: Optional[DocumentIndex]) -> Dict:
+    """
+    Evaluate one free-text or `js:` check statically. What can't be judged
+    without a browser (timing, network, behaviour) is reported as skipped
+    and left to the evaluator.
+    """
+    text = check.strip()
+    html = files.get("index.html", "")
+    selectors, phrases = [], []
+
+    if text.lower().startswith("js:"):
+        expression = text[3:]
+        selectors += [m.group(2) for m in _QUERY.finditer(expression)]
+        selectors += ["#" + m.group(2) for m in _BY_ID.finditer(expression)]
+        phrases += [m.group(2) for m in _INCLUDES.finditer(expression)]
+    else:
+        lowered = text.lower()
+        regex = _REGEX.search(text)
+        if regex:
+            flags = re.IGNORECASE if "i" in regex.group(2) else 0
+            if len(regex.group(1)) > _MAX_PATTERN:
+                return _result(check, "skipped", f"regex longer than {_MAX_PATTERN} characters")
+            try:
+                found = re.search(regex.group(1), html[:_MAX_REGEX_INPUT], flags)
+            except re.error as e:
+                return _result(check, "skipped", f"invalid regex: {e}")
+            return _result(check, "passed" if found else "failed",
+                           "" if found else f"/{regex.group(1)}/ not found in index.html")
+        if "mit license" in lowered or "mit licence" in lowered:
+            license_text = files.get("LICENSE", "")
+            ok = "MIT" in license_text or "Permission is hereby granted" in license_text
+            return _result(check, "passed" if ok else "failed", "" if ok else "LICENSE is not the MIT license")
+        if "readme" in lowered and "professional" in lowered:
+            readme = files.get("README.md", "")
+            ok = len(readme) >= 200 and readme.lstrip().startswith("#")
+            return _result(check, "passed" if ok else "failed",
+                           "" if ok else "README.md needs a title and sections describing the app")
+        repo_file = _REPO_FILE.search(text)
+        if repo_file:
+            name = repo_file.group(1)
+            ok = name in files
+            return _result(check, "passed" if ok else "failed", "" if ok else f"{name} is not in the repo")
+        for snippet in _BACKTICKED.findall(text):
+            snippet = snippet.strip()
+            if snippet.startswith("<") and snippet.endswith(">"):
+                tag = re.match(r"<([a-zA-Z][\w-]*)([^>]*)>", snippet)
+                if tag:
+                    id_attr = re.search(r"id=['\"]([\w-]+)['\"]", tag.group(2))
+                    selectors.append(f"{tag.group(1)}#{id_attr.group(1)}" if id_attr else tag.group(1))
+            elif re.fullmatch(r"[#.\[\w][\w\s#.\-\[\]=\"'>*^$~|:()]*", snippet) and re.search(r"[#.\[]", snippet):
+                selectors.append(snippet)
+            else:
+                phrases.append(snippet)
+        selectors += ["#" + token for token in _ID_TOKEN.findall(text) if "#" + token not in selectors]
+        phrases += [a or b for a, b in _QUOTED.findall(text)]
+
+    if not selectors and not phrases:
+        return _result(check, "skipped", "not statically checkable")
+    if document is None:
+        return _result(check, "failed", "index.html is missing")
+
+    problems = []
+    unsupported = []
+    for selector in selectors:
+        found = document.select(selector)
+        if found is None:
+            unsupported.append(selector)
+        elif not found:
+            problems.append(f"no element matches {selector}")
+    haystack = (document.text + " " + html).lower()
+    for phrase in phrases:
+        if phrase.lower() not in haystack:
+            problems.append(f"text \"{phrase}\" not found")
+    if problems:
+        return _result(check, "failed", "; ".join(problems))
+    if unsupported and len(unsupported) == len(selectors) and not phrases:
+        return _result(check, "skipped", f"unsupported selector {unsupported[0]}")
+    return _result(check, "passed")
+
+
+def evaluate(files: Dict[str, str], checks: List[str]) -> Dict:
+    """Run the built-in and requested checks against the generated files (runs in a worker process)"""
+    start = time.perf_counter()
+    html = files.get("index.html")
+    document = DocumentIndex(html) if html else None
+    results = _builtin_checks(files, document)
+    results += [evaluate_check(check, files, document) for check in checks]
+    return {
+        "passed": sum(1 for r in results if r["status"] == "passed"),
+        "failed": sum(1 for r in results if r["status"] == "failed"),
+        "skipped": sum(1 for r in results if r["status"] == "skipped"),
+        "results": results,
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+def failure_feedback(report: Dict) -> str:
+    """Failed checks as a list for the regeneration prompt"""
+    return "\n".join(f"- {r['check']}: {r['detail']}" for r in report["results"] if r["status"] == "failed")
+
+
+class CheckRunner:
+    """
+    Evaluates checks on a process pool, keeping HTML parsing and regex
+    work off the event loop. Workers are spawned by warm_up() or on first use.
+    A run that times out takes its pool down with it: the workers are
+    terminated, since one may still be stuck on a runaway regex, and the
+    next run starts a fresh pool.
+    """
+
+    def __init__(self, workers: int = 2, timeout: float = 10.0):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that runs an event loop and threads isn't safe
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def warm_up(self):
+        """Start the workers ahead of the first deploy (spawning takes a fraction of a second each)"""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._get_pool(), evaluate, {}, [])
+                               for _ in range(self.workers)))
+
+    async def run(self, files: Dict[str, str], checks: List[str]) -> Dict:
+        pool = self._get_pool()
+        future = asyncio.get_running_loop().run_in_executor(pool, evaluate, files, list(checks))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self._terminate(pool)
+            raise
+        except BrokenProcessPool:
+            if pool is self._pool:
+                raise
+            # Another run's timeout terminated the pool under this one; try again on the new pool
+            future = asyncio.get_running_loop().run_in_executor(self._get_pool(), evaluate, files, list(checks))
+            return await asyncio.wait_for(future, self.timeout)
+
+    def _terminate(self, pool: ProcessPoolExecutor):
+        if pool is self._pool:
+            self._pool = None
+        # shutdown() alone lets a busy worker run on; only the process can be stopped
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        print(f"⚠️ Terminated {len(processes)} check workers after a timeout")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -9,17 +10,153 @@ load_dotenv(env_path)
 # AIPipe Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 AIPIPE_EMAIL = os.getenv("AIPIPE_EMAIL")
+AIPIPE_TIMEOUT = float(os.getenv("AIPIPE_TIMEOUT", "120"))
+AIPIPE_STREAM = os.getenv("AIPIPE_STREAM", "True").lower() in ("true", "1", "t")
+AIPIPE_BASE_URL = os.getenv("AIPIPE_BASE_URL", "https://aipipe.org/openrouter/v1")
+
+# LLM fallback chain: comma-separated "model[@base_url]", tried in order
+LLM_ENDPOINTS = os.getenv("LLM_ENDPOINTS", "openai/gpt-4.1-nano")
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+# Follow-up requests for the missing tail when a completion is cut off at max_tokens
+LLM_CONTINUATIONS = int(os.getenv("LLM_CONTINUATIONS", "1"))
+# Hedging: start a second attempt when the first is slower than the recent percentile
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "True").lower() in ("true", "1", "t")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2"))
+LLM_HEDGE_INITIAL_DELAY = float(os.getenv("LLM_HEDGE_INITIAL_DELAY", "15"))
+# Circuit breaker per endpoint
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
 
 # Other configurations
 DEPLOYMENT_SECRET = os.getenv("DEPLOYMENT_SECRET")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 GITHUB_USER = os.getenv("GITHUB_USER")
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+# Seconds cached repo/Pages metadata is trusted before an ETag revalidation
+GITHUB_METADATA_TTL = float(os.getenv("GITHUB_METADATA_TTL", "300"))
+# Rate-limit scheduler: write pacing sized to GitHub's secondary limits, and the
+# primary budget kept back for round 2+ updates
+GITHUB_WRITES_PER_MINUTE = float(os.getenv("GITHUB_WRITES_PER_MINUTE", "80"))
+GITHUB_WRITES_PER_HOUR = float(os.getenv("GITHUB_WRITES_PER_HOUR", "500"))
+GITHUB_WRITE_BURST = float(os.getenv("GITHUB_WRITE_BURST", "10"))
+GITHUB_RATE_LIMIT_RESERVE = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", "100"))
+GITHUB_RATE_LIMIT_RETRIES = int(os.getenv("GITHUB_RATE_LIMIT_RETRIES", "3"))
+GITHUB_RATE_LIMIT_MAX_WAIT = float(os.getenv("GITHUB_RATE_LIMIT_MAX_WAIT", "300"))
 MOCK_MODE = os.getenv("MOCK_MODE", "False").lower() in ("true", "1", "t")
 
-# Validation
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY is required")
-if not AIPIPE_EMAIL and not MOCK_MODE:
-    print("⚠️  AIPIPE_EMAIL is recommended for AIPipe service")
+# Shared async HTTP client (connection pooling for AIPipe, GitHub and evaluation calls)
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "True").lower() in ("true", "1", "t")
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# GitHub push: "git_data" (single commit via blobs/tree/commit) or "contents" (one commit per file)
+PUSH_MODE = os.getenv("PUSH_MODE", "git_data").lower()
+PUSH_CONCURRENCY = int(os.getenv("PUSH_CONCURRENCY", "8"))
+
+# Local state (caches, outbox, journal, revisions) lives here; it must survive
+# restarts, so the default is next to the app rather than in the temp dir
+STATE_DIR = os.getenv("STATE_DIR", os.path.join(os.path.dirname(current_dir), "state"))
+
+# Generation cache
+GENERATION_CACHE_ENABLED = os.getenv("GENERATION_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+GENERATION_CACHE_DIR = os.getenv("GENERATION_CACHE_DIR", os.path.join(STATE_DIR, "generation-cache"))
+GENERATION_CACHE_MEMORY_ENTRIES = int(os.getenv("GENERATION_CACHE_MEMORY_ENTRIES", "128"))
+GENERATION_CACHE_DISK_MB = int(os.getenv("GENERATION_CACHE_DISK_MB", "256"))
+GENERATION_CACHE_TTL = float(os.getenv("GENERATION_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Prompt packing: attachments are condensed to fit the prompt token budget.
+# max_tokens is COMPLETION_MAX_TOKENS for a full app and the size of the current
+# files for a patch, and always small enough for prompt + completion to fit the context
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "12000"))
+MODEL_CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", "128000"))
+COMPLETION_MAX_TOKENS = int(os.getenv("COMPLETION_MAX_TOKENS", "4000"))
+COMPLETION_MIN_TOKENS = int(os.getenv("COMPLETION_MIN_TOKENS", "1000"))
+
+# Round 2+ revises the previous round's files with search/replace patches
+PATCH_MODE_ENABLED = os.getenv("PATCH_MODE_ENABLED", "True").lower() in ("true", "1", "t")
+REVISION_DIR = os.getenv("REVISION_DIR", os.path.join(STATE_DIR, "revisions"))
+
+# Journal of deploy stage outputs, for resuming retried or interrupted deploys
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", os.path.join(STATE_DIR, "journal.jsonl"))
+JOURNAL_TTL = float(os.getenv("JOURNAL_TTL", str(24 * 3600)))
+JOURNAL_FSYNC = os.getenv("JOURNAL_FSYNC", "True").lower() in ("true", "1", "t")
+JOURNAL_RESUME_ON_START = os.getenv("JOURNAL_RESUME_ON_START", "True").lower() in ("true", "1", "t")
+# Attempts after which a deploy is no longer resumed at startup (it can still be replayed by hand)
+JOURNAL_MAX_ATTEMPTS = int(os.getenv("JOURNAL_MAX_ATTEMPTS", "3"))
+# Appends between rewrites of the journal without expired deploys
+JOURNAL_COMPACT_AFTER = int(os.getenv("JOURNAL_COMPACT_AFTER", "1000"))
+
+# Local checks of generated files before pushing, on a process pool
+CHECKS_ENABLED = os.getenv("CHECKS_ENABLED", "True").lower() in ("true", "1", "t")
+CHECK_WORKERS = int(os.getenv("CHECK_WORKERS", "2"))
+CHECK_TIMEOUT = float(os.getenv("CHECK_TIMEOUT", "10"))
+CHECK_REGENERATIONS = int(os.getenv("CHECK_REGENERATIONS", "1"))
+
+# Warm pool of placeholder repos (main initialized, Pages enabled) renamed for new tasks
+REPO_POOL_SIZE = int(os.getenv("REPO_POOL_SIZE", "0"))
+REPO_POOL_PREFIX = os.getenv("REPO_POOL_PREFIX", "pool-")
+REPO_POOL_PATH = os.getenv("REPO_POOL_PATH", os.path.join(STATE_DIR, "repo_pool.json"))
+
+# Hold evaluation notifications until GitHub Pages serves the pushed commit
+PAGES_TRACKING_ENABLED = os.getenv("PAGES_TRACKING_ENABLED", "True").lower() in ("true", "1", "t")
+PAGES_READY_TIMEOUT = float(os.getenv("PAGES_READY_TIMEOUT", "600"))
+PAGES_POLL_MIN_DELAY = float(os.getenv("PAGES_POLL_MIN_DELAY", "2"))
+PAGES_POLL_MAX_DELAY = float(os.getenv("PAGES_POLL_MAX_DELAY", "30"))
+
+# Attachment spool (content-addressed, shared across requests)
+ATTACHMENT_DIR = os.getenv("ATTACHMENT_DIR", os.path.join(STATE_DIR, "attachments"))
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(20 * 1024 * 1024)))
+ATTACHMENT_SPOOL_MAX_BYTES = int(os.getenv("ATTACHMENT_SPOOL_MAX_BYTES", str(512 * 1024 * 1024)))
+ATTACHMENT_FETCH_CONCURRENCY = int(os.getenv("ATTACHMENT_FETCH_CONCURRENCY", "8"))
+ATTACHMENT_FETCH_TIMEOUT = float(os.getenv("ATTACHMENT_FETCH_TIMEOUT", "30"))
+# Remote attachments must resolve to public addresses unless their host is listed here
+ATTACHMENT_ALLOWED_HOSTS = [h.strip() for h in os.getenv("ATTACHMENT_ALLOWED_HOSTS", "").split(",") if h.strip()]
+# Most bytes of a single text attachment inlined into the prompt
+ATTACHMENT_PROMPT_BYTES = int(os.getenv("ATTACHMENT_PROMPT_BYTES", str(100 * 1024)))
+
+# Evaluation notification outbox
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", os.path.join(STATE_DIR, "outbox.sqlite3"))
+OUTBOX_TTL = float(os.getenv("OUTBOX_TTL", "3600"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+# Seconds failed and expired notifications are kept before they are deleted
+OUTBOX_RETENTION = float(os.getenv("OUTBOX_RETENTION", str(24 * 3600)))
+OUTBOX_BASE_DELAY = float(os.getenv("OUTBOX_BASE_DELAY", "1"))
+OUTBOX_MAX_DELAY = float(os.getenv("OUTBOX_MAX_DELAY", "300"))
+OUTBOX_HOST_CONCURRENCY = int(os.getenv("OUTBOX_HOST_CONCURRENCY", "4"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))
+
+# Deploy job queue
+DEPLOY_WORKERS = int(os.getenv("DEPLOY_WORKERS", "4"))
+DEPLOY_QUEUE_SIZE = int(os.getenv("DEPLOY_QUEUE_SIZE", "100"))
+JOB_HISTORY_LIMIT = int(os.getenv("JOB_HISTORY_LIMIT", "500"))
+
+# Per-stage concurrency caps (apply to queued and batch deploys)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+GITHUB_WRITE_CONCURRENCY = int(os.getenv("GITHUB_WRITE_CONCURRENCY", "16"))
+NOTIFY_CONCURRENCY = int(os.getenv("NOTIFY_CONCURRENCY", "8"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+
+# Tracing: spans are logged as JSON lines and the latest traces kept for /api/traces
+TRACE_LOG = os.getenv("TRACE_LOG", "True").lower() in ("true", "1", "t")
+TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", "200"))
+
+# Duplicate deploys (same task, round and nonce) attach to the original job
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "1000"))
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+
+def validate():
+    """Check required settings; called from the app's startup hook rather than on import"""
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY is required")
+    if not AIPIPE_EMAIL and not MOCK_MODE:
+        print("⚠️  AIPIPE_EMAIL is recommended for AIPipe service")
+
+    temp_dir = os.path.realpath(tempfile.gettempdir())
+    if not MOCK_MODE and os.path.realpath(STATE_DIR).startswith(temp_dir + os.sep):
+        print(f"⚠️  STATE_DIR is under {temp_dir}; the outbox and deploy journal won't survive a reboot")
 
-print(f"✅ AIPipe configured for: {AIPIPE_EMAIL}")
\ No newline at end of file
+    print(f"✅ AIPipe configured for: {AIPIPE_EMAIL}")
@@ -1,22 +1,103 @@
-import requests
+import asyncio
+import httpx
 import json
 from . import config
-import base64
-import time
+from . import http_client
+from .cache import GenerationCache
+from .llm_router import LLMRouter, parse_endpoints
+from .github_utils import git_blob_sha
+from .metrics import FALLBACKS, LLM_PATCHES, LLM_PROMPT_TOKENS_ESTIMATED, LLM_TOKENS
+from .patching import PatchError, apply_edits, parse_edits, validate
+from .prompt_budget import EstimateTracker, PromptPacker, completion_budget, estimate_messages, estimate_tokens
+from .response_parser import continuation_messages, join_continuation, parse_response
+from .stream_parser import IncrementalFileMapParser
+from .tracing import traced
+
+MODEL = "openai/gpt-4.1-nano"
+
+SYSTEM_PROMPT = """You are an expert web developer. Generate minimal, complete web applications based on requirements.
+
+Requirements:
+- Single HTML file with embedded CSS and JavaScript
+- MIT License in LICENSE file
+- Professional README.md
+- Bootstrap 5 for styling (loaded from CDN)
+- Vanilla JavaScript, no frameworks
+- Mobile responsive
+- Handle errors gracefully
+
+Return ONLY a JSON object with filenames as keys and file content as values.
+
+Example format:
+{
+  "index.html": "<!DOCTYPE html>...",
+  "README.md": "# App Name...",
+  "LICENSE": "MIT License..."
+}"""
+
+PATCH_SYSTEM_PROMPT = """You are an expert web developer updating an existing web application. You are given its current files and new requirements.
+
+Change only what the new requirements need and keep every existing feature working. Reply ONLY with search/replace blocks, no explanations:
+
+index.html
+<<<<<<< SEARCH
+exact lines copied from the current file
+=======
+the lines that replace them
+>>>>>>> REPLACE
+
+Rules:
+- Put the file name on the line before each block
+- SEARCH must match the current file exactly and include just enough lines to be unique
+- Use several small blocks rather than one large one
+- To add a new file, leave SEARCH empty
+- To delete a file, write DELETE and its file name on a line by itself
+- Update README.md to describe the new features"""
 
 class CodeGenerator:  # Changed from AIPipeGenerator to CodeGenerator
     def __init__(self):
         self.token = config.OPENAI_API_KEY  # Your AIPipe token
         self.email = config.AIPIPE_EMAIL    # Your email for AIPipe
-        self.base_url = "https://aipipe.org/openrouter/v1"
+        self.router = LLMRouter(
+            parse_endpoints(config.LLM_ENDPOINTS, config.AIPIPE_BASE_URL) or
+            parse_endpoints(MODEL, config.AIPIPE_BASE_URL),
+            hedge=config.LLM_HEDGE_ENABLED,
+            hedge_percentile=config.LLM_HEDGE_PERCENTILE,
+            hedge_min_delay=config.LLM_HEDGE_MIN_DELAY,
+            hedge_initial_delay=config.LLM_HEDGE_INITIAL_DELAY,
+            max_attempts=config.LLM_MAX_ATTEMPTS,
+            failure_threshold=config.LLM_BREAKER_FAILURES,
+            cooldown=config.LLM_BREAKER_COOLDOWN,
+        )
+        # The primary model identifies generations in the cache
+        self.model = self.router.endpoints[0].model
+        self.cache = None
+        self.packer = PromptPacker(config.PROMPT_TOKEN_BUDGET, config.ATTACHMENT_PROMPT_BYTES)
+        self.token_estimates = EstimateTracker()
         print("🔄 Initializing AIPipe client...")
         
+        if config.GENERATION_CACHE_ENABLED:
+            self.cache = GenerationCache(
+                config.GENERATION_CACHE_DIR,
+                memory_entries=config.GENERATION_CACHE_MEMORY_ENTRIES,
+                disk_max_bytes=config.GENERATION_CACHE_DISK_MB * 1024 * 1024,
+                ttl=config.GENERATION_CACHE_TTL,
+            )
+        
         # Validate that we have the required credentials
         if not self.token or not self.email:
             print("❌ AIPipe token or email missing in environment variables")
     
-    def generate_app(self, brief: str, attachments: list) -> dict:
-        """Generate application code using AIPipe with GPT-4.1-nano"""
+    async def generate_app(self, brief: str, attachments: list, on_event=None,
+                           current_files: dict = None) -> dict:
+        """
+        Generate application code using AIPipe through the configured model chain.
+        attachments are AttachmentHandles from the AttachmentStore.
+        on_event(event, data) receives progress while a streamed completion arrives.
+        current_files (round 2+) are revised with a patch instead of regenerated;
+        a patch that doesn't apply falls back to full regeneration. Files the
+        patch deletes map to None.
+        """
         print(f"📝 Generating app with brief: {brief[:50]}...")
         
         # If in MOCK_MODE, use fallback
@@ -24,67 +105,216 @@ class CodeGenerator:  # Changed from AIPipeGenerator to CodeGenerator
             print("🔄 Using mock code generation")
             return self._create_fallback_app(brief)
         
+        patching = bool(current_files) and config.PATCH_MODE_ENABLED
+        cache_key = None
+        if self.cache is not None:
+            digests = self._attachment_digests(attachments)
+            if patching:
+                digests += [(f"current:{path}", git_blob_sha(content).encode('ascii'))
+                            for path, content in sorted(current_files.items())]
+            cache_key = GenerationCache.make_key(
+                self.model, PATCH_SYSTEM_PROMPT if patching else SYSTEM_PROMPT, brief, digests
+            )
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                print(f"⚡ Generation cache hit: {cache_key[:12]}")
+                return cached
+        
+        files = None
+        if patching:
+            files = await self._generate_patch(brief, attachments, current_files, on_event)
+        if files is None:
+            files = await self._generate_uncached(brief, attachments, on_event)
+        
+        # Never cache the placeholder app, so transient LLM failures aren't sticky
+        if cache_key is not None and files != self._create_fallback_app(brief):
+            await self.cache.set(cache_key, files)
+        return files
+    
+    @traced("llm.generate")
+    async def _generate_uncached(self, brief: str, attachments: list, on_event=None) -> dict:
         try:
-            # Build the messages for the chat completion
-            messages = self._build_messages(brief, attachments)
-            
-            # Call AIPipe API
-            response = self._call_aipipe(messages)
+            # Build the messages for the chat completion (reads the spooled attachments)
+            messages = await asyncio.to_thread(self._build_messages, brief, attachments)
+            prompt_tokens = estimate_messages(messages)
+            max_tokens = completion_budget(
+                prompt_tokens, config.MODEL_CONTEXT_TOKENS,
+                config.COMPLETION_MAX_TOKENS, config.COMPLETION_MIN_TOKENS
+            )
+            print(f"📏 Prompt ~{prompt_tokens} tokens (estimated), max_tokens {max_tokens}")
             
-            # Parse the response
-            if response and "choices" in response and len(response["choices"]) > 0:
-                content = response["choices"][0]["message"]["content"]
-                print("✅ AIPipe response received successfully")
-                return self._parse_code_response(content, brief)
-            else:
+            # Call AIPipe API through the fallback chain, hedging slow attempts
+            response = await self._complete(messages, prompt_tokens, max_tokens, on_event)
+            if not (response and "choices" in response and len(response["choices"]) > 0):
                 print("❌ AIPipe returned empty response")
                 if response:
                     print(f"Response structure: {response}")
+                FALLBACKS.inc(kind="llm_placeholder_app")
                 return self._create_fallback_app(brief)
+            
+            content = response["choices"][0]["message"]["content"]
+            print("✅ AIPipe response received successfully")
+            parsed = parse_response(content)
+            
+            # Output cut off at max_tokens: ask only for the missing tail
+            continuations = 0
+            finish_reason = response["choices"][0].get("finish_reason")
+            # (a complete JSON object is final even if it ended right at the limit)
+            while (not parsed.complete or (finish_reason == "length" and parsed.method != "json")) and \
+                    continuations < config.LLM_CONTINUATIONS:
+                continuations += 1
+                print(f"✂️ Response truncated ({parsed.truncated or finish_reason}), "
+                      f"requesting continuation {continuations}")
+                follow_up = continuation_messages(messages, content)
+                follow_up_tokens = estimate_messages(follow_up)
+                tail = await self._complete(
+                    follow_up, follow_up_tokens,
+                    completion_budget(follow_up_tokens, config.MODEL_CONTEXT_TOKENS,
+                                      config.COMPLETION_MAX_TOKENS, config.COMPLETION_MIN_TOKENS)
+                )
+                if not (tail and tail.get("choices")):
+                    break
+                content = join_continuation(content, tail["choices"][0]["message"]["content"] or "")
+                finish_reason = tail["choices"][0].get("finish_reason")
+                parsed = parse_response(content)
+            
+            return self._files_from_response(parsed, content, brief)
                 
         except Exception as e:
             print(f"❌ AIPipe generation failed: {e}")
+            FALLBACKS.inc(kind="llm_placeholder_app")
             return self._create_fallback_app(brief)
     
-    def _build_messages(self, brief: str, attachments: list) -> list:
-        """Build the messages array for the chat completion"""
-        
-        # Process attachments for context
-        attachment_context = ""
-        for att in attachments:
-            if att['name'].endswith(('.txt', '.md', '.csv', '.json')):
-                try:
-                    if att['url'].startswith('data:'):
-                        header, data = att['url'].split(',', 1)
-                        content = base64.b64decode(data).decode('utf-8')
-                        attachment_context += f"\n\nFile: {att['name']}\n```\n{content}\n```"
-                except Exception as e:
-                    print(f"⚠️ Failed to process attachment {att['name']}: {e}")
+    @traced("llm.patch")
+    async def _generate_patch(self, brief: str, attachments: list, current_files: dict, on_event=None):
+        """
+        Ask for search/replace edits to the current files and apply them.
+        Returns the revised files, or None when the patch is cut off, doesn't
+        apply or breaks the page (the caller then regenerates in full).
+        """
+        try:
+            messages = await asyncio.to_thread(self._build_patch_messages, brief, attachments, current_files)
+            if messages is None:
+                print("📏 Current files don't fit the prompt budget, regenerating in full")
+                LLM_PATCHES.inc(outcome="too_large")
+                return None
+            prompt_tokens = estimate_messages(messages)
+            # Edits rarely add up to more than the files they change
+            max_tokens = completion_budget(
+                prompt_tokens, config.MODEL_CONTEXT_TOKENS,
+                config.COMPLETION_MAX_TOKENS, config.COMPLETION_MIN_TOKENS,
+                expected_tokens=sum(estimate_tokens(content) for content in current_files.values())
+            )
+            print(f"📏 Patch prompt ~{prompt_tokens} tokens (estimated), max_tokens {max_tokens}")
+            
+            # Only progress is forwarded: the streamed text is edits, not a file map
+            def progress(event, data):
+                if event == "progress" and on_event is not None:
+                    on_event(event, data)
+            
+            response = await self._complete(messages, prompt_tokens, max_tokens, progress)
+            if not (response and response.get("choices")):
+                LLM_PATCHES.inc(outcome="no_response")
+                return None
+            choice = response["choices"][0]
+            if choice.get("finish_reason") == "length":
+                raise PatchError("patch was cut off at max_tokens")
+            
+            edits = parse_edits(choice["message"]["content"] or "")
+            if not edits:
+                raise PatchError("no edit blocks in the response")
+            files = apply_edits(current_files, edits)
+            problems = validate(current_files, files)
+            if problems:
+                raise PatchError("; ".join(problems))
+        except PatchError as e:
+            print(f"⚠️ Patch rejected, regenerating in full: {e}")
+            LLM_PATCHES.inc(outcome="rejected")
+            return None
+        except Exception as e:
+            print(f"❌ Patch generation failed: {e}")
+            LLM_PATCHES.inc(outcome="failed")
+            return None
         
-        system_message = {
-            "role": "system",
-            "content": """You are an expert web developer. Generate minimal, complete web applications based on requirements.
+        changed = [path for path, content in files.items() if current_files.get(path) != content]
+        deleted = [path for path in current_files if path not in files]
+        print(f"🩹 Applied {len(edits)} edits to {len(changed)} files: {', '.join(changed)}"
+              + (f"; deleted {', '.join(deleted)}" if deleted else ""))
+        LLM_PATCHES.inc(outcome="applied")
+        if on_event is not None:
+            for path in changed:
+                on_event("file", {"name": path, "size": len(files[path]), "content": files[path]})
+        # A content of None tells the push to delete the path
+        files.update({path: None for path in deleted})
+        return files
+    
+    def _build_patch_messages(self, brief: str, attachments: list, current_files: dict):
+        """Messages for a patch: the current files verbatim, then attachments in what's left of the budget"""
+        system_message = {"role": "system", "content": PATCH_SYSTEM_PROMPT}
+        current = "".join(
+            f"\n\n{path}\n```\n{content}\n```" for path, content in sorted(current_files.items())
+        )
 
-Requirements:
-- Single HTML file with embedded CSS and JavaScript
-- MIT License in LICENSE file
-- Professional README.md
-- Bootstrap 5 for styling (loaded from CDN)
-- Vanilla JavaScript, no frameworks
-- Mobile responsive
-- Handle errors gracefully
+        def user_content(attachment_context: str) -> str:
+            return f"""Update this web application to meet the new requirements.
 
-Return ONLY a JSON object with filenames as keys and file content as values.
+NEW BRIEF: {brief}
+{attachment_context}
 
-Example format:
-{
-  "index.html": "<!DOCTYPE html>...",
-  "README.md": "# App Name...",
-  "LICENSE": "MIT License..."
-}"""
+CURRENT FILES:{current}
+
+Reply with search/replace blocks only."""
+
+        reserved = estimate_messages([system_message, {"content": user_content("")}])
+        if reserved > config.PROMPT_TOKEN_BUDGET:
+            return None
+        sections = self.packer.pack(attachments, reserved=reserved)
+        attachment_context = "".join(f"\n{section}\n" for section in sections)
+        return [system_message, {"role": "user", "content": user_content(attachment_context)}]
+    
+    async def _complete(self, messages: list, prompt_tokens: int, max_tokens: int, on_event=None):
+        """One completion through the router; records token usage"""
+        if config.AIPIPE_STREAM:
+            response = await self.router.run(
+                lambda endpoint, claim: self._call_aipipe_stream(
+                    endpoint, messages, max_tokens, claim, on_event
+                )
+            )
+        else:
+            response = await self.router.run(
+                lambda endpoint, claim: self._call_aipipe(endpoint, messages, max_tokens, claim)
+            )
+        if response and response.get("usage"):
+            self._record_usage(response.get("model", self.model), prompt_tokens, response["usage"])
+        return response
+    
+    def _attachment_digests(self, attachments: list) -> list:
+        """(name, content hash) pairs identifying the decoded attachments for cache keys"""
+        return [(att.name, att.sha256.encode('ascii')) for att in attachments]
+    
+    def _record_usage(self, model: str, estimated: int, usage: dict):
+        for kind in ("prompt", "completion"):
+            if usage.get(f"{kind}_tokens"):
+                LLM_TOKENS.inc(usage[f"{kind}_tokens"], model=model, type=kind)
+        actual = usage.get("prompt_tokens")
+        if actual:
+            LLM_PROMPT_TOKENS_ESTIMATED.inc(estimated, model=model)
+        error = self.token_estimates.record(estimated, actual)
+        if error is not None:
+            mean = self.token_estimates.stats()["mean_abs_error_pct"]
+            print(f"📏 Prompt tokens: estimated {estimated}, actual {actual} "
+                  f"({error:+.1f}%, mean abs error {mean:.1f}% over {self.token_estimates.samples})")
+    
+    def _build_messages(self, brief: str, attachments: list) -> list:
+        """Build the messages array, packing spooled attachments into the prompt token budget"""
+        
+        system_message = {
+            "role": "system",
+            "content": SYSTEM_PROMPT
         }
 
-        user_content = f"""Create a web application with these requirements:
+        def user_content(attachment_context: str) -> str:
+            return f"""Create a web application with these requirements:
 
 BRIEF: {brief}
 
@@ -97,45 +327,61 @@ Required files:
 
 Generate the complete file structure as JSON."""
 
+        # Whatever the system prompt and brief leave is shared by the attachments
+        reserved = estimate_messages([system_message, {"content": user_content("")}])
+        sections = self.packer.pack(attachments, reserved=reserved)
+        attachment_context = "".join(f"\n\n{section}" for section in sections)
+
         user_message = {
             "role": "user",
-            "content": user_content
+            "content": user_content(attachment_context)
         }
         
         return [system_message, user_message]
     
-    def _call_aipipe(self, messages: list):
-        """Make API call to AIPipe OpenRouter endpoint"""
-        headers = {
+    def _headers(self) -> dict:
+        return {
             "Authorization": f"Bearer {self.token}",
             "Content-Type": "application/json",
             "X-User-Email": self.email,  # Include email in headers
             "User-Agent": "LLM-Code-Deployer/1.0"  # Identify your application
         }
-        
+    
+    def _payload(self, model: str, messages: list, max_tokens: int, stream: bool) -> dict:
         payload = {
-            "model": "openai/gpt-4.1-nano",  # Using the specific model you mentioned
+            "model": model,
             "messages": messages,
-            "max_tokens": 4000,
+            "max_tokens": max_tokens,
             "temperature": 0.7,
-            "stream": False
+            "stream": stream
         }
+        if stream:
+            # Ask for token usage in the final chunk so estimates can be checked
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+    
+    async def _call_aipipe(self, endpoint, messages: list, max_tokens: int, claim):
+        """Make API call to an AIPipe OpenRouter endpoint"""
+        headers = self._headers()
+        payload = self._payload(endpoint.model, messages, max_tokens, stream=False)
         
         try:
-            print("🌐 Calling AIPipe API with GPT-4.1-nano...")
+            print(f"🌐 Calling AIPipe API with {endpoint.model}...")
             print(f"📧 Using email: {self.email}")
             
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
+            response = await http_client.get_client().post(
+                f"{endpoint.base_url}/chat/completions",
                 headers=headers,
                 json=payload,
-                timeout=120  # 120 second timeout for larger responses
+                timeout=config.AIPIPE_TIMEOUT  # longer timeout for larger responses
             )
             
             print(f"📊 API Response Status: {response.status_code}")
             
             if response.status_code == 200:
                 result = response.json()
+                if not claim():
+                    return None
                 print("✅ AIPipe API call successful")
                 
                 # Debug: Print token usage if available
@@ -145,79 +391,127 @@ Generate the complete file structure as JSON."""
                 
                 return result
             else:
-                print(f"❌ AIPipe API error: {response.status_code}")
-                print(f"Error details: {response.text}")
-                
-                # Provide more specific error messages
-                if response.status_code == 401:
-                    print("🔐 Authentication failed. Check your token and email.")
-                elif response.status_code == 429:
-                    print("⏳ Rate limit exceeded. Try again later.")
-                elif response.status_code == 500:
-                    print("🔧 Server error. The AIPipe service might be down.")
-                
+                self._report_error(response.status_code, response.text)
                 return None
                 
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             print("❌ AIPipe API request timed out")
             return None
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"❌ AIPipe connection failed: {e}")
             return None
     
-    def _parse_code_response(self, content: str, brief: str) -> dict:
-        """Parse the AI response into file structure"""
+    async def _call_aipipe_stream(self, endpoint, messages: list, max_tokens: int,
+                                  claim, on_event=None):
+        """
+        Stream the completion over SSE, extracting each file as soon as its
+        JSON value closes. Returns a response shaped like the non-streaming API.
+        claim() is called on the first token; a hedged attempt that loses stops there.
+        """
+        def emit(event, data):
+            if on_event is not None:
+                try:
+                    on_event(event, data)
+                except Exception as e:
+                    print(f"⚠️ Progress callback failed: {e}")
+        
+        parser = IncrementalFileMapParser()
+        chunks = []
+        received = 0
+        reported = 0
+        usage = None
+        finish_reason = None
+        
         try:
-            # Clean the content - remove markdown code blocks if present
-            cleaned_content = content.strip()
-            if cleaned_content.startswith('```json'):
-                cleaned_content = cleaned_content[7:]
-            if cleaned_content.startswith('```'):
-                cleaned_content = cleaned_content[3:]
-            if cleaned_content.endswith('```'):
-                cleaned_content = cleaned_content[:-3]
-            cleaned_content = cleaned_content.strip()
-            
-            # Try to parse as JSON
-            generated_files = json.loads(cleaned_content)
-            
-            # Validate required files
-            required_files = ['index.html', 'README.md', 'LICENSE']
-            for req_file in required_files:
-                if req_file not in generated_files:
-                    print(f"⚠️ Missing required file: {req_file}, using default")
-                    generated_files[req_file] = self._get_default_file(req_file, brief)
-            
-            print(f"✅ Successfully parsed {len(generated_files)} files from AI response")
-            return generated_files
-            
-        except json.JSONDecodeError as e:
-            print(f"❌ JSON parsing failed: {e}")
-            print(f"Raw content received: {content[:200]}...")
-            
-            # If JSON parsing fails, try to extract code blocks
-            return self._extract_files_from_text(content, brief)
+            print(f"🌐 Streaming AIPipe completion with {endpoint.model}...")
+            async with http_client.get_client().stream(
+                "POST",
+                f"{endpoint.base_url}/chat/completions",
+                headers=self._headers(),
+                json=self._payload(endpoint.model, messages, max_tokens, stream=True),
+                timeout=config.AIPIPE_TIMEOUT  # applies to connect and to each read between events
+            ) as response:
+                print(f"📊 API Response Status: {response.status_code}")
+                if response.status_code != 200:
+                    await response.aread()
+                    self._report_error(response.status_code, response.text)
+                    return None
+                
+                async for line in response.aiter_lines():
+                    # Blank lines separate events; ':' lines are keep-alive comments
+                    if not line or line.startswith(":") or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    if event.get("usage"):
+                        usage = event["usage"]
+                    for choice in event.get("choices", []):
+                        finish_reason = choice.get("finish_reason") or finish_reason
+                        delta = (choice.get("delta") or {}).get("content")
+                        if not delta:
+                            continue
+                        if not chunks and not claim():
+                            return None
+                        chunks.append(delta)
+                        received += len(delta)
+                        for name, content in parser.feed(delta):
+                            print(f"📄 Streamed file ready: {name} ({len(content)} chars)")
+                            emit("file", {"name": name, "size": len(content), "content": content})
+                        if received - reported >= 2048:
+                            reported = received
+                            emit("progress", {"chars": received})
+        except httpx.TimeoutException:
+            print("❌ AIPipe stream timed out")
+            return None
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"❌ AIPipe stream failed: {e}")
+            return None
+        
+        content = "".join(chunks)
+        if not content:
+            return None
+        print(f"✅ AIPipe stream finished: {received} chars, {len(parser.files)} files extracted incrementally")
+        if usage:
+            print(f"📈 Token usage: {usage.get('prompt_tokens', 'N/A')} prompt, {usage.get('completion_tokens', 'N/A')} completion")
+        result = {"model": endpoint.model,
+                  "choices": [{"message": {"role": "assistant", "content": content},
+                               "finish_reason": finish_reason}]}
+        if usage:
+            result["usage"] = usage
+        return result
     
-    def _extract_files_from_text(self, content: str, brief: str) -> dict:
-        """Extract files from text response when JSON parsing fails"""
-        print("🔄 Attempting to extract files from text response...")
+    def _report_error(self, status_code: int, text: str):
+        print(f"❌ AIPipe API error: {status_code}")
+        print(f"Error details: {text}")
         
-        files = {
-            "index.html": self._get_default_file("index.html", brief),
-            "README.md": self._get_default_file("README.md", brief),
-            "LICENSE": self._get_default_file("LICENSE", brief)
-        }
+        # Provide more specific error messages
+        if status_code == 401:
+            print("🔐 Authentication failed. Check your token and email.")
+        elif status_code == 429:
+            print("⏳ Rate limit exceeded. Try again later.")
+        elif status_code == 500:
+            print("🔧 Server error. The AIPipe service might be down.")
+    
+    def _files_from_response(self, parsed, content: str, brief: str) -> dict:
+        """Turn the parsed completion into the file map, filling in required files"""
+        if not parsed.files:
+            print(f"❌ No files found in AI response: {content[:200]}...")
+            FALLBACKS.inc(kind="llm_unparseable")
+        elif parsed.truncated:
+            print(f"⚠️ {parsed.truncated} is still truncated, keeping the partial content")
         
-        # Simple heuristic: look for HTML content
-        if "<!DOCTYPE html>" in content or "<html>" in content:
-            start = content.find("<!DOCTYPE html>")
-            if start == -1:
-                start = content.find("<html>")
-            end = content.find("</html>") + 7 if content.find("</html>") != -1 else len(content)
-            files["index.html"] = content[start:end]
-            print("✅ Extracted HTML from response")
+        generated_files = parsed.files
+        # Validate required files
+        required_files = ['index.html', 'README.md', 'LICENSE']
+        for req_file in required_files:
+            if req_file not in generated_files:
+                print(f"⚠️ Missing required file: {req_file}, using default")
+                generated_files[req_file] = self._get_default_file(req_file, brief)
         
-        return files
+        print(f"✅ Parsed {len(generated_files)} files from AI response ({parsed.method})")
+        return generated_files
     
     def _get_default_file(self, filename: str, brief: str) -> str:
         """Get default content for missing files"""
@@ -0,0 +1,250 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, TYPE_CHECKING
+
+from .metrics import REGISTRY
+
+if TYPE_CHECKING:
+    import httpx
+
+# Lower runs first: updates to live repos go ahead of new repo creation,
+# and both go ahead of background work such as refilling the repo pool
+UPDATE = 0
+CREATE = 1
+BACKGROUND = 2
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("github_priority", default=CREATE)
+
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+GITHUB_WAIT_SECONDS = REGISTRY.counter(
+    "github_scheduler_wait_seconds_total", "Time GitHub requests spent waiting for rate-limit budget, by reason")
+GITHUB_RATE_LIMITED = REGISTRY.counter(
+    "github_rate_limited_total", "GitHub responses rejected by a primary or secondary rate limit")
+
+
+@contextmanager
+def priority(level: int):
+    """Run the enclosed GitHub calls (and tasks they spawn) at this priority"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is now)"""
+        self._refill(now)
+        if self.tokens >= 1 or self.rate <= 0:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class GitHubScheduler:
+    """
+    Admission control for every GitHub REST call.
+
+    Tracks the primary budget from X-RateLimit-* headers and paces
+    content-creating requests (POST/PUT/PATCH/DELETE) with token buckets
+    sized to GitHub's secondary limits (80/minute, 500/hour), so bursts of
+    deploys slow down instead of tripping 403/429s. Waiting requests are
+    admitted by priority: UPDATE, then CREATE, then BACKGROUND. When the
+    primary budget drops to `reserve`, only UPDATE requests are admitted
+    until it resets.
+    A 403/429 rate-limit response pauses everything for Retry-After (or
+    until the reset, or an exponential backoff from one minute) and the
+    request is retried.
+    """
+
+    def __init__(self, writes_per_minute: float = 80, writes_per_hour: float = 500,
+                 burst: float = 10, reserve: int = 100, max_retries: int = 3,
+                 max_wait: float = 300):
+        self.write_buckets = [
+            TokenBucket(writes_per_minute / 60.0, burst),
+            TokenBucket(writes_per_hour / 3600.0, min(burst, writes_per_hour)),
+        ]
+        self.reserve = reserve
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        # Primary limit of the core resource, from the latest response headers
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None  # epoch seconds
+        self.paused_until = 0.0  # monotonic, set by a rate-limited response
+        self._backoff = 60.0
+        self._waiters: List[list] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.stats_counters = {"requests": 0, "writes": 0, "rate_limited": 0, "retries": 0, "waited": 0}
+
+    async def request(self, method: str, send: Callable[[], Awaitable["httpx.Response"]]) -> "httpx.Response":
+        """
+        Send a request once the budget allows. send() performs the HTTP call;
+        rate-limited responses are retried after the advised wait, and the
+        last response is returned when retries or max_wait run out.
+        """
+        write = method.upper() in WRITE_METHODS
+        for attempt in range(self.max_retries + 1):
+            await self._admit(write)
+            response = await send()
+            self._observe(response)
+            wait = self._rate_limit_wait(response)
+            if wait is None:
+                self._backoff = 60.0
+                return response
+            self.stats_counters["rate_limited"] += 1
+            GITHUB_RATE_LIMITED.inc(status=response.status_code)
+            print(f"⏳ GitHub rate limit hit ({response.status_code}) on {method}, pausing {wait:.0f}s")
+            if attempt == self.max_retries or wait > self.max_wait:
+                return response
+            self.paused_until = max(self.paused_until, time.monotonic() + wait)
+            self.stats_counters["retries"] += 1
+        return response
+
+    async def _admit(self, write: bool):
+        self.stats_counters["requests"] += 1
+        if write:
+            self.stats_counters["writes"] += 1
+        entry = [_priority.get(), next(self._sequence), write,
+                 asyncio.get_running_loop().create_future(), time.monotonic()]
+        heapq.heappush(self._waiters, entry)
+        self._dispatch()
+        try:
+            await entry[3]
+        except asyncio.CancelledError:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            self._dispatch()
+            raise
+        waited = time.monotonic() - entry[4]
+        if waited > 0.001:
+            self.stats_counters["waited"] += 1
+
+    def _dispatch(self):
+        """Admit every waiter the budget allows, in priority order; re-arm the timer for the rest"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = time.monotonic()
+        delays = []
+        writes_blocked = False
+        kept = []
+        while self._waiters:
+            entry = heapq.heappop(self._waiters)
+            level, _, write, future, queued_at = entry
+            if future.done():
+                continue
+            delay = self._primary_delay(level, now)
+            if delay == 0 and write:
+                if writes_blocked:
+                    # The next tokens go to the higher-priority write ahead of this one
+                    kept.append(entry)
+                    continue
+                delay = max(bucket.delay(now) for bucket in self.write_buckets)
+                writes_blocked = delay > 0
+            if delay == 0:
+                if write:
+                    for bucket in self.write_buckets:
+                        bucket.take(now)
+                if self.remaining is not None:
+                    # Count it now so a burst can't overdraw the budget before responses arrive
+                    self.remaining -= 1
+                reason = "write_pacing" if write else "primary"
+                if now - queued_at > 0.001:
+                    GITHUB_WAIT_SECONDS.inc(now - queued_at, reason=reason)
+                future.set_result(None)
+                continue
+            delays.append(delay)
+            kept.append(entry)
+        for entry in kept:
+            heapq.heappush(self._waiters, entry)
+        if delays:
+            self._timer = asyncio.get_running_loop().call_later(min(delays), self._dispatch)
+
+    def _primary_delay(self, level: int, now: float) -> float:
+        if self.paused_until > now:
+            return self.paused_until - now
+        if self.remaining is None or self.reset_at is None:
+            return 0.0
+        floor = 0 if level == UPDATE else self.reserve
+        if self.remaining > floor:
+            return 0.0
+        until_reset = self.reset_at - time.time()
+        if until_reset <= 0:
+            # The window has reset; the next response refreshes the counters
+            self.remaining = None
+            return 0.0
+        return until_reset + 1
+
+    def _observe(self, response: "httpx.Response"):
+        headers = response.headers
+        if headers.get("X-RateLimit-Resource", "core") != "core":
+            return
+        try:
+            if "X-RateLimit-Remaining" in headers:
+                self.remaining = int(headers["X-RateLimit-Remaining"])
+            if "X-RateLimit-Limit" in headers:
+                self.limit = int(headers["X-RateLimit-Limit"])
+            if "X-RateLimit-Reset" in headers:
+                self.reset_at = float(headers["X-RateLimit-Reset"])
+        except ValueError:
+            pass
+
+    def _rate_limit_wait(self, response: "httpx.Response") -> Optional[float]:
+        """Seconds to wait if the response is a rate-limit rejection, else None"""
+        if response.status_code not in (403, 429):
+            return None
+        headers = response.headers
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return max(1.0, float(retry_after))
+            except ValueError:
+                pass
+        if headers.get("X-RateLimit-Remaining") == "0" and headers.get("X-RateLimit-Reset"):
+            try:
+                return max(1.0, float(headers["X-RateLimit-Reset"]) - time.time() + 1)
+            except ValueError:
+                pass
+        if response.status_code == 403 and "rate limit" not in response.text.lower():
+            # A permissions error, not a limit
+            return None
+        # Secondary limit without advice: at least a minute, doubling while it persists
+        wait = self._backoff
+        self._backoff = min(self._backoff * 2, 900.0)
+        return wait
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            **self.stats_counters,
+            "waiting": len(self._waiters),
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "reset_in": round(self.reset_at - time.time(), 1) if self.reset_at else None,
+            "paused_for": round(self.paused_until - now, 1) if self.paused_until > now else 0.0,
+            "write_tokens": round(min(bucket.tokens for bucket in self.write_buckets), 2),
+        }
@@ -1,4 +1,13 @@
+import asyncio
+import base64
+import hashlib
+import time
 from . import config
+from . import http_client
+from .github_scheduler import GitHubScheduler
+from .metrics import FALLBACKS
+from .repo_pool import RepoPool
+from .tracing import traced
 
 # Use lazy initialization instead of global initialization
 _github_manager = None
@@ -10,141 +19,384 @@ def get_github_manager():
         _github_manager = GitHubManager()
     return _github_manager
 
+def _b64(content: str) -> str:
+    return base64.b64encode(content.encode("utf-8")).decode("ascii")
+
+def git_blob_sha(content: str) -> str:
+    """SHA git assigns to a blob with this content (matches the Git Data API)"""
+    data = content.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+class GitHubAPIError(Exception):
+    """A GitHub REST call returned an error status"""
+    def __init__(self, status: int, message: str):
+        super().__init__(f"GitHub API error {status}: {message[:200]}")
+        self.status = status
+
 class GitHubManager:
     def __init__(self):
-        self.auth = None
-        self.g = None
+        # No network here: the token is verified by warm_up() in the background
+        self.enabled = not config.MOCK_MODE and bool(config.GITHUB_TOKEN)
+        self._blob_uploads = {}
+        self._tree_cache = {}
+        # Metadata that rarely changes: user login, repo and Pages lookups
+        self._user_login = None
+        self._repo_cache = {}
+        self._pages_cache = {}
+        self.metadata_stats = {"hits": 0, "revalidated": 0, "fetched": 0}
+        self.scheduler = GitHubScheduler(
+            writes_per_minute=config.GITHUB_WRITES_PER_MINUTE,
+            writes_per_hour=config.GITHUB_WRITES_PER_HOUR,
+            burst=config.GITHUB_WRITE_BURST,
+            reserve=config.GITHUB_RATE_LIMIT_RESERVE,
+            max_retries=config.GITHUB_RATE_LIMIT_RETRIES,
+            max_wait=config.GITHUB_RATE_LIMIT_MAX_WAIT,
+        )
+        self.repo_pool = RepoPool(self, config.REPO_POOL_SIZE if self.enabled else 0,
+                                  config.REPO_POOL_PATH, config.REPO_POOL_PREFIX)
+        if config.MOCK_MODE:
+            print("✅ GitHub client initialized (MOCK MODE)")
+        elif not self.enabled:
+            print("❌ GitHub client initialization failed: GITHUB_TOKEN is not set")
+    
+    async def warm_up(self):
+        """Verify the token and prime the user lookup (run after startup)"""
+        if not self.enabled:
+            return
         try:
-            if not config.MOCK_MODE:
-                from github import Github, Auth
-                print("🔄 Initializing GitHub client...")
-                self.auth = Auth.Token(config.GITHUB_TOKEN)
-                self.g = Github(auth=self.auth)
-                user = self.g.get_user()
-                print(f"✅ GitHub client initialized for user: {user.login}")
-            else:
-                print("✅ GitHub client initialized (MOCK MODE)")
+            print("🔄 Initializing GitHub client...")
+            login = await self.get_user_login()
+            print(f"✅ GitHub client initialized for user: {login}")
         except Exception as e:
             print(f"❌ GitHub client initialization failed: {e}")
+            self.enabled = False
+            return
+        await self.repo_pool.start()
     
-    def create_repo(self, repo_name: str):
+    @traced("github.create_repo")
+    async def create_repo(self, repo_name: str, description: str = ""):
         """Create repository if it doesn't exist, or return existing one"""
-        if config.MOCK_MODE or not self.g:
+        if config.MOCK_MODE or not self.enabled:
             return self._mock_create_repo(repo_name)
         
         try:
-            from github import GithubException
-            user = self.g.get_user()
-            
-            # Try to get existing repo first
-            try:
-                repo = user.get_repo(repo_name)
+            # Try to get existing repo first (served from the metadata cache when fresh)
+            repo = await self._get_cached(self._repo_cache, repo_name, self._repo_path(repo_name))
+            if repo is not None:
                 print(f"📁 Found existing repository: {repo_name}")
                 return {
                     "status": 200,
                     "response": {
-                        "name": repo.name,
-                        "html_url": repo.html_url,
-                        "clone_url": repo.clone_url,
+                        "name": repo["name"],
+                        "html_url": repo["html_url"],
+                        "clone_url": repo["clone_url"],
                     },
                     "existing": True
                 }
-            except GithubException:
+            
+            # A pooled placeholder already has main and Pages set up
+            repo = await self.repo_pool.claim(repo_name, description) if self.repo_pool.size else None
+            if repo is not None:
+                return {
+                    "status": 201,
+                    "response": {
+                        "name": repo["name"],
+                        "html_url": repo["html_url"],
+                        "clone_url": repo["clone_url"],
+                    },
+                    "existing": False,
+                    "pooled": True
+                }
+            else:
                 # Repo doesn't exist, create it
                 print(f"🆕 Creating new repository: {repo_name}")
-                repo = user.create_repo(repo_name, private=False, auto_init=False)
+                self.invalidate(repo_name)
+                response = await self._api("POST", "/user/repos", json={
+                    "name": repo_name, "private": False, "auto_init": False, "description": description,
+                })
+                repo = response.json()
+                self._store_cached(self._repo_cache, repo_name, response)
                 
                 # Add initial README to initialize the main branch
-                repo.create_file("README.md", "Initial commit", f"# {repo_name}\n\nInitial repository.", branch="main")
+                await self._api("PUT", f"{self._repo_path(repo_name)}/contents/README.md", json={
+                    "message": "Initial commit",
+                    "content": _b64(f"# {repo_name}\n\nInitial repository."),
+                    "branch": "main",
+                })
                 
                 print(f"✅ Created new repository: {repo_name}")
                 return {
                     "status": 201,
                     "response": {
-                        "name": repo.name,
-                        "html_url": repo.html_url,
-                        "clone_url": repo.clone_url,
+                        "name": repo["name"],
+                        "html_url": repo["html_url"],
+                        "clone_url": repo["clone_url"],
                     },
                     "existing": False
                 }
                 
         except Exception as e:
+            # A placeholder repo would only make the push fail later; fail the deploy here
             print(f"❌ GitHub repo operation failed: {e}")
-            return self._mock_create_repo(repo_name)
+            raise
     
-    def push_files(self, repo_name: str, files: dict, commit_message: str):
-        """Push files to repository (creates initial files)"""
-        if config.MOCK_MODE or not self.g:
+    @traced("github.push_files")
+    async def push_files(self, repo_name: str, files: dict, commit_message: str):
+        """
+        Push files to repository as a single commit on main.
+        Unchanged files are skipped; a content of None deletes the path.
+        """
+        if config.MOCK_MODE or not self.enabled:
             return self._mock_push_files(repo_name, files)
         
         try:
-            repo = self.g.get_repo(f"{config.GITHUB_USER}/{repo_name}")
-            latest_commit_sha = ""
-            
-            for file_path, content in files.items():
-                try:
-                    # Try to get existing file
-                    existing_file = repo.get_contents(file_path, ref="main")
-                    # Update existing file
-                    result = repo.update_file(
-                        path=file_path,
-                        message=commit_message,
-                        content=content,
-                        sha=existing_file.sha,
-                        branch="main"
-                    )
-                    latest_commit_sha = result['commit'].sha
-                    print(f"✅ Updated: {file_path}")
-                except Exception:
-                    # Create new file
-                    result = repo.create_file(
-                        path=file_path,
-                        message=commit_message,
-                        content=content,
-                        branch="main"
-                    )
-                    latest_commit_sha = result['commit'].sha
-                    print(f"✅ Created: {file_path}")
-            
-            return {"status": 200, "response": {"commit_sha": latest_commit_sha}}
+            if config.PUSH_MODE == "contents":
+                return await self._push_files_via_contents(repo_name, files, commit_message)
+            return await self._push_files_via_git_data(repo_name, files, commit_message)
         except Exception as e:
+            # Never report a placeholder commit for a push that didn't happen
             print(f"❌ GitHub file push failed: {e}")
-            return self._mock_push_files(repo_name, files)
+            raise
+    
+    async def update_repo(self, repo_name: str, files: dict, commit_message: str):
+        """Update existing repository with new files (same single-commit path as push_files)"""
+        return await self.push_files(repo_name, files, commit_message)
+    
+    def prefetch_blob(self, repo_name: str, content: str):
+        """
+        Start uploading a blob before the push (e.g. while the LLM is still
+        streaming other files); push_files reuses it if the content matches.
+        Must be called from the event loop.
+        """
+        if config.MOCK_MODE or not self.enabled or config.PUSH_MODE != "git_data":
+            return
+        key = (repo_name, git_blob_sha(content))
+        if key in self._blob_uploads:
+            return
+        if len(self._blob_uploads) > 1000:
+            # Uploads that were never claimed by a push
+            self._blob_uploads.clear()
+        task = asyncio.ensure_future(self._create_blob(repo_name, content))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._blob_uploads[key] = task
+    
+    async def _create_blob(self, repo_name: str, content: str) -> str:
+        response = await self._api("POST", f"{self._repo_path(repo_name)}/git/blobs",
+                                   json={"content": content, "encoding": "utf-8"})
+        return response.json()["sha"]
+    
+    async def _get_main_tree(self, repo_name: str, refresh: bool = False):
+        """
+        Head commit of main and the blob SHA of every path in its tree.
+        Fetched once per repo and kept current by our own pushes.
+        Returns None for an empty repository.
+        """
+        if not refresh and repo_name in self._tree_cache:
+            return self._tree_cache[repo_name]
+        
+        repo_path = self._repo_path(repo_name)
+        try:
+            ref = (await self._api("GET", f"{repo_path}/git/ref/heads/main")).json()
+        except GitHubAPIError as e:
+            # 404/409: empty repository, the first commit creates main
+            if e.status not in (404, 409):
+                raise
+            return None
+        
+        commit_sha = ref["object"]["sha"]
+        commit = (await self._api("GET", f"{repo_path}/git/commits/{commit_sha}")).json()
+        tree_sha = commit["tree"]["sha"]
+        tree = (await self._api("GET", f"{repo_path}/git/trees/{tree_sha}",
+                                params={"recursive": "1"})).json()
+        head = {
+            "commit_sha": commit_sha,
+            "tree_sha": tree_sha,
+            "blobs": {item["path"]: item["sha"] for item in tree.get("tree", []) if item["type"] == "blob"},
+        }
+        self._tree_cache[repo_name] = head
+        return head
+    
+    async def get_files(self, repo_name: str, known: dict = None, max_bytes: int = 200_000):
+        """
+        Text files on main as {"commit_sha": ..., "files": {...}}, or None
+        for an empty repo. `known` (a saved revision in the same shape) is
+        returned as is while it is still main's head; otherwise blobs are
+        read back through the Git Data API, leaving out binary files and
+        files over max_bytes.
+        """
+        if config.MOCK_MODE or not self.enabled:
+            return known
+        head = await self._get_main_tree(repo_name)
+        if head is None:
+            return None
+        if known is not None and known.get("commit_sha") == head["commit_sha"]:
+            return known
+        
+        repo_path = self._repo_path(repo_name)
+        semaphore = asyncio.Semaphore(max(1, config.PUSH_CONCURRENCY))
+        
+        async def read_blob(path, sha):
+            async with semaphore:
+                blob = (await self._api("GET", f"{repo_path}/git/blobs/{sha}")).json()
+            try:
+                data = base64.b64decode(blob["content"])
+                return path, data.decode("utf-8") if len(data) <= max_bytes else None
+            except (KeyError, ValueError):
+                return path, None
+        
+        results = await asyncio.gather(*(read_blob(path, sha) for path, sha in head["blobs"].items()))
+        files = {path: content for path, content in results if content is not None}
+        print(f"📥 Read {len(files)} files of {repo_name} at {head['commit_sha'][:7]}")
+        return {"commit_sha": head["commit_sha"], "files": files}
+    
+    async def _push_files_via_git_data(self, repo_name: str, files: dict, commit_message: str):
+        """
+        Diff against main's tree using locally computed blob SHAs, then upload
+        only changed blobs and write one tree, one commit and one ref update.
+        """
+        repo_path = self._repo_path(repo_name)
+        semaphore = asyncio.Semaphore(max(1, config.PUSH_CONCURRENCY))
+        
+        async def create_blob(file_path, content):
+            prefetched = self._blob_uploads.pop((repo_name, git_blob_sha(content)), None)
+            if prefetched is not None:
+                try:
+                    return file_path, await prefetched
+                except Exception as e:
+                    print(f"⚠️ Prefetched blob for {file_path} failed, re-uploading: {e}")
+            async with semaphore:
+                return file_path, await self._create_blob(repo_name, content)
+        
+        for attempt in range(2):
+            head = await self._get_main_tree(repo_name, refresh=attempt > 0)
+            current = head["blobs"] if head else {}
+            local_shas = {path: git_blob_sha(content) for path, content in files.items() if content is not None}
+            changed = [path for path, sha in local_shas.items() if current.get(path) != sha]
+            deleted = [path for path, content in files.items() if content is None and path in current]
+            unchanged = [path for path in local_shas if path not in changed]
+            for path in unchanged:
+                self._blob_uploads.pop((repo_name, local_shas[path]), None)
+            
+            if head is not None and not changed and not deleted:
+                print(f"⏭️ No changes for {repo_name}, keeping {head['commit_sha'][:7]}")
+                return {"status": 200, "response": {
+                    "commit_sha": head["commit_sha"], "changed": [], "deleted": [],
+                    "unchanged": unchanged, "noop": True,
+                }}
+            
+            await asyncio.gather(*(create_blob(path, files[path]) for path in changed))
+            print(f"✅ Uploaded {len(changed)} changed blobs ({len(unchanged)} unchanged)")
+            
+            tree_elements = [
+                {"path": path, "mode": "100644", "type": "blob", "sha": local_shas[path]}
+                for path in changed
+            ] + [
+                {"path": path, "mode": "100644", "type": "blob", "sha": None}
+                for path in deleted
+            ]
+            tree_request = {"tree": tree_elements}
+            if head is not None:
+                tree_request["base_tree"] = head["tree_sha"]
+            tree = (await self._api("POST", f"{repo_path}/git/trees", json=tree_request)).json()
+            commit = (await self._api("POST", f"{repo_path}/git/commits", json={
+                "message": commit_message,
+                "tree": tree["sha"],
+                "parents": [head["commit_sha"]] if head else [],
+            })).json()
+            
+            try:
+                if head is not None:
+                    await self._api("PATCH", f"{repo_path}/git/refs/heads/main", json={"sha": commit["sha"]})
+                else:
+                    await self._api("POST", f"{repo_path}/git/refs", json={
+                        "ref": "refs/heads/main", "sha": commit["sha"]
+                    })
+            except GitHubAPIError as e:
+                # main moved since we cached it (not a fast-forward): re-diff once
+                if e.status != 422 or attempt > 0:
+                    raise
+                print(f"🔄 main moved in {repo_name}, refreshing tree and retrying")
+                continue
+            break
+        
+        # A new commit triggers a Pages build, so revalidate its status next time
+        if repo_name in self._pages_cache:
+            self._pages_cache[repo_name]["fetched_at"] = 0.0
+        
+        blobs = {path: sha for path, sha in current.items() if path not in deleted}
+        blobs.update(local_shas)
+        self._tree_cache[repo_name] = {"commit_sha": commit["sha"], "tree_sha": tree["sha"], "blobs": blobs}
+        
+        print(f"✅ Committed {len(changed)} changed and {len(deleted)} deleted files to main: {commit['sha'][:7]}")
+        return {"status": 200, "response": {
+            "commit_sha": commit["sha"], "changed": changed, "deleted": deleted,
+            "unchanged": unchanged, "noop": False,
+        }}
     
-    def update_repo(self, repo_name: str, files: dict, commit_message: str):
-        """Update existing repository with new files (alias for push_files)"""
-        # For now, update_repo does the same as push_files since push_files
-        # already handles both creating and updating files
-        return self.push_files(repo_name, files, commit_message)
+    async def _push_files_via_contents(self, repo_name: str, files: dict, commit_message: str):
+        """Legacy push: one Contents API commit per file"""
+        latest_commit_sha = ""
+        changed, deleted, unchanged = [], [], []
+        
+        for file_path, content in files.items():
+            contents_path = f"{self._repo_path(repo_name)}/contents/{file_path}"
+            try:
+                # Try to get existing file
+                existing_file = (await self._api("GET", contents_path, params={"ref": "main"})).json()
+            except GitHubAPIError:
+                existing_file = None
+            
+            if content is None:
+                if existing_file is None:
+                    continue
+                result = (await self._api("DELETE", contents_path, json={
+                    "message": commit_message, "sha": existing_file["sha"], "branch": "main"
+                })).json()
+                deleted.append(file_path)
+                print(f"✅ Deleted: {file_path}")
+            elif existing_file is not None and existing_file["sha"] == git_blob_sha(content):
+                unchanged.append(file_path)
+                continue
+            else:
+                payload = {"message": commit_message, "content": _b64(content), "branch": "main"}
+                if existing_file is not None:
+                    payload["sha"] = existing_file["sha"]
+                result = (await self._api("PUT", contents_path, json=payload)).json()
+                changed.append(file_path)
+                print(f"✅ {'Updated' if existing_file else 'Created'}: {file_path}")
+            latest_commit_sha = result['commit']['sha']
+        
+        if not latest_commit_sha:
+            ref = (await self._api("GET", f"{self._repo_path(repo_name)}/git/ref/heads/main")).json()
+            latest_commit_sha = ref["object"]["sha"]
+        
+        return {"status": 200, "response": {
+            "commit_sha": latest_commit_sha, "changed": changed, "deleted": deleted,
+            "unchanged": unchanged, "noop": not changed and not deleted,
+        }}
     
-    def enable_pages(self, repo_name: str):
+    @traced("github.enable_pages")
+    async def enable_pages(self, repo_name: str):
         """Enable GitHub Pages"""
-        if config.MOCK_MODE:
+        if config.MOCK_MODE or not self.enabled:
             return self._mock_enable_pages(repo_name)
         
         try:
             # Use the direct API approach
-            return self._enable_pages_via_api(repo_name)
+            return await self._enable_pages_via_api(repo_name)
         except Exception as e:
             print(f"❌ Pages enable failed: {e}")
+            FALLBACKS.inc(kind="github_pages")
             return self._mock_enable_pages(repo_name)
     
-    def _enable_pages_via_api(self, repo_name: str):
+    async def _enable_pages_via_api(self, repo_name: str):
         """Enable Pages using GitHub REST API"""
-        import requests
-        
-        headers = {
-            "Authorization": f"token {config.GITHUB_TOKEN}",
-            "Accept": "application/vnd.github.v3+json"
-        }
+        api_path = f"{self._repo_path(repo_name)}/pages"
         
-        api_url = f"https://api.github.com/repos/{config.GITHUB_USER}/{repo_name}/pages"
+        # Check current Pages status (served from the metadata cache when fresh)
+        pages_data = await self._get_cached(self._pages_cache, repo_name, api_path)
         
-        # Check current Pages status
-        response = requests.get(api_url, headers=headers)
-        
-        if response.status_code == 200:
-            pages_data = response.json()
+        if pages_data is not None:
             html_url = pages_data.get('html_url', f"https://{config.GITHUB_USER}.github.io/{repo_name}/")
             print(f"✅ GitHub Pages already enabled: {html_url}")
             return {
@@ -160,10 +412,11 @@ class GitHubManager:
             }
         }
         
-        response = requests.post(api_url, headers=headers, json=pages_config)
+        response = await self._request("POST", api_path, json=pages_config)
         
         if response.status_code in [200, 201]:
             pages_data = response.json()
+            self._store_cached(self._pages_cache, repo_name, response)
             html_url = pages_data.get('html_url', f"https://{config.GITHUB_USER}.github.io/{repo_name}/")
             print(f"✅ GitHub Pages enabled successfully: {html_url}")
             return {
@@ -179,6 +432,121 @@ class GitHubManager:
                 "response": {"html_url": html_url}
             }
     
+    async def rename_repo(self, old_name: str, new_name: str, description: str = "") -> dict:
+        """
+        Rename a repo and replace its description in the same request (Pages
+        moves to the new name's URL); returns the new metadata
+        """
+        response = await self._api("PATCH", self._repo_path(old_name), json={
+            "name": new_name, "description": description,
+        })
+        self.invalidate(old_name)
+        self.invalidate(new_name)
+        return self._store_cached(self._repo_cache, new_name, response)
+    
+    async def provision_placeholder(self, repo_name: str):
+        """Create a repo for the pool: main initialized and Pages enabled, as a new task needs"""
+        await self._api("POST", "/user/repos", json={
+            "name": repo_name, "private": False, "auto_init": False,
+            "description": "Reserved for an upcoming deployment",
+        })
+        await self._api("PUT", f"{self._repo_path(repo_name)}/contents/README.md", json={
+            "message": "Initial commit",
+            "content": _b64(f"# {repo_name}\n\nReserved for an upcoming deployment."),
+            "branch": "main",
+        })
+        await self._api("POST", f"{self._repo_path(repo_name)}/pages", json={
+            "source": {"branch": "main", "path": "/"}
+        })
+    
+    async def get_pages_build(self, repo_name: str, commit_sha: str):
+        """
+        The Pages build of commit_sha among the repo's recent builds, with
+        "superseded" set when a later commit has been built since. None until
+        the build is queued, or when Pages doesn't build from a branch.
+        """
+        if config.MOCK_MODE or not self.enabled:
+            return None
+        response = await self._request("GET", f"{self._repo_path(repo_name)}/pages/builds",
+                                       params={"per_page": 10})
+        if response.status_code == 404:
+            return None
+        if response.status_code >= 400:
+            raise GitHubAPIError(response.status_code, response.text)
+        builds = response.json()  # newest first
+        for index, build in enumerate(builds):
+            if build.get("commit") == commit_sha:
+                superseded = any(newer.get("status") == "built" for newer in builds[:index])
+                return {**build, "superseded": superseded}
+        return None
+    
+    async def get_user_login(self) -> str:
+        """Login of the authenticated user, looked up once"""
+        if self._user_login is None:
+            self._user_login = (await self._api("GET", "/user")).json()["login"]
+        return self._user_login
+    
+    def invalidate(self, repo_name: str):
+        """Forget cached metadata for a repo we are about to create or reconfigure"""
+        self._repo_cache.pop(repo_name, None)
+        self._pages_cache.pop(repo_name, None)
+        self._tree_cache.pop(repo_name, None)
+    
+    async def _get_cached(self, cache: dict, key: str, path: str):
+        """
+        GET a metadata resource, reusing the local copy within
+        GITHUB_METADATA_TTL and revalidating it with If-None-Match after that
+        (304s don't count against the rate limit). Returns None on 404.
+        """
+        entry = cache.get(key)
+        now = time.monotonic()
+        if entry is not None and now - entry["fetched_at"] < config.GITHUB_METADATA_TTL:
+            self.metadata_stats["hits"] += 1
+            return entry["data"]
+        
+        headers = {"If-None-Match": entry["etag"]} if entry and entry["etag"] else {}
+        response = await self._request("GET", path, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            entry["fetched_at"] = now
+            self.metadata_stats["revalidated"] += 1
+            return entry["data"]
+        if response.status_code == 404:
+            cache.pop(key, None)
+            return None
+        if response.status_code >= 400:
+            raise GitHubAPIError(response.status_code, response.text)
+        self.metadata_stats["fetched"] += 1
+        return self._store_cached(cache, key, response)
+    
+    def _store_cached(self, cache: dict, key: str, response):
+        data = response.json()
+        cache[key] = {"data": data, "etag": response.headers.get("ETag"), "fetched_at": time.monotonic()}
+        return data
+    
+    async def _request(self, method: str, path: str, **kwargs):
+        """
+        Call the GitHub REST API through the shared pooled client, admitted
+        by the rate-limit scheduler (which retries rate-limited responses)
+        """
+        headers = {
+            "Authorization": f"token {config.GITHUB_TOKEN}",
+            "Accept": "application/vnd.github.v3+json",
+            **kwargs.pop("headers", {}),
+        }
+        return await self.scheduler.request(method, lambda: http_client.get_client().request(
+            method, f"{config.GITHUB_API_URL}{path}", headers=headers, **kwargs
+        ))
+    
+    async def _api(self, method: str, path: str, **kwargs):
+        """Like _request, but raises GitHubAPIError on 4xx/5xx responses"""
+        response = await self._request(method, path, **kwargs)
+        if response.status_code >= 400:
+            raise GitHubAPIError(response.status_code, response.text)
+        return response
+    
+    def _repo_path(self, repo_name: str) -> str:
+        return f"/repos/{config.GITHUB_USER}/{repo_name}"
+    
     def _mock_create_repo(self, repo_name: str):
         return {
             "mocked": True,
@@ -191,7 +559,13 @@ class GitHubManager:
     def _mock_push_files(self, repo_name: str, files: dict):
         return {
             "mocked": True,
-            "response": {"commit_sha": "mock_commit_sha"}
+            "response": {
+                "commit_sha": "mock_commit_sha",
+                "changed": [path for path, content in files.items() if content is not None],
+                "deleted": [path for path, content in files.items() if content is None],
+                "unchanged": [],
+                "noop": False,
+            }
         }
     
     def _mock_enable_pages(self, repo_name: str):
@@ -200,5 +574,3 @@ class GitHubManager:
             "mocked": True,
             "response": {"html_url": pages_url}
         }
-# Create instance but don't initialize immediately
-github_manager = GitHubManager()
\ No newline at end of file
@@ -0,0 +1,95 @@
+import time
+from typing import Optional, TYPE_CHECKING
+from . import config
+from .metrics import UPSTREAM_IN_FLIGHT, UPSTREAM_SECONDS
+
+if TYPE_CHECKING:
+    import httpx
+
+# One pooled async client shared by the AIPipe, GitHub and evaluation calls.
+# httpx keeps a separate keep-alive pool per origin, so each upstream host
+# reuses its own TCP/TLS connections.
+_client: Optional["httpx.AsyncClient"] = None
+
+# Replaces the network transport, e.g. with the in-process fakes for benchmarks
+_transport_override: Optional["httpx.AsyncBaseTransport"] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _instrumented(transport: "httpx.AsyncBaseTransport") -> "httpx.AsyncBaseTransport":
+    """Wrap a transport to record per-upstream latency and in-flight requests"""
+    import httpx
+    
+    class InstrumentedTransport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            host = request.url.host
+            start = time.perf_counter()
+            status = "error"
+            UPSTREAM_IN_FLIGHT.inc(host=host)
+            try:
+                # Returns once headers arrive; streamed bodies are read afterwards
+                response = await transport.handle_async_request(request)
+                status = str(response.status_code)
+                return response
+            finally:
+                UPSTREAM_IN_FLIGHT.dec(host=host)
+                UPSTREAM_SECONDS.observe(time.perf_counter() - start, host=host,
+                                         method=request.method, status=status)
+        
+        async def aclose(self):
+            await transport.aclose()
+    
+    return InstrumentedTransport()
+
+
+def _build_client() -> "httpx.AsyncClient":
+    # Imported here to keep it off the app's import path
+    import httpx
+    
+    http2 = config.HTTP2_ENABLED and _http2_available()
+    limits = httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+    client = httpx.AsyncClient(
+        timeout=httpx.Timeout(config.HTTP_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT),
+        transport=_instrumented(_transport_override or httpx.AsyncHTTPTransport(http2=http2, limits=limits)),
+        headers={"User-Agent": "LLM-Code-Deployer/1.0"},
+    )
+    print(f"✅ HTTP client ready (HTTP/2: {'on' if http2 else 'off'}, "
+          f"max {config.HTTP_MAX_CONNECTIONS} connections)")
+    return client
+
+
+def get_client() -> "httpx.AsyncClient":
+    """Return the shared client, creating it on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+def use_transport(transport: "httpx.AsyncBaseTransport"):
+    """Send all upstream calls through transport (takes effect for the next client built)"""
+    global _transport_override, _client
+    _transport_override = transport
+    _client = None
+
+
+async def startup():
+    get_client()
+
+
+async def shutdown():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,78 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+from .jobs import DeployJob
+
+
+class IdempotencyRecord:
+    """The job that owns an idempotency key, or its final state once it succeeded"""
+
+    def __init__(self, job: DeployJob):
+        self.job_id = job.id
+        self.job: Optional[DeployJob] = job
+        self.snapshot: Optional[Dict] = None
+        self.created_at = time.time()
+
+    @property
+    def done(self) -> bool:
+        return self.job is None
+
+    def view(self) -> Dict:
+        return self.snapshot if self.job is None else self.job.to_dict()
+
+
+class IdempotencyStore:
+    """
+    Bounded, expiring map of deploy keys (task, round, nonce) to jobs.
+
+    A duplicate request that arrives while its job is queued or running
+    attaches to that job; one that arrives after the job succeeded gets
+    the stored result. Failed jobs release their key so a retry runs the
+    pipeline again.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._records: "OrderedDict[Hashable, IdempotencyRecord]" = OrderedDict()
+        self.counters = {"attached": 0, "replayed": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    def get(self, key: Hashable) -> Optional[IdempotencyRecord]:
+        """Return the live or completed record for key, counting it as a duplicate hit"""
+        record = self._records.get(key)
+        if record is None:
+            self.counters["misses"] += 1
+            return None
+        if time.time() - record.created_at > self.ttl:
+            del self._records[key]
+            self.counters["expired"] += 1
+            self.counters["misses"] += 1
+            return None
+        job = record.job
+        if job is not None and job.done:
+            if job.status != "succeeded":
+                del self._records[key]
+                self.counters["misses"] += 1
+                return None
+            # Keep only the final state, not the job and its event log
+            record.snapshot = job.to_dict()
+            record.job = None
+        self._records.move_to_end(key)
+        self.counters["replayed" if record.done else "attached"] += 1
+        return record
+
+    def put(self, key: Hashable, job: DeployJob) -> IdempotencyRecord:
+        record = IdempotencyRecord(job)
+        self._records[key] = record
+        self._records.move_to_end(key)
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+            self.counters["evicted"] += 1
+        return record
+
+    def discard(self, key: Hashable):
+        self._records.pop(key, None)
+
+    def stats(self) -> Dict:
+        return {"entries": len(self._records), **self.counters}
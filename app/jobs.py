@@ -0,0 +1,394 @@
+import asyncio
+import heapq
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .metrics import DEPLOY_SECONDS, STAGE_SECONDS
+from .tracing import span, trace
+
+# Pipeline stages in dependency order; independent ones run concurrently (see StageGraph)
+DEPLOY_STAGES = ["attachments", "generate", "checks", "repo", "push", "pages", "notify"]
+
+
+class QueueFullError(Exception):
+    """Raised when the deploy queue cannot accept more jobs"""
+
+
+class DeployJob:
+    """A single queued deployment and its per-stage progress"""
+
+    def __init__(self, request: Any, stages: List[str] = None):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.stages: Dict[str, Dict] = {
+            name: {"status": "pending"} for name in (stages or DEPLOY_STAGES)
+        }
+        self.events: List[Dict] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None
+        try:
+            self._loop = asyncio.get_running_loop()
+            self._changed = asyncio.Event()
+        except RuntimeError:
+            pass
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    @contextmanager
+    def stage(self, name: str):
+        """Track a pipeline stage; marks it failed and re-raises on error"""
+        info = self.stages.setdefault(name, {"status": "pending"})
+        info["status"] = "running"
+        info["started_at"] = time.time()
+        self.emit("stage", {"stage": name, "status": "running"})
+        with span(f"stage.{name}"):
+            try:
+                yield info
+            except Exception as e:
+                info["status"] = "failed"
+                info["error"] = str(e)
+                raise
+            else:
+                info["status"] = "done"
+            finally:
+                info["duration"] = time.time() - info["started_at"]
+                STAGE_SECONDS.observe(info["duration"], stage=name, status=info["status"])
+                self.emit("stage", {"stage": name, "status": info["status"],
+                                    "duration": info["duration"]})
+
+    def skip_stage(self, name: str, reason: str = ""):
+        self.stages[name] = {"status": "skipped", "reason": reason}
+        self.emit("stage", {"stage": name, "status": "skipped"})
+
+    def resume_stage(self, name: str):
+        """Mark a stage completed by an earlier attempt of the same deploy"""
+        self.stages[name] = {"status": "resumed"}
+        self.emit("stage", {"stage": name, "status": "resumed"})
+
+    def emit(self, event: str, data: Dict = None):
+        """Record a progress event; safe to call from worker threads"""
+        self.events.append({
+            "seq": len(self.events),
+            "event": event,
+            "time": time.time(),
+            "data": data or {},
+        })
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._changed.set)
+
+    async def stream_events(self, heartbeat: float = 15.0):
+        """Yield events as they are recorded (None on idle heartbeats) until the job finishes"""
+        seq = 0
+        while True:
+            self._changed.clear()
+            while seq < len(self.events):
+                yield self.events[seq]
+                seq += 1
+            if self.done:
+                return
+            try:
+                await asyncio.wait_for(self._changed.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+
+    async def wait(self):
+        """Wait until the job has finished"""
+        async for _ in self.stream_events(heartbeat=1.0):
+            pass
+
+    def to_dict(self) -> Dict:
+        request = self.request
+        return {
+            "job_id": self.id,
+            "trace_id": self.id,
+            "status": self.status,
+            "task": getattr(request, "task", None),
+            "round": getattr(request, "round", None),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "stages": self.stages,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class StageGraph:
+    """
+    Runs stages as soon as the stages they depend on have finished, so
+    independent work overlaps. Each stage function receives the results of
+    the stages finished so far. If one fails, stages that don't depend on
+    it still run to completion (so their work is kept) and then its error
+    is raised. After run(), `elapsed` is the wall time.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, tuple] = {}
+        self.elapsed = 0.0
+
+    def add(self, name: str, fn: Callable[[Dict[str, Any]], Awaitable[Any]], after: List[str] = ()):
+        missing = [dep for dep in after if dep not in self._stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stages {missing}")
+        self._stages[name] = (fn, list(after))
+
+    async def run(self) -> Dict[str, Any]:
+        results: Dict[str, Any] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(name: str):
+            fn, after = self._stages[name]
+            if after:
+                await asyncio.gather(*(tasks[dep] for dep in after))
+            results[name] = await fn(results)
+
+        started = time.monotonic()
+        for name in self._stages:
+            tasks[name] = asyncio.ensure_future(run_stage(name))
+        try:
+            # Dependents of a failed stage fail with its error as they await it
+            outcomes = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            self.elapsed = time.monotonic() - started
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+        return results
+
+
+class StageLimits:
+    """Per-stage concurrency caps shared by every running pipeline"""
+
+    def __init__(self, limits: Dict[str, int]):
+        self.limits = {name: max(1, limit) for name, limit in limits.items()}
+        self._semaphores = {name: asyncio.Semaphore(limit) for name, limit in self.limits.items()}
+        self._in_use = {name: 0 for name in self.limits}
+        self._waiting = {name: 0 for name in self.limits}
+
+    @asynccontextmanager
+    async def acquire(self, name: str):
+        """Hold a slot of the named stage; unknown stages are not limited"""
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            yield
+            return
+        self._waiting[name] += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting[name] -= 1
+        self._in_use[name] += 1
+        try:
+            yield
+        finally:
+            self._in_use[name] -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict:
+        return {
+            name: {"limit": limit, "in_use": self._in_use[name], "waiting": self._waiting[name]}
+            for name, limit in self.limits.items()
+        }
+
+
+class KeyedLocks:
+    """
+    One lock per key (a repo name): holders of the same key run one at a
+    time while different keys proceed concurrently. Waiters are admitted
+    in `order` (the deploy round), then arrival, so a retried round 1
+    can't overwrite a round 2 that queued behind it. Idle keys are dropped.
+    """
+
+    def __init__(self):
+        self._keys: Dict[str, Dict] = {}
+        self._sequence = 0
+
+    @asynccontextmanager
+    async def acquire(self, key: str, order: int = 0):
+        state = self._keys.setdefault(key, {"held": False, "waiters": [], "since": None, "acquired": 0})
+        if state["held"] or state["waiters"]:
+            self._sequence += 1
+            entry = (order, self._sequence, asyncio.get_running_loop().create_future())
+            heapq.heappush(state["waiters"], entry)
+            try:
+                await entry[2]
+            except asyncio.CancelledError:
+                if entry[2].done() and not entry[2].cancelled():
+                    # Handed the lock as we were cancelled: pass it on
+                    self._release(key, state)
+                else:
+                    state["waiters"].remove(entry)
+                    heapq.heapify(state["waiters"])
+                    self._drop_if_idle(key, state)
+                raise
+        state["held"] = True
+        state["since"] = time.time()
+        state["acquired"] += 1
+        try:
+            yield
+        finally:
+            self._release(key, state)
+
+    def _release(self, key: str, state: Dict):
+        while state["waiters"]:
+            _, _, future = heapq.heappop(state["waiters"])
+            if not future.done():
+                # Ownership passes directly, so a newcomer can't jump the queue
+                future.set_result(None)
+                return
+        state["held"] = False
+        state["since"] = None
+        self._drop_if_idle(key, state)
+
+    def _drop_if_idle(self, key: str, state: Dict):
+        if not state["held"] and not state["waiters"] and self._keys.get(key) is state:
+            del self._keys[key]
+
+    def depth(self, key: str) -> int:
+        """Holders plus waiters for a key"""
+        state = self._keys.get(key)
+        return (int(state["held"]) + len(state["waiters"])) if state else 0
+
+    def stats(self) -> Dict:
+        now = time.time()
+        keys = {
+            key: {
+                "held": state["held"],
+                "waiting": len(state["waiters"]),
+                "held_seconds": round(now - state["since"], 3) if state["since"] else None,
+            }
+            for key, state in self._keys.items()
+        }
+        return {
+            "active": sum(1 for s in keys.values() if s["held"]),
+            "waiting": sum(s["waiting"] for s in keys.values()),
+            "keys": keys,
+        }
+
+
+class JobQueue:
+    """Bounded queue of deploy jobs drained by a fixed pool of async workers"""
+
+    def __init__(self, handler: Callable[[DeployJob], Awaitable[Dict]],
+                 workers: int = 4, maxsize: int = 100, history_limit: int = 500):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.maxsize = maxsize
+        self.history_limit = history_limit
+        self.jobs: "OrderedDict[str, DeployJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._spawned: set = set()
+
+    async def start(self):
+        """Start the worker pool (call from the app's startup hook)"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        print(f"✅ Deploy job queue started with {self.workers} workers")
+
+    async def stop(self):
+        """Cancel the workers; jobs still queued are marked failed"""
+        tasks = self._tasks + list(self._spawned)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        for job in self.jobs.values():
+            if not job.done:
+                job.status = "failed"
+                job.error = "Service shutting down"
+                job.finished_at = time.time()
+                job.emit("failed", {"error": job.error})
+
+    def spawn(self, job: DeployJob) -> asyncio.Task:
+        """
+        Run a job right away instead of waiting for a worker (used by batch
+        deploys, whose fan-out is bounded by the per-stage limits instead)
+        """
+        self.jobs[job.id] = job
+        self._trim_history()
+        task = asyncio.create_task(self._execute(job))
+        # Keep a strong reference until the job finishes
+        self._spawned.add(task)
+        task.add_done_callback(self._spawned.discard)
+        return task
+
+    def submit(self, job: DeployJob) -> DeployJob:
+        """Enqueue a job without waiting; raises QueueFullError when saturated"""
+        if self._queue is None:
+            raise QueueFullError("Job queue is not running")
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Deploy queue is full ({self.maxsize} jobs waiting)")
+        self.jobs[job.id] = job
+        self._trim_history()
+        return job
+
+    def get(self, job_id: str) -> Optional[DeployJob]:
+        return self.jobs.get(job_id)
+
+    def stats(self) -> Dict:
+        """Worker pool and queue occupancy"""
+        running = sum(1 for job in self.jobs.values() if job.status == "running")
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": running,
+            "tracked_jobs": len(self.jobs),
+        }
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job: DeployJob):
+        job.status = "running"
+        job.started_at = time.time()
+        # The job id doubles as the trace id of everything the pipeline does
+        with trace(job.id), span("deploy", task=getattr(job.request, "task", None),
+                                 round=getattr(job.request, "round", None)) as attributes:
+            try:
+                job.result = await self.handler(job)
+                job.status = "succeeded"
+            except Exception as e:
+                print(f"❌ Deploy job {job.id} failed: {e}")
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                attributes["job_status"] = job.status
+                DEPLOY_SECONDS.observe(job.finished_at - job.started_at, status=job.status)
+                job.emit(job.status, {"error": job.error} if job.error else job.result)
+
+    def _trim_history(self):
+        """Forget the oldest finished jobs once the history limit is reached"""
+        if len(self.jobs) <= self.history_limit:
+            return
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= self.history_limit:
+                break
+            if self.jobs[job_id].done:
+                del self.jobs[job_id]
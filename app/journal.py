@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+def deploy_id(task: str, round: int, nonce: str) -> str:
+    """Stable id of a deploy, the same for every retry of a task/round/nonce"""
+    return hashlib.sha1(f"{task}\0{round}\0{nonce}".encode("utf-8")).hexdigest()[:16]
+
+
+class DeployJournal:
+    """
+    Append-only JSONL journal of deploy progress. Each completed stage
+    appends its outputs (spooled attachment digests, generated files, repo
+    URL, commit SHA, Pages URL, outbox id), so a retry or a restart resumes
+    after the last completed stage instead of paying for generation again.
+
+    Lines are {"id", "event", "at", "data"} where event is "accepted"
+    (with the request), "attempt", a stage name, "failed" or "completed".
+    Appends are written and fsynced off the event loop, several at a time
+    when they arrive together. The file is replayed into memory at startup
+    and rewritten without deploys older than `ttl` then and after every
+    `compact_after` appends.
+    """
+
+    def __init__(self, path: str, ttl: float = 24 * 3600, fsync: bool = True, compact_after: int = 1000):
+        self.path = path
+        self.ttl = ttl
+        self.fsync = fsync
+        self.compact_after = compact_after
+        self.deploys: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._pending: List[tuple] = []
+        self._writer: Optional[asyncio.Future] = None
+        self._appended = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._replay()
+        self._rewrite(self._snapshot())
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _replay(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        # A line cut short by a crash; everything before it stands
+                        continue
+        except OSError:
+            pass
+
+    def _apply(self, entry: Dict):
+        deploy = self.deploys.get(entry["id"])
+        if entry["event"] == "accepted":
+            if deploy is None:
+                deploy = self.deploys[entry["id"]] = {
+                    "id": entry["id"], "request": entry["data"], "stages": {},
+                    "status": "incomplete", "error": None, "attempts": 0,
+                    "created_at": entry["at"], "updated_at": entry["at"],
+                }
+            return
+        if deploy is None:
+            return
+        deploy["updated_at"] = entry["at"]
+        if entry["event"] == "attempt":
+            deploy["attempts"] = entry["data"]["number"]
+        elif entry["event"] == "failed":
+            deploy["error"] = entry["data"].get("error")
+        elif entry["event"] == "completed":
+            deploy["status"] = "completed"
+            deploy["result"] = entry["data"]
+            # Nothing resumes a completed deploy, so its payloads needn't stay in memory
+            deploy["stages"] = {stage: {} for stage in deploy["stages"]}
+        else:
+            deploy["stages"][entry["event"]] = entry["data"]
+            deploy["error"] = None
+
+    def _snapshot(self) -> List[Dict]:
+        """Drop expired deploys and return the entries that rebuild the rest"""
+        cutoff = time.time() - self.ttl
+        self.deploys = {key: d for key, d in self.deploys.items() if d["updated_at"] >= cutoff}
+        return [entry for deploy in self.deploys.values() for entry in self._entries(deploy)]
+
+    def _rewrite(self, entries: List[Dict]):
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + "\n")
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not compact the deploy journal: {e}")
+
+    @staticmethod
+    def _entries(deploy: Dict) -> List[Dict]:
+        at = deploy["updated_at"]
+        entries = [{"id": deploy["id"], "event": "accepted", "at": deploy["created_at"], "data": deploy["request"]}]
+        if deploy["attempts"]:
+            entries.append({"id": deploy["id"], "event": "attempt", "at": at, "data": {"number": deploy["attempts"]}})
+        entries += [{"id": deploy["id"], "event": stage, "at": at, "data": data}
+                    for stage, data in deploy["stages"].items()]
+        if deploy["error"]:
+            entries.append({"id": deploy["id"], "event": "failed", "at": at, "data": {"error": deploy["error"]}})
+        if deploy["status"] == "completed":
+            entries.append({"id": deploy["id"], "event": "completed", "at": at, "data": deploy.get("result")})
+        return entries
+
+    def _append(self, deploy_key: str, event: str, data: Dict) -> asyncio.Future:
+        """Apply an entry now and queue it for the writer; the future resolves once it is on disk"""
+        entry = {"id": deploy_key, "event": event, "at": time.time(), "data": data}
+        self._apply(entry)
+        written = asyncio.get_running_loop().create_future()
+        self._pending.append((json.dumps(entry) + "\n", written))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.ensure_future(self._write_pending())
+        return written
+
+    async def _write_pending(self):
+        while self._pending:
+            batch, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self._write, [line for line, _ in batch])
+            except Exception as e:
+                for _, written in batch:
+                    if not written.done():
+                        written.set_exception(e)
+                continue
+            self._appended += len(batch)
+            for _, written in batch:
+                if not written.done():
+                    written.set_result(None)
+            if self._appended >= self.compact_after and not self._pending:
+                # Nothing is queued, so the snapshot holds every applied entry exactly once
+                self._appended = 0
+                await asyncio.to_thread(self._compact, self._snapshot())
+
+    def _write(self, lines: List[str]):
+        with self._lock:
+            self._file.writelines(lines)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def _compact(self, entries: List[Dict]):
+        with self._lock:
+            self._file.close()
+            self._rewrite(entries)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    async def begin(self, deploy_key: str, request: Dict) -> int:
+        """
+        Record a deploy's request, once, and the start of another attempt at
+        it; later attempts resume the same entry. Returns the attempt number.
+        """
+        writes = []
+        if deploy_key not in self.deploys:
+            writes.append(self._append(deploy_key, "accepted", request))
+        number = self.deploys[deploy_key]["attempts"] + 1
+        writes.append(self._append(deploy_key, "attempt", {"number": number}))
+        await asyncio.gather(*writes)
+        return number
+
+    async def record(self, deploy_key: str, stage: str, data: Dict):
+        await self._append(deploy_key, stage, data)
+
+    async def fail(self, deploy_key: str, error: str):
+        await self._append(deploy_key, "failed", {"error": error})
+
+    async def complete(self, deploy_key: str, result: Dict):
+        await self._append(deploy_key, "completed", result)
+
+    def completed_stages(self, deploy_key: str) -> Dict[str, Dict]:
+        deploy = self.deploys.get(deploy_key)
+        return dict(deploy["stages"]) if deploy else {}
+
+    def get(self, deploy_key: str) -> Optional[Dict]:
+        return self.deploys.get(deploy_key)
+
+    def incomplete(self) -> List[Dict]:
+        return [d for d in self.deploys.values() if d["status"] != "completed"]
+
+    @staticmethod
+    def summary(deploy: Dict) -> Dict:
+        """A deploy without its payloads (request brief, generated files)"""
+        request = deploy["request"]
+        return {
+            "deploy_id": deploy["id"],
+            "task": request.get("task"),
+            "round": request.get("round"),
+            "status": deploy["status"],
+            "stages": list(deploy["stages"]),
+            "attempts": deploy["attempts"],
+            "error": deploy["error"],
+            "created_at": deploy["created_at"],
+            "updated_at": deploy["updated_at"],
+        }
+
+    def close(self):
+        """Write what is still queued and close the file"""
+        with self._lock:
+            self._file.writelines(line for line, _ in self._pending)
+            self._pending = []
+            self._file.close()
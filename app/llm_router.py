@@ -0,0 +1,258 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .tracing import span
+
+
+class LLMEndpoint:
+    """One model on one OpenAI-compatible base URL"""
+
+    def __init__(self, model: str, base_url: str, latency_window: int = 200):
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.latencies: deque = deque(maxlen=latency_window)
+        self.breaker: Optional["CircuitBreaker"] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.model}@{self.base_url}"
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def parse_endpoints(spec: str, default_base_url: str) -> List[LLMEndpoint]:
+    """Parse "model[@base_url],..." into endpoints, in fallback order"""
+    endpoints = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        model, _, base_url = item.partition("@")
+        endpoints.append(LLMEndpoint(model.strip(), base_url.strip() or default_base_url))
+    return endpoints
+
+
+class CircuitBreaker:
+    """
+    Opens after consecutive failures and rejects traffic for a cool-down
+    window; then lets a single trial request through (half-open). A trial
+    that is cancelled before it finishes (it lost a hedge, or the caller
+    gave up) must be handed back with abandon_trial().
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+            return True
+        # Half-open: the trial request is already in flight
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def abandon_trial(self):
+        """The trial ended without an outcome: the next request may try again"""
+        if self.state == "half_open":
+            # opened_at is unchanged, so the cool-down has already passed
+            self.state = "open"
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class LLMRouter:
+    """
+    Run a completion against a chain of endpoints.
+
+    The first attempt goes to the first endpoint whose breaker is closed.
+    If it hasn't answered by the hedge deadline (a recent latency
+    percentile of that endpoint) a second attempt is started on the next
+    endpoint in the chain; a failed attempt is replaced right away. The
+    first attempt to claim the response wins and the others are cancelled.
+
+    An attempt is called as attempt(endpoint, claim) and returns the
+    response or None on failure. It must call claim() once it has a
+    response (or, when streaming, its first token) and give up if claim()
+    returns False because another attempt already won.
+    """
+
+    def __init__(self, endpoints: List[LLMEndpoint], hedge: bool = True,
+                 hedge_percentile: float = 95, hedge_min_delay: float = 2.0,
+                 hedge_initial_delay: float = 10.0, hedge_min_samples: int = 20,
+                 max_attempts: int = 3, failure_threshold: int = 5, cooldown: float = 30.0):
+        if not endpoints:
+            raise ValueError("At least one LLM endpoint is required")
+        self.endpoints = endpoints
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_initial_delay = hedge_initial_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.max_attempts = max(1, max_attempts)
+        self.counters = {"requests": 0, "hedges": 0, "hedge_wins": 0,
+                         "fallbacks": 0, "rejected": 0, "exhausted": 0}
+        for endpoint in endpoints:
+            endpoint.breaker = CircuitBreaker(failure_threshold, cooldown)
+
+    def hedge_delay(self, endpoint: LLMEndpoint) -> float:
+        if len(endpoint.latencies) < self.hedge_min_samples:
+            return self.hedge_initial_delay
+        return max(self.hedge_min_delay, endpoint.percentile(self.hedge_percentile))
+
+    async def run(self, attempt: Callable[[LLMEndpoint, Callable[[], bool]], Awaitable]):
+        self.counters["requests"] += 1
+        pending: Dict[asyncio.Task, LLMEndpoint] = {}
+        launched: List[asyncio.Task] = []
+        hedged = set()
+        trials = set()  # attempts admitted by a half-open breaker
+        state = {"leader": None, "can_hedge": self.hedge}
+        started_at: Dict[asyncio.Task, float] = {}
+
+        def launch(endpoint: LLMEndpoint) -> asyncio.Task:
+            holder = {}
+            trial = endpoint.breaker.state == "half_open"
+
+            def claim() -> bool:
+                task = holder["task"]
+                if state["leader"] is None:
+                    state["leader"] = task
+                    endpoint.latencies.append(time.monotonic() - started_at[task])
+                    for other in pending:
+                        if other is not task:
+                            other.cancel()
+                return state["leader"] is task
+
+            number = len(launched) + 1
+
+            async def run_attempt():
+                with span("llm.attempt", model=endpoint.model, attempt=number) as attributes:
+                    result = await attempt(endpoint, claim)
+                    attributes["ok"] = result is not None
+                    return result
+
+            task = asyncio.create_task(run_attempt())
+            holder["task"] = task
+            started_at[task] = time.monotonic()
+            pending[task] = endpoint
+            launched.append(task)
+            if trial:
+                trials.add(task)
+            return task
+
+        try:
+            while True:
+                if not pending:
+                    endpoint = self._next_endpoint(len(launched))
+                    if endpoint is None:
+                        break
+                    if launched:
+                        self.counters["fallbacks"] += 1
+                        print(f"🔀 Falling back to {endpoint.model}")
+                    launch(endpoint)
+
+                # Hedge only while nobody has claimed the response yet
+                timeout = None
+                if state["can_hedge"] and state["leader"] is None and len(launched) < self.max_attempts:
+                    newest = launched[-1]
+                    timeout = max(0.0, self.hedge_delay(pending.get(newest, self.endpoints[0]))
+                                  - (time.monotonic() - started_at[newest]))
+
+                done, _ = await asyncio.wait(pending, timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    endpoint = self._next_endpoint(len(launched))
+                    if endpoint is None:
+                        state["can_hedge"] = False
+                        continue
+                    self.counters["hedges"] += 1
+                    waited = time.monotonic() - started_at[launched[-1]]
+                    print(f"⏱️ No LLM response after {waited:.1f}s, hedging with {endpoint.model}")
+                    hedged.add(launch(endpoint))
+                    continue
+
+                for task in done:
+                    endpoint = pending.pop(task)
+                    if task.cancelled():
+                        if task in trials:
+                            endpoint.breaker.abandon_trial()
+                        continue
+                    error = task.exception()
+                    result = None if error is not None else task.result()
+                    if result is not None:
+                        endpoint.breaker.record_success()
+                        if task in hedged:
+                            self.counters["hedge_wins"] += 1
+                        return result
+                    if error is not None:
+                        print(f"❌ LLM attempt on {endpoint.model} raised: {error}")
+                    endpoint.breaker.record_failure()
+                    if endpoint.breaker.state == "open":
+                        print(f"🚧 Circuit open for {endpoint.name} ({endpoint.breaker.cooldown:.0f}s)")
+                    if state["leader"] is task:
+                        # The winner failed mid-stream; let the next attempt claim
+                        state["leader"] = None
+            self.counters["exhausted"] += 1
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            # Trials still pending here never reported an outcome
+            for task, endpoint in pending.items():
+                if task in trials:
+                    endpoint.breaker.abandon_trial()
+
+    def _next_endpoint(self, attempts: int) -> Optional[LLMEndpoint]:
+        """Next endpoint in chain order (wrapping around) whose breaker admits traffic"""
+        if attempts >= self.max_attempts:
+            return None
+        count = len(self.endpoints)
+        for offset in range(count):
+            endpoint = self.endpoints[(attempts + offset) % count]
+            if endpoint.breaker.allow():
+                return endpoint
+        self.counters["rejected"] += 1
+        print("🚧 All LLM endpoints are cooling down")
+        return None
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "endpoints": [
+                {
+                    "model": endpoint.model,
+                    "base_url": endpoint.base_url,
+                    "breaker": endpoint.breaker.state,
+                    "consecutive_failures": endpoint.breaker.failures,
+                    "trips": endpoint.breaker.trips,
+                    "samples": len(endpoint.latencies),
+                    "p50_seconds": endpoint.percentile(50),
+                    "p95_seconds": endpoint.percentile(95),
+                    "hedge_delay_seconds": self.hedge_delay(endpoint),
+                }
+                for endpoint in self.endpoints
+            ],
+        }
@@ -1,37 +1,153 @@
 import os
 import sys
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Dict, Any
-import requests
 import time
-from .generator import CodeGenerator
+start_time = time.time()
+
+from fastapi import FastAPI, Header, HTTPException, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from typing import List, Dict, Any, Optional
+import asyncio
+import json
+from contextlib import AsyncExitStack, asynccontextmanager
+from .checks import CheckRunner, failure_feedback
+from .idempotency import IdempotencyStore
+from .jobs import DeployJob, JobQueue, KeyedLocks, QueueFullError, StageGraph, StageLimits
+from .journal import DeployJournal, deploy_id
+from .metrics import DEPLOY_CHECKS, DEPLOY_OVERLAP_SAVED, REGISTRY
+from .tracing import traces
+from .pages_tracker import PagesTracker
+from .patching import RevisionStore
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 print("🚀 Starting LLM Code Deployment API...")
-start_time = time.time()
 
 # Import config first
 from . import config
+from . import http_client
+from . import github_scheduler
 print(f"✅ Config loaded in {time.time() - start_time:.2f}s")
 
-app = FastAPI(title="LLM Code Deployment API")
+# Components are built by the background warm-up task so that importing
+# this module and serving /health never waits on disk scans or the network
+code_generator = None
+github_manager = None
+attachment_store = None
+# Local state: the latest deployed files per repo (the base for round 2+
+# patches), stage outputs per deploy (so retries and restarts resume), and
+# undelivered evaluation notifications
+revisions = None
+journal = None
+notification_outbox = None
+components_ready = asyncio.Event()
+startup_state: Dict[str, Any] = {
+    "status": "starting",
+    "import_seconds": None,
+    "ready_seconds": None,
+    "timings": {},
+}
 
-# Initialize components with error handling
-try:
-    from .generator import CodeGenerator
-    code_generator = CodeGenerator()
-    print(f"✅ CodeGenerator initialized in {time.time() - start_time:.2f}s")
-except Exception as e:
-    print(f"❌ CodeGenerator initialization failed: {e}")
-    code_generator = None
+async def warm_up():
+    """Initialize components and make the first outbound calls off the startup path"""
+    global code_generator, github_manager, attachment_store, revisions, journal, notification_outbox
+    startup_state["status"] = "warming"
+    
+    try:
+        from .outbox import NotificationOutbox
+        revisions = await asyncio.to_thread(RevisionStore, config.REVISION_DIR)
+        journal = await asyncio.to_thread(
+            DeployJournal, config.JOURNAL_PATH, ttl=config.JOURNAL_TTL, fsync=config.JOURNAL_FSYNC,
+            compact_after=config.JOURNAL_COMPACT_AFTER
+        )
+        notification_outbox = await asyncio.to_thread(
+            NotificationOutbox,
+            config.OUTBOX_PATH,
+            notify_evaluation_service,
+            ttl=config.OUTBOX_TTL,
+            max_attempts=config.OUTBOX_MAX_ATTEMPTS,
+            base_delay=config.OUTBOX_BASE_DELAY,
+            max_delay=config.OUTBOX_MAX_DELAY,
+            retention=config.OUTBOX_RETENTION,
+            host_concurrency=config.OUTBOX_HOST_CONCURRENCY,
+            max_concurrency=config.NOTIFY_CONCURRENCY,
+            poll_interval=config.OUTBOX_POLL_INTERVAL,
+        )
+        await notification_outbox.start()
+        startup_state["timings"]["local_state"] = time.time() - start_time
+    except Exception as e:
+        print(f"❌ Local state (revisions, journal, outbox) failed to load: {e}")
+    
+    await http_client.startup()
+    
+    # Initialize components with error handling
+    try:
+        from .generator import CodeGenerator
+        code_generator = await asyncio.to_thread(CodeGenerator)
+        startup_state["timings"]["code_generator"] = time.time() - start_time
+        print(f"✅ CodeGenerator initialized in {time.time() - start_time:.2f}s")
+    except Exception as e:
+        print(f"❌ CodeGenerator initialization failed: {e}")
+        code_generator = None
+    
+    try:
+        from .attachments import AttachmentStore
+        attachment_store = await asyncio.to_thread(
+            AttachmentStore,
+            config.ATTACHMENT_DIR,
+            max_bytes=config.ATTACHMENT_MAX_BYTES,
+            max_total_bytes=config.ATTACHMENT_SPOOL_MAX_BYTES,
+            fetch_concurrency=config.ATTACHMENT_FETCH_CONCURRENCY,
+            fetch_timeout=config.ATTACHMENT_FETCH_TIMEOUT,
+            allowed_hosts=config.ATTACHMENT_ALLOWED_HOSTS,
+        )
+        startup_state["timings"]["attachment_store"] = time.time() - start_time
+    except Exception as e:
+        print(f"❌ Attachment store initialization failed: {e}")
+        attachment_store = None
+    
+    try:
+        from .github_utils import get_github_manager
+        github_manager = get_github_manager()
+        await github_manager.warm_up()
+        startup_state["timings"]["github_manager"] = time.time() - start_time
+        print(f"✅ GitHub manager initialized in {time.time() - start_time:.2f}s")
+    except Exception as e:
+        print(f"❌ GitHub manager initialization failed: {e}")
+        github_manager = None
+    
+    if config.CHECKS_ENABLED:
+        try:
+            await check_runner.warm_up()
+            startup_state["timings"]["check_runner"] = time.time() - start_time
+        except Exception as e:
+            print(f"⚠️ Check workers failed to start: {e}")
+    
+    startup_state["status"] = "ready"
+    startup_state["ready_seconds"] = time.time() - start_time
+    components_ready.set()
+    if config.JOURNAL_RESUME_ON_START and journal is not None:
+        resume_incomplete_deploys()
+    print(f"🎉 App ready in {startup_state['ready_seconds']:.2f} seconds")
 
-try:
-    from .github_utils import github_manager
-    print(f"✅ GitHub manager initialized in {time.time() - start_time:.2f}s")
-except Exception as e:
-    print(f"❌ GitHub manager initialization failed: {e}")
-    github_manager = None
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    config.validate()
+    await job_queue.start()
+    warm_up_task = asyncio.create_task(warm_up())
+    yield
+    warm_up_task.cancel()
+    await job_queue.stop()
+    check_runner.shutdown()
+    await pages_tracker.stop()
+    if github_manager is not None:
+        await github_manager.repo_pool.stop()
+    if notification_outbox is not None:
+        await notification_outbox.stop()
+    if journal is not None:
+        journal.close()
+    await http_client.shutdown()
+
+app = FastAPI(title="LLM Code Deployment API", lifespan=lifespan)
 
 try:
     from .evaluation_utils import notify_evaluation_service
@@ -39,11 +155,37 @@ try:
 except Exception as e:
     print(f"❌ Evaluation utils failed: {e}")
     # Create a mock function
-    def notify_evaluation_service(url, data):
+    async def notify_evaluation_service(url, data):
         print(f"📨 Mock evaluation notification to: {url}")
         return True
 
-print(f"🎉 App fully loaded in {time.time() - start_time:.2f} seconds")
+# Concurrency caps per pipeline stage, shared by queued and batch deploys
+stage_limits = StageLimits({
+    "generate": config.LLM_CONCURRENCY,
+    "github": config.GITHUB_WRITE_CONCURRENCY,
+})
+
+# GitHub repo/push/Pages stages hold their repo's lock
+repo_locks = KeyedLocks()
+
+# Brief checks run against the generated files on worker processes before pushing
+check_runner = CheckRunner(config.CHECK_WORKERS, config.CHECK_TIMEOUT)
+
+# Watches Pages builds so the evaluator is notified once the pushed commit is live
+pages_tracker = PagesTracker(
+    timeout=config.PAGES_READY_TIMEOUT,
+    min_delay=config.PAGES_POLL_MIN_DELAY,
+    max_delay=config.PAGES_POLL_MAX_DELAY,
+)
+
+# Retried deploys attach to the original job instead of running it again
+idempotency = IdempotencyStore(
+    max_entries=config.IDEMPOTENCY_MAX_ENTRIES,
+    ttl=config.IDEMPOTENCY_TTL,
+)
+
+startup_state["import_seconds"] = time.time() - start_time
+print(f"🎉 App module loaded in {startup_state['import_seconds']:.2f} seconds")
 
 class Attachment(BaseModel):
     name: str
@@ -60,6 +202,9 @@ class DeployRequest(BaseModel):
     evaluation_url: str
     attachments: List[Attachment] = []
 
+class BatchDeployRequest(BaseModel):
+    items: List[DeployRequest]
+
 @app.get("/")
 def read_root():
     return {"status": "ready", "service": "LLM Code Deployment"}
@@ -70,111 +215,702 @@ def health_check():
         "status": "healthy", 
         "service": "LLM Deployment API",
         "mode": "mock" if config.MOCK_MODE else "production",
+        "startup": startup_state,
         "components": {
             "code_generator": code_generator is not None,
             "github_manager": github_manager is not None
         },
+        "jobs": job_queue.stats(),
+        "stage_limits": stage_limits.stats(),
+        "repo_locks": {k: v for k, v in repo_locks.stats().items() if k != "keys"},
+        "llm": code_generator.router.stats() if code_generator is not None else None,
+        "github": github_manager.scheduler.stats() if github_manager is not None else None,
+        "repo_pool": github_manager.repo_pool.stats() if github_manager is not None else None,
+        "idempotency": idempotency.stats(),
+        "pages": pages_tracker.stats(),
+        "outbox_depth": notification_outbox.pending_count() if notification_outbox is not None else None,
         "uptime": time.time() - start_time
     }
 
-@app.post("/api/deploy")
-async def deploy_app(request: DeployRequest):
+async def run_deploy_pipeline(job: DeployJob) -> Dict[str, Any]:
     """
-    Main deployment endpoint for both Round 1 and Round 2
+    Run a queued deploy job: repo setup and Pages alongside attachments,
+    generation and checks, then push and notify. All upstream calls are
+    async and share one pooled HTTP client. Each
+    completed stage is journaled, and a retry or restart resumes after it.
     """
-    print(f"🎯 Received deployment request for: {request.email} (Round {request.round})")
+    # Jobs accepted while warming up wait for the components
+    await components_ready.wait()
+    if journal is None or notification_outbox is None:
+        raise RuntimeError("Deploy journal and notification outbox are not available")
     
-    # 1. Verify secret
-    if request.secret != config.DEPLOYMENT_SECRET:
-        raise HTTPException(status_code=403, detail="Invalid deployment secret")
+    key = journal_key(job.request)
+    entry = journal.get(key)
+    if entry is not None and entry["status"] == "completed":
+        # Finished before a restart; nothing left to do
+        for name in entry["stages"]:
+            job.resume_stage(name)
+        return entry["result"]
+    await journal.begin(key, journal_request(job.request))
     
-    # 2. Generate application code
+    # Round 2+ updates go ahead of new repos when GitHub's rate limits bind
+    level = github_scheduler.UPDATE if job.request.round > 1 else github_scheduler.CREATE
     try:
-        print(f"📝 Generating app for: {request.email}")
-        attachments_data = [att.dict() for att in request.attachments]
-        
-        if code_generator:
-            generated_files = code_generator.generate_app(request.brief, attachments_data)
-        else:
-            generated_files = {
-                "index.html": f"<html><body><h1>Fallback App</h1><p>{request.brief}</p></body></html>",
-                "README.md": f"# Fallback App\n\n{request.brief}",
-                "LICENSE": "MIT License"
-            }
-            
-        print(f"✅ Generated {len(generated_files)} files")
+        with github_scheduler.priority(level):
+            result = await _deploy(job, key)
+    except Exception as e:
+        await journal.fail(key, str(e))
+        raise
+    await journal.complete(key, result)
+    return result
+
+def merge_files(base: Dict[str, str], generated: Dict[str, Optional[str]]) -> Dict[str, str]:
+    """A round's files over the previous ones: files it left out stay, files it deleted (None) go"""
+    return {path: content for path, content in {**base, **generated}.items() if content is not None}
+
+def repo_description(brief: str) -> str:
+    """A repo description from the brief: one line, within GitHub's 350-character limit"""
+    text = " ".join(brief.split())
+    return text if len(text) <= 350 else text[:349] + "…"
+
+async def run_checks(files: Dict[str, str], checks: List[str]):
+    """Evaluate checks on the worker pool; None if they couldn't run (the deploy goes ahead)"""
+    try:
+        return await check_runner.run(files, checks)
+    except asyncio.TimeoutError:
+        print(f"⚠️ Checks timed out after {config.CHECK_TIMEOUT}s")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Code generation failed: {str(e)}")
+        print(f"⚠️ Checks could not run: {e}")
+    return None
+
+async def _deploy(job: DeployJob, key: str) -> Dict[str, Any]:
+    request = job.request
+    
+    if github_manager is None:
+        raise RuntimeError("GitHub manager is not available")
     
-    # 3. GitHub operations - CRITICAL FIX: Use SAME repo for all rounds
     # Always use the base task name without round suffix for the repository
-    repo_name = request.task  # Use just the task name, no round suffix
+    repo_name = request.task
     
-    try:
-        if request.round == 1:
-            # ROUND 1: Create new repository
-            print(f"🔧 Creating NEW repository: {repo_name}")
-            repo_info = github_manager.create_repo(repo_name)
-            repo_url = repo_info['response']['html_url']
-            
-            commit_message = f"Round {request.round}: {request.brief[:50]}..."
-            push_info = github_manager.push_files(repo_name, generated_files, commit_message)
-            commit_sha = push_info['response']['commit_sha']
+    # Stages an earlier attempt of this deploy completed are restored from the journal
+    done = journal.completed_stages(key)
+    
+    def restored(name: str):
+        if name not in done:
+            return None
+        job.resume_stage(name)
+        return done[name]
+    
+    def restored_patch_base(commit_sha: Optional[str]):
+        """The revision a journaled generation patched, or False if it is no longer saved"""
+        if commit_sha is None:
+            return None
+        revision = revisions.load(repo_name)
+        # After this round's push the saved revision holds its files too, which merge the same
+        if revision is not None and (revision["commit_sha"] == commit_sha or "push" in done):
+            return revision
+        return False
+    
+    def on_generation_event(event: str, data: Dict[str, Any]):
+        if event == "file":
+            # The repo already exists for round 2+, so blobs can upload mid-stream
+            if request.round > 1 and github_manager is not None:
+                github_manager.prefetch_blob(repo_name, data["content"])
+            data = {"name": data["name"], "size": data["size"]}
+        job.emit(event, data)
+    
+    # 1. Spool attachments to disk (decoded/fetched concurrently, deduplicated by content);
+    # they stay pinned in the spool until the deploy is over
+    pinned = []
+    
+    async def attachments_stage(results):
+        if "checks" in done:
+            # Generation and checks are done, so nothing reads the attachments
+            job.resume_stage("attachments")
+            return []
+        if not request.attachments or attachment_store is None:
+            job.skip_stage("attachments", "no attachments")
+            return []
+        spooled = restored("attachments")
+        if spooled is not None:
+            attachments = attachment_store.reopen(spooled["files"])
+            if attachments is not None:
+                pinned.extend(attachments)
+                return attachments
+            print(f"⚠️ Attachments of {repo_name} were evicted from the spool; ingesting them again")
+        if any(att.url == UNJOURNALED_DATA for att in request.attachments):
+            # A replay from the journal, which keeps spool digests rather than inline data
+            raise RuntimeError("Inline attachments were not spooled before the restart; resubmit the request")
+        with job.stage("attachments") as stage:
+            attachments = await attachment_store.ingest([att.dict() for att in request.attachments])
+            pinned.extend(attachments)
+            stage["files"] = [att.to_dict() for att in attachments]
+            stage["skipped"] = len(request.attachments) - len(attachments)
+            await journal.record(key, "attachments", {"files": stage["files"]})
+        return attachments
+    
+    # 2. Generate application code; returns (generated files, previous round's revision)
+    async def generate_stage(results):
+        generation = restored("generate")
+        if generation is not None:
+            previous = restored_patch_base(generation.get("patch_base"))
+            if previous is not False:
+                print(f"♻️ Resumed {len(generation['files'])} generated files for {repo_name}")
+                return generation["files"], previous
+            # The files were a patch of a revision that is no longer known; generate again
+            print(f"⚠️ Patch base of {repo_name} changed since generation; generating again")
+            done.pop("checks", None)
+        with job.stage("generate") as stage:
+            print(f"📝 Generating app for: {request.email}")
             
-        else:
-            # ROUND 2+: Update existing repository (SAME repo as Round 1)
-            print(f"🔧 Updating EXISTING repository: {repo_name}")
+            # Round 2+ patches the previous round's files (saved locally, or read back from the repo)
+            previous = None
+            if request.round > 1 and config.PATCH_MODE_ENABLED:
+                try:
+                    previous = await github_manager.get_files(repo_name, known=revisions.load(repo_name))
+                except Exception as e:
+                    print(f"⚠️ Could not load the current files of {repo_name}: {e}")
+                stage["patch_base"] = previous["commit_sha"] if previous else None
             
-            # Get repo info (this will work for existing repos)
-            repo_info = github_manager.create_repo(repo_name)  # This now handles existing repos
+            if code_generator:
+                async with stage_limits.acquire("generate"):
+                    generated_files = await code_generator.generate_app(
+                        request.brief, results["attachments"], on_generation_event,
+                        current_files=previous["files"] if previous else None
+                    )
+            else:
+                generated_files = {
+                    "index.html": f"<html><body><h1>Fallback App</h1><p>{request.brief}</p></body></html>",
+                    "README.md": f"# Fallback App\n\n{request.brief}",
+                    "LICENSE": "MIT License"
+                }
+            stage["files"] = list(generated_files.keys())
+            await journal.record(key, "generate", {
+                "files": generated_files, "patch_base": previous["commit_sha"] if previous else None})
+            print(f"✅ Generated {len(generated_files)} files")
+        return generated_files, previous
+    
+    # 2b. Check the files against the brief's checks locally, and regenerate once with
+    # the failures so they get fixed before the evaluator sees them; returns the files to push
+    async def checks_stage(results):
+        generated_files, previous = results["generate"]
+        base = previous["files"] if previous else {}
+        checked = restored("checks")
+        if checked is not None:
+            # Only a regeneration journals files of its own
+            return checked.get("files", generated_files)
+        if not config.CHECKS_ENABLED:
+            job.skip_stage("checks", "disabled")
+            return generated_files
+        with job.stage("checks") as stage:
+            report = await run_checks(merge_files(base, generated_files), request.checks)
+            regenerations = 0
+            while (report and report["failed"] and code_generator
+                   and regenerations < config.CHECK_REGENERATIONS):
+                regenerations += 1
+                print(f"🔁 {report['failed']} checks failed, regenerating with the failures")
+                async with stage_limits.acquire("generate"):
+                    generated_files = await code_generator.generate_app(
+                        f"{request.brief}\n\nThe current version fails these checks; fix them:\n"
+                        f"{failure_feedback(report)}",
+                        results["attachments"], on_generation_event,
+                        current_files=merge_files(base, generated_files)
+                    )
+                report = await run_checks(merge_files(base, generated_files), request.checks)
+            stage["regenerated"] = regenerations
+            if report:
+                for result in ("passed", "failed", "skipped"):
+                    stage[result] = report[result]
+                    if report[result]:
+                        DEPLOY_CHECKS.inc(report[result], result=result)
+                stage["failures"] = [r["check"] for r in report["results"] if r["status"] == "failed"]
+                print(f"✅ Checks: {report['passed']} passed, {report['failed']} failed, "
+                      f"{report['skipped']} skipped")
+            checked = {"regenerated": regenerations}
+            if regenerations:
+                checked["files"] = generated_files
+            await journal.record(key, "checks", checked)
+        return generated_files
+    
+    # 3. GitHub operations - CRITICAL FIX: Use SAME repo for all rounds
+    # One hold of the repo's lock covers repo setup, Pages and the push, so concurrent
+    # rounds or retries of a task don't interleave on it; it is admitted by round, and
+    # round 2+ reads its patch base under it, after earlier rounds have pushed.
+    # Deploys of other repos proceed in parallel.
+    repo_lock = AsyncExitStack()
+    
+    async def lock_stage(results):
+        if "push" in done:
+            return 0.0
+        queued_at = time.time()
+        await repo_lock.enter_async_context(repo_locks.acquire(repo_name, order=request.round))
+        return round(time.time() - queued_at, 3)
+    
+    # Round 1 creates (or claims) the repo while generation runs; a deploy that fails
+    # later keeps it, and its retry resumes with the journaled repo
+    async def repo_stage(results):
+        repo_state = restored("repo")
+        if repo_state is not None:
+            return repo_state["repo_url"]
+        with job.stage("repo") as stage:
+            stage["lock_wait"] = results["lock"]
+            if request.round == 1:
+                # ROUND 1: Create new repository
+                print(f"🔧 Creating NEW repository: {repo_name}")
+            else:
+                # ROUND 2+: Get repo info (SAME repo as Round 1)
+                print(f"🔧 Updating EXISTING repository: {repo_name}")
+            async with stage_limits.acquire("github"):
+                repo_info = await github_manager.create_repo(repo_name, repo_description(request.brief))
             repo_url = repo_info['response']['html_url']
-            
-            commit_message = f"Round {request.round} Update: {request.brief[:50]}..."
-            push_info = github_manager.update_repo(repo_name, generated_files, commit_message)
+            stage["pooled"] = repo_info.get("pooled", False)
+            await journal.record(key, "repo", {"repo_url": repo_url})
+        return repo_url
+    
+    # Enable/update Pages (same for both rounds); only needs the repo, not the files
+    async def pages_stage(results):
+        pages_state = restored("pages")
+        if pages_state is not None:
+            return pages_state["pages_url"]
+        with job.stage("pages"):
+            async with stage_limits.acquire("github"):
+                pages_info = await github_manager.enable_pages(repo_name)
+            pages_url = pages_info['response']['html_url']
+            await journal.record(key, "pages", {"pages_url": pages_url})
+        return pages_url
+    
+    # Returns (commit SHA, changed files)
+    async def push_stage(results):
+        generated_files = results["checks"]
+        pushed = restored("push")
+        if pushed is not None:
+            return pushed["commit_sha"], pushed["changed"]
+        with job.stage("push") as stage:
+            async with stage_limits.acquire("github"):
+                if request.round == 1:
+                    commit_message = f"Round {request.round}: {request.brief[:50]}..."
+                    # The repo's initial README (a pooled one says the repo is reserved) never outlives round 1
+                    files = {"README.md": None, **generated_files}
+                    push_info = await github_manager.push_files(repo_name, files, commit_message)
+                else:
+                    commit_message = f"Round {request.round} Update: {request.brief[:50]}..."
+                    push_info = await github_manager.update_repo(repo_name, generated_files, commit_message)
             commit_sha = push_info['response']['commit_sha']
-        
-        # Enable/update Pages (same for both rounds)
-        pages_info = github_manager.enable_pages(repo_name)
-        pages_url = pages_info['response']['html_url']
-        
+            changed_files = push_info['response'].get('changed', list(generated_files.keys()))
+            revisions.save(repo_name, commit_sha, repo_files(results))
+            stage["commit_sha"] = commit_sha
+            stage["changed"] = changed_files
+            stage["noop"] = push_info['response'].get('noop', False)
+            await journal.record(key, "push", {"commit_sha": commit_sha, "changed": changed_files})
+        # The next round of this repo may read its patch base now
+        await repo_lock.aclose()
         print(f"✅ GitHub operations completed for {repo_name}")
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"GitHub operations failed: {str(e)}")
+        return commit_sha, changed_files
+    
+    def repo_files(results) -> Dict[str, str]:
+        """Files on main after the push: files left out of this round stay in the repo"""
+        _, previous = results["generate"]
+        return merge_files(previous["files"] if previous else {}, results["checks"])
+    
+    # 4. Evaluation service notification goes through the durable outbox,
+    # so the deploy never waits on the evaluator
+    async def notify_stage(results):
+        if restored("notify") is not None:
+            return
+        repo_url, pages_url = results["repo"], results["pages"]
+        commit_sha, _ = results["push"]
+        with job.stage("notify") as stage:
+            evaluation_data = {
+                "email": request.email,
+                "task": request.task,
+                "round": request.round,
+                "nonce": request.nonce,
+                "repo_url": repo_url,
+                "commit_sha": commit_sha,
+                "pages_url": pages_url,
+            }
+            # Held until Pages serves this commit, so the evaluator doesn't load a 404 or the
+            # previous round; the hold runs out on its own if tracking never reports back
+            track = config.PAGES_TRACKING_ENABLED and github_manager.enabled
+            hold = config.PAGES_READY_TIMEOUT + config.PAGES_POLL_MAX_DELAY if track else 0
+            outbox_id = await notification_outbox.enqueue(request.evaluation_url, evaluation_data, hold=hold)
+            stage["outbox_id"] = outbox_id
+            await journal.record(key, "notify", {"outbox_id": outbox_id})
+            if track:
+                async def on_pages_done(outcome: Dict[str, Any]):
+                    job.stages["live"] = outcome
+                    await notification_outbox.release(outbox_id)
+                pages_tracker.track(github_manager, repo_name, commit_sha, pages_url,
+                                    repo_files(results).get("index.html"), on_pages_done)
+                stage["held_until_live"] = True
+                print(f"📨 Queued evaluation notification to {request.evaluation_url}, held until Pages is live")
+            else:
+                print(f"📨 Queued evaluation notification to: {request.evaluation_url}")
     
-    # 4. Evaluation service notification
+    # Repo setup and Pages don't depend on the generated files, so they run
+    # alongside attachments and generation; the push joins both branches.
+    # A round 2+ patch reads the previous round's files, so it waits for the lock
+    patches = request.round > 1 and config.PATCH_MODE_ENABLED
+    graph = StageGraph()
+    graph.add("attachments", attachments_stage)
+    graph.add("lock", lock_stage)
+    graph.add("generate", generate_stage, after=["attachments", "lock"] if patches else ["attachments"])
+    graph.add("checks", checks_stage, after=["generate"])
+    graph.add("repo", repo_stage, after=["lock"])
+    graph.add("pages", pages_stage, after=["repo"])
+    graph.add("push", push_stage, after=["checks", "pages"])
+    graph.add("notify", notify_stage, after=["push", "pages"])
+    started_at = time.time()
     try:
-        print(f"📨 Sending evaluation notification to: {request.evaluation_url}")
-        
-        evaluation_data = {
-            "email": request.email,
-            "task": request.task,
-            "round": request.round,
-            "nonce": request.nonce,
-            "repo_url": repo_url,
-            "commit_sha": commit_sha,
-            "pages_url": pages_url,
-        }
-        
-        success = notify_evaluation_service(request.evaluation_url, evaluation_data)
-        if not success:
-            print("⚠️ Evaluation service notification failed, but continuing...")
-            
-    except Exception as e:
-        print(f"⚠️ Evaluation notification failed: {e}")
+        results = await graph.run()
+    finally:
+        await repo_lock.aclose()
+        if pinned:
+            attachment_store.release(pinned)
     
-    # 5. Return success response
+    # What running this attempt's stages one after another would have cost, minus what it took
+    sequential = sum(info["duration"] for info in job.stages.values()
+                     if info.get("started_at", 0) >= started_at and "duration" in info)
+    overlap_saved = max(0.0, sequential - graph.elapsed)
+    DEPLOY_OVERLAP_SAVED.observe(overlap_saved)
+    
+    commit_sha, changed_files = results["push"]
     return {
         "status": "success",
         "message": f"Round {request.round} deployment completed",
-        "repo_url": repo_url,
+        "repo_url": results["repo"],
         "commit_sha": commit_sha,
-        "pages_url": pages_url,
-        "generated_files": list(generated_files.keys()),
+        "pages_url": results["pages"],
+        "generated_files": [path for path, content in results["checks"].items() if content is not None],
+        "changed_files": changed_files,
+        "overlap_saved_seconds": round(overlap_saved, 3),
         "mode": "mock" if config.MOCK_MODE else "production",
         "action": "updated" if request.round > 1 else "created"
     }
 
+job_queue = JobQueue(
+    run_deploy_pipeline,
+    workers=config.DEPLOY_WORKERS,
+    maxsize=config.DEPLOY_QUEUE_SIZE,
+    history_limit=config.JOB_HISTORY_LIMIT,
+)
+
+def idempotency_key(request: DeployRequest) -> tuple:
+    return (request.task, request.round, request.nonce)
+
+# Stands in for a data URI in the journaled request
+UNJOURNALED_DATA = "data:"
+
+def journal_key(request: DeployRequest) -> str:
+    return deploy_id(request.task, request.round, request.nonce)
+
+def journal_request(request: DeployRequest) -> Dict[str, Any]:
+    """
+    The request as journaled: everything needed to run it again except the
+    secret and inline attachment data, which the attachments stage journals
+    as digests of the spooled files
+    """
+    data = request.dict(exclude={"secret"})
+    data["attachments"] = [
+        {"name": att["name"], "url": UNJOURNALED_DATA} if att["url"].startswith("data:") else att
+        for att in data["attachments"]
+    ]
+    return data
+
+def replay_deploy(deploy: Dict[str, Any]) -> Dict[str, Any]:
+    """Queue a journaled deploy again; it resumes after its last completed stage"""
+    request = DeployRequest(**deploy["request"], secret=config.DEPLOYMENT_SECRET)
+    key = idempotency_key(request)
+    record = idempotency.get(key)
+    if record is not None:
+        return {**duplicate_item(record), "deploy_id": deploy["id"]}
+    job = job_queue.submit(DeployJob(request))
+    idempotency.put(key, job)
+    return {"status": "accepted", "job_id": job.id, "status_url": f"/api/jobs/{job.id}",
+            "deploy_id": deploy["id"], "resumed_stages": list(deploy["stages"])}
+
+def resume_incomplete_deploys():
+    """Queue deploys a previous process left unfinished, unless they have used up their attempts"""
+    for deploy in journal.incomplete():
+        if deploy["attempts"] >= config.JOURNAL_MAX_ATTEMPTS:
+            print(f"⚠️ Not resuming deploy {deploy['id']} ({deploy['request'].get('task')}): "
+                  f"{deploy['attempts']} attempts already; replay it by hand")
+            continue
+        try:
+            item = replay_deploy(deploy)
+        except QueueFullError:
+            print("⚠️ Deploy queue is full; remaining journaled deploys wait for a replay")
+            return
+        print(f"♻️ Resuming deploy {deploy['id']} ({deploy['request'].get('task')}) "
+              f"after {len(deploy['stages'])} completed stages as job {item['job_id']}")
+
+def duplicate_item(record) -> Dict[str, Any]:
+    """Response fields for a request that matched an earlier deploy"""
+    view = record.view()
+    item = {
+        "status": "completed" if record.done else "accepted",
+        "job_id": record.job_id,
+        "status_url": f"/api/jobs/{record.job_id}",
+        "duplicate": True,
+    }
+    if record.done:
+        item["result"] = view["result"]
+    return item
+
+@app.post("/api/deploy", status_code=202)
+async def deploy_app(request: DeployRequest, response: Response):
+    """
+    Main deployment endpoint for both Round 1 and Round 2.
+    Validates and enqueues the deploy; poll /api/jobs/{job_id} for progress.
+    Retries of the same task/round/nonce return the original job (200 with
+    its result once it has succeeded) instead of deploying again.
+    """
+    print(f"🎯 Received deployment request for: {request.email} (Round {request.round})")
+    
+    # Verify secret
+    if request.secret != config.DEPLOYMENT_SECRET:
+        raise HTTPException(status_code=403, detail="Invalid deployment secret")
+    
+    if components_ready.is_set() and github_manager is None:
+        raise HTTPException(status_code=503, detail="GitHub manager is not available")
+    
+    key = idempotency_key(request)
+    record = idempotency.get(key)
+    if record is not None:
+        print(f"🔁 Duplicate deploy for task {request.task} round {request.round}, job {record.job_id}")
+        if record.done:
+            response.status_code = 200
+        return {**duplicate_item(record), "task": request.task, "round": request.round}
+    
+    try:
+        job = job_queue.submit(DeployJob(request))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    idempotency.put(key, job)
+    
+    print(f"📥 Queued deploy job {job.id} for task {request.task}")
+    return {
+        "status": "accepted",
+        "job_id": job.id,
+        "status_url": f"/api/jobs/{job.id}",
+        "deploy_id": journal_key(request),
+        "task": request.task,
+        "round": request.round
+    }
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-sent events for a deploy job: stage changes, streamed files and progress"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_source():
+        async for event in job.stream_events():
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {event['seq']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+    
+    return StreamingResponse(event_source(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@REGISTRY.collector
+def collect_component_metrics():
+    """Expose the counters and gauges components already keep"""
+    jobs = job_queue.stats()
+    yield ("deploy_jobs", "gauge", "Deploy jobs by state",
+           [({"state": "queued"}, jobs["queued"]), ({"state": "running"}, jobs["running"])])
+    limits = stage_limits.stats()
+    yield ("stage_slots_in_use", "gauge", "Concurrency slots held per limited stage",
+           [({"stage": name}, s["in_use"]) for name, s in limits.items()])
+    yield ("stage_slots_waiting", "gauge", "Pipelines waiting for a stage slot",
+           [({"stage": name}, s["waiting"]) for name, s in limits.items()])
+    locks = repo_locks.stats()
+    yield ("repo_locks_held", "gauge", "Repos with GitHub operations in progress", [({}, locks["active"])])
+    yield ("repo_locks_waiting", "gauge", "Deploys waiting for another deploy of the same repo",
+           [({}, locks["waiting"])])
+    
+    if notification_outbox is not None:
+        outbox = notification_outbox.stats()
+        yield ("outbox_depth", "gauge", "Undelivered evaluation notifications", [({}, outbox["depth"])])
+        yield ("outbox_oldest_age_seconds", "gauge", "Age of the oldest undelivered notification",
+               [({}, outbox["oldest_age_seconds"])])
+        yield ("outbox_events_total", "counter", "Notification outbox events",
+               [({"event": name}, outbox[name])
+                for name in ("enqueued", "delivered", "retries", "expired", "pruned")])
+    
+    yield ("idempotent_requests_total", "counter", "Deploy requests checked against earlier deploys",
+           [({"outcome": name}, value) for name, value in idempotency.stats().items() if name != "entries"])
+    
+    cache_samples = []
+    if code_generator is not None and code_generator.cache is not None:
+        stats = code_generator.cache.stats()
+        cache_samples += [({"cache": "generation", "event": name}, stats[name])
+                          for name in ("memory_hits", "disk_hits", "misses", "evictions")]
+    if github_manager is not None:
+        cache_samples += [({"cache": "github_metadata", "event": name}, value)
+                          for name, value in github_manager.metadata_stats.items()]
+    if attachment_store is not None:
+        stats = attachment_store.stats()
+        cache_samples += [({"cache": "attachments", "event": name}, stats[name])
+                          for name in ("ingested", "deduplicated", "failed", "evicted")]
+    yield ("cache_events_total", "counter", "Cache hits, misses and evictions", cache_samples)
+    
+    if code_generator is not None:
+        router = code_generator.router.stats()
+        yield ("llm_router_events_total", "counter", "LLM hedges, fallbacks and rejected requests",
+               [({"event": name}, router[name])
+                for name in ("requests", "hedges", "hedge_wins", "fallbacks", "rejected", "exhausted")])
+        yield ("llm_breaker_open", "gauge", "1 while an LLM endpoint's circuit breaker is not closed",
+               [({"model": e["model"]}, 0 if e["breaker"] == "closed" else 1) for e in router["endpoints"]])
+    
+    if github_manager is not None:
+        scheduler = github_manager.scheduler.stats()
+        yield ("github_rate_limit_remaining", "gauge", "Primary GitHub API budget left in the current window",
+               [({}, scheduler["remaining"])])
+        yield ("github_scheduler_waiting", "gauge", "GitHub requests waiting for rate-limit budget",
+               [({}, scheduler["waiting"])])
+        yield ("repo_pool_available", "gauge", "Placeholder repos ready to be claimed by a new task",
+               [({}, github_manager.repo_pool.stats()["available"])])
+    yield ("pages_tracking", "gauge", "Deploys whose notification waits for Pages to go live",
+           [({}, pages_tracker.stats()["watching"])])
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics: stage and upstream latency histograms, counters and gauges"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/repos/queue")
+def repo_queue():
+    """Per-repo GitHub operation queue: whether a deploy holds the repo and how many wait"""
+    return repo_locks.stats()
+
+@app.get("/api/traces")
+def list_traces(limit: int = 50):
+    """Most recent deploy traces with their total duration"""
+    return {"traces": traces.recent(limit)}
+
+@app.get("/api/traces/{trace_id}")
+def get_trace(trace_id: str):
+    """All recorded spans of a trace (the trace id of a deploy is its job id)"""
+    spans = traces.get(trace_id)
+    if spans is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return {"trace_id": trace_id, "spans": spans}
+
+@app.get("/api/outbox")
+def outbox_stats():
+    """Depth and age of the evaluation notification outbox"""
+    if notification_outbox is None:
+        raise HTTPException(status_code=503, detail="Notification outbox is not loaded yet")
+    return notification_outbox.stats()
+
+def require_secret(secret: str):
+    if secret != config.DEPLOYMENT_SECRET:
+        raise HTTPException(status_code=403, detail="Invalid deployment secret")
+
+def require_journal():
+    if journal is None:
+        raise HTTPException(status_code=503, detail="Deploy journal is not loaded yet")
+
+@app.get("/api/admin/deploys")
+def list_journaled_deploys(status: str = "incomplete", x_deployment_secret: str = Header(None)):
+    """Journaled deploys (incomplete, completed or all) with the stages they completed"""
+    require_secret(x_deployment_secret)
+    require_journal()
+    deploys = journal.incomplete() if status == "incomplete" else [
+        d for d in journal.deploys.values() if status == "all" or d["status"] == status
+    ]
+    return {"deploys": [journal.summary(d) for d in sorted(deploys, key=lambda d: d["updated_at"])]}
+
+@app.post("/api/admin/deploys/{deploy_id}/replay", status_code=202)
+def replay_journaled_deploy(deploy_id: str, x_deployment_secret: str = Header(None)):
+    """Run an incomplete deploy again from the stage after its last completed one"""
+    require_secret(x_deployment_secret)
+    require_journal()
+    deploy = journal.get(deploy_id)
+    if deploy is None:
+        raise HTTPException(status_code=404, detail="Deploy not found in the journal")
+    if deploy["status"] == "completed":
+        raise HTTPException(status_code=409, detail="Deploy already completed")
+    try:
+        return replay_deploy(deploy)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    """Hit/miss counters for the generation, GitHub metadata and attachment caches"""
+    stats = {"enabled": False}
+    if code_generator is not None and code_generator.cache is not None:
+        stats = {"enabled": True, **code_generator.cache.stats()}
+    if github_manager is not None:
+        stats["github_metadata"] = github_manager.metadata_stats
+    if attachment_store is not None:
+        stats["attachments"] = attachment_store.stats()
+    return stats
+
+@app.post("/api/deploy/batch", status_code=202)
+async def deploy_batch(batch: BatchDeployRequest, response: Response, wait: bool = False):
+    """
+    Deploy many requests at once. Items run concurrently, bounded per stage
+    (LLM generation, GitHub writes, notifications) rather than per pipeline.
+    Returns a job id per item, or each item's result when wait=true.
+    Invalid items are rejected individually without affecting the rest.
+    """
+    if len(batch.items) > config.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {config.BATCH_MAX_ITEMS} items")
+    if components_ready.is_set() and github_manager is None:
+        raise HTTPException(status_code=503, detail="GitHub manager is not available")
+    print(f"🎯 Received batch deployment with {len(batch.items)} items")
+    
+    items = []
+    tasks = {}
+    attached = {}
+    for index, request in enumerate(batch.items):
+        if request.secret != config.DEPLOYMENT_SECRET:
+            items.append({"index": index, "task": request.task, "status": "rejected",
+                          "error": "Invalid deployment secret"})
+            continue
+        key = idempotency_key(request)
+        record = idempotency.get(key)
+        if record is not None:
+            # Also catches duplicates within the same batch
+            items.append({"index": index, "task": request.task, **duplicate_item(record)})
+            if not record.done:
+                attached[index] = record.job
+            continue
+        job = DeployJob(request)
+        tasks[index] = job_queue.spawn(job)
+        idempotency.put(key, job)
+        items.append({"index": index, "task": request.task, "status": "accepted",
+                      "job_id": job.id, "status_url": f"/api/jobs/{job.id}"})
+    
+    if wait:
+        response.status_code = 200
+        await asyncio.gather(*tasks.values(), *(job.wait() for job in attached.values()))
+        for item in items:
+            job = attached.get(item["index"]) or job_queue.get(item.get("job_id"))
+            if item["status"] == "accepted" and job is not None:
+                item.update(status=job.status, result=job.result, error=job.error)
+    
+    return {
+        "status": "completed" if wait else "accepted",
+        "accepted": len(tasks),
+        "duplicates": sum(1 for item in items if item.get("duplicate")),
+        "rejected": sum(1 for item in items if item["status"] == "rejected"),
+        "items": items
+    }
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    """Report the status of a deploy job and each of its stages"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
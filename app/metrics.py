@@ -0,0 +1,182 @@
+import threading
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Seconds; spans LLM completions (tens of seconds) down to cached GitHub reads
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# (labels, value) pairs reported by a collector for one metric family
+Samples = List[Tuple[Dict[str, str], float]]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+
+    @staticmethod
+    def _key(labels: Dict[str, str]) -> Tuple:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(dict(key), value))
+        return lines
+
+    def _render_sample(self, labels: Dict[str, str], value) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_sample(self, labels: Dict[str, str], state) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state["counts"]):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+        lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {state['count']}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(state['sum'])}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {state['count']}")
+        return lines
+
+
+class Registry:
+    """
+    Metrics rendered in the Prometheus text exposition format. Besides
+    metrics updated in place, collectors report values that components
+    already keep (cache, queue and outbox counters) at scrape time.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Samples]]]] = []
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._add(Counter(name, help))
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._add(Gauge(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, buckets))
+
+    def collector(self, fn: Callable[[], Iterable[Tuple[str, str, str, Samples]]]):
+        """Register fn() -> [(name, kind, help, [(labels, value), ...]), ...]"""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                families = list(collect())
+            except Exception as e:
+                print(f"⚠️ Metrics collector failed: {e}")
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    if value is not None:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "deploy_stage_seconds", "Duration of deploy pipeline stages")
+DEPLOY_SECONDS = REGISTRY.histogram(
+    "deploy_seconds", "End-to-end duration of deploy jobs")
+SPAN_SECONDS = REGISTRY.histogram(
+    "trace_span_seconds", "Duration of traced operations (LLM attempts, GitHub calls, notifications)")
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "upstream_request_seconds", "Time to response headers of outbound HTTP requests")
+UPSTREAM_IN_FLIGHT = REGISTRY.gauge(
+    "upstream_requests_in_flight", "Outbound HTTP requests awaiting response headers")
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total", "Tokens reported in the AIPipe usage block")
+LLM_PROMPT_TOKENS_ESTIMATED = REGISTRY.counter(
+    "llm_prompt_tokens_estimated_total", "Locally estimated prompt tokens for completions that reported usage")
+LLM_PATCHES = REGISTRY.counter(
+    "llm_patches_total", "Round 2+ patch generations by outcome (applied, rejected, too_large, ...)")
+DEPLOY_OVERLAP_SAVED = REGISTRY.histogram(
+    "deploy_overlap_saved_seconds", "Sum of stage durations minus the pipeline's wall time, per deploy")
+DEPLOY_CHECKS = REGISTRY.counter(
+    "deploy_checks_total", "Brief checks evaluated locally before pushing, by result (passed, failed, skipped)")
+FALLBACKS = REGISTRY.counter(
+    "fallbacks_total", "Degraded results served instead of the real operation, by kind")
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    host TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_notifications_due ON notifications (status, next_attempt_at);
+"""
+
+
+class NotificationOutbox:
+    """
+    Durable SQLite outbox for evaluation notifications, drained by a
+    background dispatcher with jittered exponential backoff. Failed and
+    expired rows are kept for `retention` seconds for inspection, then pruned.
+    Coroutines run their queries in worker threads behind one lock; the
+    plain methods (pending_count, stats) block and are for threads and sync
+    endpoints.
+    """
+
+    def __init__(self, path: str, deliver: Callable[[str, Dict], Awaitable[bool]],
+                 ttl: float = 3600, max_attempts: int = 10, base_delay: float = 1.0,
+                 max_delay: float = 300.0, host_concurrency: int = 4,
+                 max_concurrency: int = 16, poll_interval: float = 1.0, batch_size: int = 50,
+                 retention: float = 24 * 3600):
+        self.path = path
+        self.deliver = deliver
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.host_concurrency = host_concurrency
+        self.max_concurrency = max_concurrency
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.retention = retention
+        self.counters = {"enqueued": 0, "delivered": 0, "retries": 0, "expired": 0, "pruned": 0}
+        self._lock = threading.Lock()
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._inflight: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        # Deliveries interrupted by a crash are retried
+        self._db.execute("UPDATE notifications SET status = 'pending' WHERE status = 'sending'")
+
+    async def enqueue(self, url: str, payload: Dict, hold: float = 0.0) -> int:
+        """
+        Persist a notification for delivery; returns its outbox id. A held
+        notification waits until release() or for `hold` seconds, whichever
+        comes first, so it still goes out if the releasing process dies.
+        """
+        outbox_id = await asyncio.to_thread(self._insert, url, json.dumps(payload), hold)
+        if not hold:
+            self.wake()
+        return outbox_id
+
+    def _insert(self, url: str, payload: str, hold: float) -> int:
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO notifications (url, host, payload, created_at, next_attempt_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, urlsplit(url).netloc, payload, now, now + hold, now + hold + self.ttl),
+            )
+            self.counters["enqueued"] += 1
+        return cursor.lastrowid
+
+    async def release(self, outbox_id: int):
+        """Make a held notification due now"""
+        await asyncio.to_thread(self._release, outbox_id)
+        self.wake()
+
+    def _release(self, outbox_id: int):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE notifications SET next_attempt_at = ? "
+                "WHERE id = ? AND status = 'pending' AND attempts = 0 AND next_attempt_at > ?",
+                (now, outbox_id, now),
+            )
+
+    def wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._slots = asyncio.Semaphore(max(1, self.max_concurrency))
+            self._task = asyncio.create_task(self._run())
+            pending = await asyncio.to_thread(self.pending_count)
+            print(f"✅ Notification outbox dispatcher started ({pending} pending)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, *self._inflight, return_exceptions=True)
+            self._task = None
+        await asyncio.to_thread(self._requeue_sending)
+
+    def _requeue_sending(self):
+        with self._lock:
+            self._db.execute("UPDATE notifications SET status = 'pending' WHERE status = 'sending'")
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM notifications WHERE status IN ('pending', 'sending')"
+            ).fetchone()[0]
+
+    def stats(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT host, status, COUNT(*), MIN(created_at) FROM notifications "
+                "WHERE status IN ('pending', 'sending') GROUP BY host, status"
+            ).fetchall()
+        by_host: Dict[str, Dict] = {}
+        depth = 0
+        oldest = None
+        for host, status, count, created_at in rows:
+            entry = by_host.setdefault(host, {"pending": 0, "sending": 0})
+            entry[status] = count
+            depth += count
+            oldest = created_at if oldest is None else min(oldest, created_at)
+        return {
+            "depth": depth,
+            "oldest_age_seconds": now - oldest if oldest is not None else 0.0,
+            "by_host": by_host,
+            **self.counters,
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                for row in await asyncio.to_thread(self._housekeep_and_claim):
+                    task = asyncio.create_task(self._deliver(*row))
+                    self._inflight.add(task)
+                    task.add_done_callback(self._inflight.discard)
+            except Exception as e:
+                print(f"❌ Outbox dispatcher error: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _housekeep_and_claim(self) -> List[tuple]:
+        self._expire()
+        self._prune()
+        return self._claim_due()
+
+    def _claim_due(self) -> List[tuple]:
+        """Mark due notifications as sending and return them"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, url, host, payload, attempts FROM notifications "
+                "WHERE status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY next_attempt_at LIMIT ?",
+                (time.time(), self.batch_size),
+            ).fetchall()
+            if rows:
+                self._db.executemany(
+                    "UPDATE notifications SET status = 'sending' WHERE id = ?",
+                    [(row[0],) for row in rows],
+                )
+        return rows
+
+    async def _deliver(self, outbox_id: int, url: str, host: str, payload: str, attempts: int):
+        # Concurrent deliveries are capped per evaluator host and overall
+        slots = self._host_slots.setdefault(host, asyncio.Semaphore(self.host_concurrency))
+        async with slots, self._slots:
+            error = None
+            try:
+                delivered = await self.deliver(url, json.loads(payload))
+            except Exception as e:
+                delivered = False
+                error = str(e)
+
+        await asyncio.to_thread(self._record_attempt, outbox_id, host, attempts + 1, delivered, error)
+
+    def _record_attempt(self, outbox_id: int, host: str, attempts: int, delivered: bool, error: Optional[str]):
+        with self._lock:
+            if delivered:
+                self._db.execute("DELETE FROM notifications WHERE id = ?", (outbox_id,))
+                self.counters["delivered"] += 1
+                return
+            if attempts >= self.max_attempts:
+                # next_attempt_at of a finished row is when it finished, for pruning
+                self._db.execute(
+                    "UPDATE notifications SET status = 'failed', attempts = ?, last_error = ?, "
+                    "next_attempt_at = ? WHERE id = ?",
+                    (attempts, error, time.time(), outbox_id),
+                )
+                print(f"❌ Notification {outbox_id} to {host} failed after {attempts} attempts")
+                return
+            # Exponential backoff with full jitter, never below the base delay
+            cap = min(self.max_delay, self.base_delay * 2 ** attempts)
+            delay = random.uniform(self.base_delay, max(self.base_delay, cap))
+            self._db.execute(
+                "UPDATE notifications SET status = 'pending', attempts = ?, next_attempt_at = ?, "
+                "last_error = ? WHERE id = ?",
+                (attempts, time.time() + delay, error, outbox_id),
+            )
+            self.counters["retries"] += 1
+        print(f"🔄 Notification {outbox_id} retry {attempts} in {delay:.1f}s")
+
+    def _expire(self):
+        with self._lock:
+            now = time.time()
+            cursor = self._db.execute(
+                "UPDATE notifications SET status = 'expired', next_attempt_at = ? "
+                "WHERE status = 'pending' AND expires_at <= ?",
+                (now, now),
+            )
+            if cursor.rowcount:
+                self.counters["expired"] += cursor.rowcount
+                print(f"⚠️ Expired {cursor.rowcount} undelivered notifications")
+
+    def _prune(self):
+        """Delete failed and expired rows older than the retention window"""
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM notifications WHERE status IN ('failed', 'expired') AND next_attempt_at <= ?",
+                (time.time() - self.retention,),
+            )
+            if cursor.rowcount:
+                self.counters["pruned"] += cursor.rowcount
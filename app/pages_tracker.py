@@ -0,0 +1,127 @@
+import asyncio
+import inspect
+import time
+from typing import Callable, Dict, Optional
+
+from . import http_client
+from .github_utils import git_blob_sha
+from .metrics import REGISTRY
+
+PAGES_TIME_TO_LIVE = REGISTRY.histogram(
+    "pages_time_to_live_seconds", "Time from push until Pages served the pushed index.html",
+    buckets=(5, 10, 20, 30, 45, 60, 90, 120, 180, 300, 600))
+PAGES_TRACKED = REGISTRY.counter(
+    "pages_tracked_total", "Pages deployments tracked, by outcome (live, superseded, errored, timeout, failed)")
+
+
+class PagesTracker:
+    """
+    Watches the Pages build of a pushed commit and confirms the site serves
+    it: the build is polled with adaptive backoff, then the served
+    index.html is compared with the pushed one by git blob SHA (Pages has
+    no header naming the commit it serves). on_done (a function or
+    coroutine function) runs once per tracked deploy, whatever the outcome,
+    so a held notification is never stranded.
+
+    The first poll comes after min_delay until a deploy has gone live, then
+    after about half the observed typical time-to-live; polling backs off
+    by 1.5x while the build is queued; once the build reports built,
+    the site is polled at min_delay until the CDN serves the new content.
+    """
+
+    def __init__(self, timeout: float = 600, min_delay: float = 2.0, max_delay: float = 30.0):
+        self.timeout = timeout
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        # Moving average of observed time-to-live, seeds the first poll; None until one is seen
+        self.typical: Optional[float] = None
+        self._tasks: set = set()
+        self.counters = {"tracked": 0, "live": 0, "superseded": 0, "errored": 0, "timeout": 0, "failed": 0}
+
+    def track(self, github_manager, repo_name: str, commit_sha: str, pages_url: str,
+              index_html: Optional[str], on_done: Callable[[Dict], None]) -> asyncio.Task:
+        """Start watching in the background; on_done receives the outcome"""
+        self.counters["tracked"] += 1
+        task = asyncio.create_task(self._run(github_manager, repo_name, commit_sha, pages_url,
+                                             index_html, on_done))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def stop(self):
+        """Cancel pending watches; their held notifications go out when the hold expires"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, github_manager, repo_name, commit_sha, pages_url, index_html, on_done):
+        started = time.monotonic()
+        try:
+            outcome = await self._watch(github_manager, repo_name, commit_sha, pages_url, index_html, started)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Pages tracking of {repo_name} failed: {e}")
+            outcome = {"outcome": "failed", "error": str(e), "polls": None}
+        outcome["seconds"] = round(time.monotonic() - started, 2)
+        self.counters[outcome["outcome"]] += 1
+        PAGES_TRACKED.inc(outcome=outcome["outcome"])
+        if outcome["outcome"] == "live":
+            PAGES_TIME_TO_LIVE.observe(outcome["seconds"])
+            self.typical = outcome["seconds"] if self.typical is None \
+                else 0.8 * self.typical + 0.2 * outcome["seconds"]
+            print(f"🌐 {repo_name} is live at {commit_sha[:7]} after {outcome['seconds']:.1f}s")
+        else:
+            print(f"⚠️ {repo_name} at {commit_sha[:7]}: Pages {outcome['outcome']} "
+                  f"after {outcome['seconds']:.1f}s")
+        done = on_done(outcome)
+        if inspect.isawaitable(done):
+            await done
+
+    async def _watch(self, github_manager, repo_name, commit_sha, pages_url, index_html, started):
+        expected = git_blob_sha(index_html) if index_html is not None else None
+        deadline = started + self.timeout
+        typical = self.typical if self.typical is not None else self.min_delay * 2
+        delay = min(self.max_delay, max(self.min_delay, typical / 2))
+        polls = 0
+        status = None
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return {"outcome": "timeout", "status": status, "polls": polls}
+            await asyncio.sleep(min(delay, remaining))
+            polls += 1
+            build = await github_manager.get_pages_build(repo_name, commit_sha)
+            status = build.get("status") if build else None
+            if status == "errored":
+                return {"outcome": "errored", "status": status, "polls": polls,
+                        "error": (build.get("error") or {}).get("message")}
+            # Without build info (not queued yet, or Pages not built from a branch) the content decides
+            if status in ("built", None) and await self._serves(pages_url, expected):
+                return {"outcome": "live", "status": status, "polls": polls}
+            if status == "built":
+                if build.get("superseded"):
+                    return {"outcome": "superseded", "status": status, "polls": polls}
+                # Built but the CDN still has the old page
+                delay = self.min_delay
+            elif status == "building":
+                delay = max(self.min_delay, min(delay, typical / 4))
+            else:
+                delay = min(self.max_delay, delay * 1.5)
+
+    @staticmethod
+    async def _serves(pages_url: str, expected: Optional[str]) -> bool:
+        """Whether the site answers with the pushed index.html (any 200 if it's unknown)"""
+        try:
+            response = await http_client.get_client().get(
+                pages_url, params={"v": str(time.time_ns())},
+                headers={"Cache-Control": "no-cache"}, follow_redirects=True)
+        except Exception:
+            return False
+        if response.status_code != 200:
+            return False
+        return expected is None or git_blob_sha(response.text) == expected
+
+    def stats(self) -> Dict:
+        return {**self.counters, "watching": len(self._tasks), "typical_seconds": round(self.typical, 1) if self.typical is not None else None}
@@ -0,0 +1,187 @@
+import json
+import os
+import re
+import tempfile
+from typing import Dict, List, NamedTuple, Optional
+
+_SEARCH = re.compile(r"^<{5,9} ?SEARCH\s*$")
+_DIVIDER = re.compile(r"^={5,9}\s*$")
+_REPLACE = re.compile(r"^>{5,9} ?REPLACE\s*$")
+_DELETE = re.compile(r"^\s*DELETE\s+`?([^`\s]+)`?\s*$")
+_FENCE = re.compile(r"^\s*(`{3,}|~{3,})")
+_PATH = re.compile(r"^(?:[\w.-]+/)*[\w.-]*\.[A-Za-z0-9]{1,10}$|^(?:LICENSE|Dockerfile|Makefile)$")
+
+
+class PatchError(Exception):
+    """A patch could not be parsed or doesn't apply to the current files"""
+
+
+class Edit(NamedTuple):
+    path: str
+    search: str
+    replace: Optional[str]  # None deletes the file
+
+
+def parse_edits(text: str) -> List[Edit]:
+    """
+    Parse search/replace blocks, each preceded by the path it edits:
+
+        index.html
+        <<<<<<< SEARCH
+        lines copied from the current file
+        =======
+        their replacement
+        >>>>>>> REPLACE
+
+    or a `DELETE path` line to remove a file. Fences and markdown around
+    the blocks are ignored. Raises PatchError
+    for a block that never closes (output cut off) or has no path.
+    """
+    edits = []
+    lines = text.splitlines()
+    path = None
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        deleted = _DELETE.match(line)
+        if deleted and _PATH.match(deleted.group(1)):
+            edits.append(Edit(deleted.group(1), "", None))
+            i += 1
+            continue
+        if not _SEARCH.match(line):
+            candidate = _path_of(line)
+            if candidate:
+                path = candidate
+            i += 1
+            continue
+        if path is None:
+            raise PatchError("SEARCH block without a file name")
+        search, replace = [], []
+        i += 1
+        while i < len(lines) and not _DIVIDER.match(lines[i]):
+            search.append(lines[i])
+            i += 1
+        i += 1
+        while i < len(lines) and not _REPLACE.match(lines[i]):
+            replace.append(lines[i])
+            i += 1
+        if i >= len(lines):
+            raise PatchError(f"Unterminated edit block for {path}")
+        edits.append(Edit(path, "\n".join(search), "\n".join(replace)))
+        i += 1
+    return edits
+
+
+def _path_of(line: str) -> Optional[str]:
+    """The file name on a line above a SEARCH block (`index.html`, **index.html**, File: index.html)"""
+    if _FENCE.match(line):
+        line = _FENCE.sub("", line)
+    line = line.strip().strip("*`#:").strip()
+    if line.lower().startswith("file:"):
+        line = line[5:].strip().strip("*`")
+    return line if _PATH.match(line) else None
+
+
+def apply_edits(files: Dict[str, str], edits: List[Edit]) -> Dict[str, str]:
+    """
+    Apply edits in order and return the new file map. SEARCH text must
+    occur exactly once, allowing for trailing whitespace differences; an
+    empty SEARCH creates a new file and a DELETE removes one. Raises
+    PatchError otherwise.
+    """
+    result = dict(files)
+    for edit in edits:
+        content = result.get(edit.path)
+        if edit.replace is None:
+            if content is None:
+                raise PatchError(f"DELETE of unknown file {edit.path}")
+            del result[edit.path]
+            continue
+        if not edit.search.strip():
+            if content is not None:
+                raise PatchError(f"Empty SEARCH for existing file {edit.path}")
+            result[edit.path] = edit.replace + ("\n" if edit.replace else "")
+            continue
+        if content is None:
+            raise PatchError(f"Edit for unknown file {edit.path}")
+        count = content.count(edit.search)
+        if count == 1:
+            result[edit.path] = content.replace(edit.search, edit.replace, 1)
+        elif count > 1:
+            raise PatchError(f"SEARCH text occurs {count} times in {edit.path}")
+        else:
+            result[edit.path] = _replace_lines(content, edit)
+    return result
+
+
+def _replace_lines(content: str, edit: Edit) -> str:
+    """Match SEARCH line by line ignoring trailing whitespace, which models often drop"""
+    lines = content.split("\n")
+    wanted = [line.rstrip() for line in edit.search.split("\n")]
+    stripped = [line.rstrip() for line in lines]
+    matches = [
+        start for start in range(len(lines) - len(wanted) + 1)
+        if stripped[start] == wanted[0] and stripped[start:start + len(wanted)] == wanted
+    ]
+    if len(matches) != 1:
+        raise PatchError(f"SEARCH text {'not found' if not matches else 'is ambiguous'} in {edit.path}")
+    start = matches[0]
+    return "\n".join(lines[:start] + edit.replace.split("\n") + lines[start + len(wanted):])
+
+
+def validate(before: Dict[str, str], after: Dict[str, str]) -> List[str]:
+    """Problems an applied patch introduced: emptied or deleted pages, or unbalanced HTML structure"""
+    problems = []
+    if "index.html" in before and "index.html" not in after:
+        problems.append("index.html was deleted")
+    for path, content in after.items():
+        if before.get(path, "").strip() and not content.strip():
+            problems.append(f"{path} is empty")
+        if not path.endswith((".html", ".htm")):
+            continue
+        lowered = content.lower()
+        old = before.get(path, "").lower()
+        for tag in ("html", "body", "script", "style"):
+            opened = len(re.findall(rf"<{tag}[\s>]", lowered))
+            closed = lowered.count(f"</{tag}>")
+            # Only flag what the patch broke, not what was already unbalanced
+            old_balanced = len(re.findall(rf"<{tag}[\s>]", old)) == old.count(f"</{tag}>")
+            if opened != closed and old_balanced:
+                problems.append(f"{path}: {opened} <{tag}> vs {closed} </{tag}>")
+    return problems
+
+
+class RevisionStore:
+    """
+    The files of the latest deployed round per repo, with the commit they
+    were pushed as, so round 2+ can patch them without reading the repo
+    back from GitHub. One JSON file per repo, replaced atomically.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, repo_name: str) -> str:
+        return os.path.join(self.directory, f"{re.sub(r'[^A-Za-z0-9._-]', '_', repo_name)}.json")
+
+    def load(self, repo_name: str) -> Optional[Dict]:
+        """{"commit_sha": ..., "files": {...}} or None"""
+        try:
+            with open(self._path(repo_name), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, repo_name: str, commit_sha: str, files: Dict[str, str]):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"commit_sha": commit_sha, "files": files}, f)
+            os.replace(tmp, self._path(repo_name))
+        except OSError as e:
+            print(f"⚠️ Could not save revision of {repo_name}: {e}")
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
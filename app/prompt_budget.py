@@ -0,0 +1,225 @@
+import csv
+import io
+import json
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+# Word-ish runs and single punctuation marks, roughly how BPE tokenizers split text
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]|\s+")
+
+# Chat formatting overhead per message and per completion
+_MESSAGE_OVERHEAD = 4
+_REPLY_OVERHEAD = 3
+
+_CSV_EXTENSIONS = (".csv", ".tsv")
+_JSON_EXTENSIONS = (".json", ".geojson")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap local token estimate. Words up to 5 characters are one token,
+    longer runs about one per 4 characters; whitespace mostly merges into the next word.
+    """
+    tokens = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        piece = match.group()
+        if piece[0].isspace():
+            tokens += piece.count("\n") // 2
+        elif len(piece) <= 5:
+            tokens += 1
+        else:
+            tokens += math.ceil(len(piece) / 4)
+    return tokens
+
+
+def estimate_messages(messages: List[Dict]) -> int:
+    return sum(estimate_tokens(m["content"]) + _MESSAGE_OVERHEAD for m in messages) + _REPLY_OVERHEAD
+
+
+def completion_budget(prompt_tokens: int, context_tokens: int, max_tokens: int,
+                      min_tokens: int, expected_tokens: Optional[int] = None, margin: float = 0.05) -> int:
+    """
+    max_tokens for a completion: the expected output size when it can be
+    predicted (capped at max_tokens), else max_tokens, and never more than
+    still fits the context window beside the prompt.
+    """
+    wanted = min(max_tokens, expected_tokens) if expected_tokens else max_tokens
+    available = int((context_tokens - prompt_tokens) * (1 - margin))
+    return max(min_tokens, min(wanted, available))
+
+
+class EstimateTracker:
+    """Running comparison of estimated vs reported prompt tokens"""
+
+    def __init__(self):
+        self.samples = 0
+        self.total_abs_error = 0.0
+
+    def record(self, estimated: int, actual: Optional[int]) -> Optional[float]:
+        """Record one completion; returns its signed error in percent"""
+        if not actual:
+            return None
+        error = (estimated - actual) / actual * 100
+        self.samples += 1
+        self.total_abs_error += abs(error)
+        return error
+
+    def stats(self) -> Dict:
+        return {
+            "samples": self.samples,
+            "mean_abs_error_pct": self.total_abs_error / self.samples if self.samples else 0.0,
+        }
+
+
+class PromptPacker:
+    """
+    Fit attachment contents into a prompt token budget.
+
+    Attachments that fit their share are inlined verbatim. Larger ones are
+    condensed by type: CSVs keep the header and a sample of rows, JSON is
+    reduced to its schema, and other text keeps its head and tail. Budget
+    left over by small attachments is passed on to the larger ones.
+    """
+
+    def __init__(self, budget: int, read_limit: int, sample_rows: int = 20):
+        self.budget = budget
+        self.read_limit = read_limit
+        self.sample_rows = sample_rows
+
+    def pack(self, attachments: list, reserved: int = 0) -> List[str]:
+        """Return one prompt section per attachment, in the original order"""
+        remaining = max(0, self.budget - reserved)
+        sections: Dict[int, str] = {}
+
+        text = [(i, att) for i, att in enumerate(attachments) if att.is_text]
+        for i, att in enumerate(attachments):
+            if not att.is_text:
+                sections[i] = f"File: {att.name} ({att.media_type}, {att.size} bytes, binary content not shown)"
+                remaining -= estimate_tokens(sections[i])
+
+        # Smallest first, so whatever they leave over goes to the larger files
+        text.sort(key=lambda item: item[1].size)
+        for n, (i, att) in enumerate(text):
+            share = max(0, remaining) // (len(text) - n)
+            try:
+                sections[i] = self._section(att, share)
+            except Exception as e:
+                print(f"⚠️ Failed to process attachment {att.name}: {e}")
+                continue
+            remaining -= estimate_tokens(sections[i])
+
+        return [sections[i] for i in sorted(sections)]
+
+    def _section(self, att, share: int) -> str:
+        content = att.read_text(limit=self.read_limit)
+        complete = att.size <= self.read_limit
+        if complete and estimate_tokens(content) <= share:
+            return f"File: {att.name}\n```\n{content}\n```"
+
+        name = att.name.lower()
+        if name.endswith(_CSV_EXTENSIONS) or att.media_type in ("text/csv", "application/csv"):
+            body = self._condense_csv(att, share)
+        elif name.endswith(_JSON_EXTENSIONS) or att.media_type == "application/json":
+            body = self._condense_json(att, content, complete, share)
+        else:
+            body = self._condense_text(content, complete, share)
+        print(f"✂️ Condensed {att.name} to fit ~{share} prompt tokens")
+        return f"File: {att.name} ({att.size} bytes, condensed)\n```\n{body}\n```"
+
+    def _condense_csv(self, att, share: int) -> str:
+        """Header plus as many leading sample rows as fit, and the total row count"""
+        delimiter = "\t" if att.name.lower().endswith(".tsv") else ","
+        lines: List[str] = []
+        used = 0
+        rows = 0
+        sampling = True
+        with open(att.path, "r", encoding="utf-8", errors="replace", newline="") as f:
+            for row in csv.reader(f, delimiter=delimiter):
+                rows += 1
+                if not sampling:
+                    continue
+                out = io.StringIO()
+                csv.writer(out, delimiter=delimiter, lineterminator="\n").writerow(row)
+                cost = estimate_tokens(out.getvalue())
+                # The header is always kept; rows are sampled while they fit
+                if lines and (used + cost > share or len(lines) > self.sample_rows):
+                    sampling = False
+                    continue
+                lines.append(out.getvalue())
+                used += cost
+        data_rows = max(0, rows - 1)
+        sampled = max(0, len(lines) - 1)
+        return "".join(lines) + f"[{sampled} of {data_rows} data rows shown]"
+
+    def _condense_json(self, att, content: str, complete: bool, share: int) -> str:
+        """
+        The document's schema (keys, types, array lengths) instead of its
+        values, when it fits in the read limit; otherwise the text prefix,
+        so a large document is never loaded whole
+        """
+        if not complete:
+            return self._condense_text(content, complete, share)
+        try:
+            schema = _json_schema(json.loads(content))
+        except ValueError:
+            return self._condense_text(content, complete, share)
+        text = json.dumps(schema, indent=1)
+        if estimate_tokens(text) <= share:
+            return "[schema of the JSON document]\n" + text
+        return "[schema of the JSON document, compacted]\n" + \
+            self._condense_text(json.dumps(schema, separators=(",", ":")), True, share)
+
+    def _condense_text(self, content: str, complete: bool, share: int) -> str:
+        """Keep the head and tail of the text, dropping the middle"""
+        lines = content.splitlines()
+        if not complete and len(lines) > 1:
+            # The last line of a partial read may be cut mid-way
+            lines.pop()
+        head: List[str] = []
+        tail: List[str] = []
+        used = 0
+        lo, hi = 0, len(lines) - 1
+        take_head = True
+        while lo <= hi:
+            line = lines[lo] if take_head else lines[hi]
+            cost = estimate_tokens(line) + 1
+            if used + cost > share:
+                break
+            used += cost
+            if take_head:
+                head.append(line)
+                lo += 1
+            else:
+                tail.append(line)
+                hi -= 1
+            # Roughly two thirds of the budget goes to the head; a partial
+            # read has no real tail, so it only keeps the head
+            take_head = not complete or len(head) < 2 * (len(tail) + 1)
+        if not head and lines:
+            # A single line longer than the share (minified data) is cut by characters
+            head.append(lines[0][:share * 4] + " [...]")
+            lo = 1
+        omitted = hi - lo + 1
+        if not complete:
+            return "\n".join(head + ["[... file truncated ...]"])
+        marker = [f"[... {omitted} lines omitted ...]"] if omitted > 0 else []
+        return "\n".join(head + marker + list(reversed(tail)))
+
+
+def _json_schema(value: Any, depth: int = 0) -> Any:
+    if isinstance(value, dict):
+        if depth >= 6:
+            return "object"
+        return {key: _json_schema(item, depth + 1) for key, item in value.items()}
+    if isinstance(value, list):
+        if not value:
+            return []
+        return [_json_schema(value[0], depth + 1), f"... {len(value)} items"]
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if value is None:
+        return "null"
+    return "string"
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import secrets
+import tempfile
+from typing import Dict, List, Optional
+
+from . import github_scheduler
+from .metrics import REGISTRY
+
+REPO_POOL_CLAIMS = REGISTRY.counter(
+    "repo_pool_claims_total", "Round 1 repo requests served from the warm pool, by outcome (claimed, empty, failed)")
+
+
+class RepoPool:
+    """
+    Placeholder repos created ahead of time, with main initialized and
+    Pages enabled, so a new task only pays for a rename. A background task
+    keeps `size` of them available, at the scheduler's BACKGROUND priority
+    so refills never hold up deploys. Names of available placeholders are
+    kept in a JSON file so a restart reuses them instead of creating more.
+    """
+
+    def __init__(self, manager, size: int, path: str, prefix: str = "pool-"):
+        self.manager = manager
+        self.size = size
+        self.path = path
+        self.prefix = prefix
+        self.available: List[str] = self._load()
+        self.counters = {"created": 0, "claimed": 0, "empty": 0, "failed": 0}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _load(self) -> List[str]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return [name for name in json.load(f) if isinstance(name, str)]
+        except (OSError, ValueError):
+            return []
+
+    def _save(self):
+        directory = os.path.dirname(self.path) or "."
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.available, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not save the repo pool: {e}")
+
+    async def start(self):
+        if self._task is None and self.size > 0:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            print(f"✅ Repo pool started ({len(self.available)}/{self.size} placeholders available)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def claim(self, repo_name: str, description: str = "") -> Optional[Dict]:
+        """
+        Rename an available placeholder to repo_name, replacing its
+        "reserved" description, and return the renamed repo's metadata, or
+        None if the pool is empty or no rename worked (the caller then
+        creates the repo itself). The placeholder README is replaced by the
+        first push.
+        """
+        while self.available:
+            placeholder = self.available.pop(0)
+            self._save()
+            self._refill()
+            try:
+                repo = await self.manager.rename_repo(placeholder, repo_name, description)
+            except Exception as e:
+                self.counters["failed"] += 1
+                REPO_POOL_CLAIMS.inc(outcome="failed")
+                if getattr(e, "status", None) == 422:
+                    # repo_name is taken: the placeholder is still good
+                    self.available.insert(0, placeholder)
+                    self._save()
+                    print(f"⚠️ Could not rename {placeholder} to {repo_name}: {e}")
+                    return None
+                print(f"⚠️ Dropping pool placeholder {placeholder}: {e}")
+                continue
+            self.counters["claimed"] += 1
+            REPO_POOL_CLAIMS.inc(outcome="claimed")
+            print(f"♻️ Claimed pooled repo {placeholder} as {repo_name}")
+            return repo
+        self.counters["empty"] += 1
+        REPO_POOL_CLAIMS.inc(outcome="empty")
+        return None
+
+    def _refill(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        with github_scheduler.priority(github_scheduler.BACKGROUND):
+            while True:
+                self._wakeup.clear()
+                failed = False
+                while len(self.available) < self.size and not failed:
+                    name = f"{self.prefix}{secrets.token_hex(4)}"
+                    try:
+                        await self.manager.provision_placeholder(name)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        print(f"⚠️ Repo pool refill failed: {e}")
+                        failed = True
+                        continue
+                    self.available.append(name)
+                    self.counters["created"] += 1
+                    self._save()
+                    print(f"🏊 Provisioned pool placeholder {name} ({len(self.available)}/{self.size})")
+                if not failed:
+                    await self._wakeup.wait()
+                    continue
+                # Back off after a failure before trying again
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), 60)
+                except asyncio.TimeoutError:
+                    pass
+
+    def stats(self) -> Dict:
+        return {"size": self.size, "available": len(self.available), **self.counters}
@@ -0,0 +1,198 @@
+import json
+import re
+from typing import Dict, List, Optional
+
+from .stream_parser import IncrementalFileMapParser
+
+_FENCE = re.compile(r"^[ \t]*(`{3,}|~{3,})[ \t]*([^\n`]*?)[ \t]*$", re.MULTILINE)
+_FILENAME = re.compile(r"(?<![\w/.-])((?:[\w.-]+/)*[\w.-]*\.[A-Za-z0-9]{1,10}|LICENSE|README|Dockerfile|Makefile)(?![\w/-])")
+_LANGUAGE_FILES = {
+    "html": "index.html",
+    "markdown": "README.md",
+    "md": "README.md",
+    "css": "style.css",
+    "js": "script.js",
+    "javascript": "script.js",
+}
+_HTML_START = re.compile(r"<!DOCTYPE html|<html[\s>]", re.IGNORECASE)
+_HTML_END = re.compile(r"</html\s*>", re.IGNORECASE)
+# Where a JSON file map can start: a brace followed by a key
+_JSON_START = re.compile(r'\{\s*"')
+# Brace-and-quote candidates tried before giving up on JSON (each parse stops where it fails)
+_MAX_JSON_CANDIDATES = 8
+
+
+class ParsedResponse:
+    """Files recovered from a completion and whether the completion was cut off"""
+
+    def __init__(self, files: Dict[str, str], method: str, complete: bool = True,
+                 truncated: Optional[str] = None):
+        self.files = files
+        self.method = method
+        # False when the output stops before its closing brace or fence
+        self.complete = complete and truncated is None
+        # Name of the file whose content stops mid-way, if any
+        self.truncated = truncated
+
+
+def parse_response(text: str) -> ParsedResponse:
+    """
+    Recover a {filename: content} map from a model completion in linear time.
+
+    In order of preference: a JSON object (anywhere in the text, fenced or
+    not, tolerating trailing commas, raw newlines and invalid escapes),
+    then fenced ```lang filename``` blocks, then a bare HTML document.
+    Output cut off mid-file keeps the partial file and names it in
+    `truncated`, so the caller can ask for just the missing tail.
+    """
+    parsed = _parse_json(text)
+    if parsed is not None and parsed.files:
+        return parsed
+    fenced = _parse_fenced(text)
+    if fenced.files:
+        return fenced
+    html = _parse_html(text)
+    if html is not None:
+        return html
+    return ParsedResponse({}, "none")
+
+
+def _parse_json(text: str) -> Optional[ParsedResponse]:
+    """The first brace-and-key candidate that parses as a file map, so braces in prose are skipped"""
+    for attempt, match in enumerate(_JSON_START.finditer(text)):
+        if attempt == _MAX_JSON_CANDIDATES:
+            break
+        parsed = _parse_json_at(text, match.start())
+        if parsed is not None:
+            return parsed
+    return None
+
+
+def _parse_json_at(text: str, start: int) -> Optional[ParsedResponse]:
+    parser = IncrementalFileMapParser()
+    parser.feed(text[start:])
+    if parser.complete:
+        return ParsedResponse(dict(parser.files), "json")
+    if not parser.failed:
+        # Cut off mid-object; keep what arrived, including a partial value
+        files = dict(parser.files)
+        pending = parser.pending
+        if pending is not None:
+            files[pending[0]] = pending[1]
+        return ParsedResponse(files, "json", complete=False,
+                              truncated=pending[0] if pending else None)
+    # Not a flat string map: maybe {"files": {...}} or non-string values
+    nested = _parse_nested(text, start)
+    if nested:
+        return ParsedResponse(nested, "json")
+    if parser.files:
+        return ParsedResponse(dict(parser.files), "json")
+    return None
+
+
+def _parse_nested(text: str, start: int) -> Optional[Dict[str, str]]:
+    try:
+        value, _ = json.JSONDecoder(strict=False).raw_decode(text, start)
+    except ValueError:
+        return None
+    if isinstance(value, dict) and len(value) == 1:
+        inner = next(iter(value.values()))
+        if isinstance(inner, dict):
+            value = inner
+    if not isinstance(value, dict):
+        return None
+    files = {name: content for name, content in value.items() if isinstance(content, str)}
+    return files or None
+
+
+def _parse_fenced(text: str) -> ParsedResponse:
+    """Fenced code blocks, named by their info string or the line just above the fence"""
+    files: Dict[str, str] = {}
+    complete, truncated = True, None
+    opening = None
+    for fence in _FENCE.finditer(text):
+        if opening is None:
+            opening = fence
+            continue
+        # A closing fence is bare and uses at least as many of the same character;
+        # any other fence inside the block is part of its content
+        marker = opening.group(1)
+        if fence.group(2) or fence.group(1)[0] != marker[0] or len(fence.group(1)) < len(marker):
+            continue
+        _add_block(files, text, opening, text[opening.end() + 1:fence.start()].rstrip("\n"))
+        opening = None
+    if opening is not None:
+        # Cut off inside the last block
+        name, nested = _add_block(files, text, opening, text[opening.end() + 1:])
+        if nested is not None:
+            complete, truncated = nested.complete, nested.truncated
+        elif name is not None:
+            truncated = name
+    return ParsedResponse(files, "fenced", complete, truncated)
+
+
+def _add_block(files: Dict[str, str], text: str, opening, body: str):
+    """Add a fenced block's file(s); returns its name and, for a ```json block, the parsed map"""
+    info = opening.group(2)
+    name = _block_name(text, opening.start(), info)
+    if name is None and info.split()[:1] == ["json"]:
+        nested = _parse_json(body)
+        if nested is not None and nested.files:
+            files.update(nested.files)
+            return None, nested
+        return None, None
+    if name is not None:
+        files[name] = body
+    return name, None
+
+
+def _block_name(text: str, fence_start: int, info: str) -> Optional[str]:
+    words = info.split()
+    for word in words:
+        match = _FILENAME.fullmatch(word.strip("`'\"*:"))
+        if match:
+            return match.group(1)
+    # A heading, bold or "File:" line right above the block
+    line_end = text.rfind("\n", 0, fence_start)
+    if line_end != -1:
+        line_start = text.rfind("\n", 0, line_end) + 1
+        match = _FILENAME.search(text, line_start, line_end)
+        if match:
+            return match.group(1)
+    if words:
+        return _LANGUAGE_FILES.get(words[0].lower())
+    return None
+
+
+def _parse_html(text: str) -> Optional[ParsedResponse]:
+    start = _HTML_START.search(text)
+    if start is None:
+        return None
+    end = _HTML_END.search(text, start.start())
+    if end is None:
+        return ParsedResponse({"index.html": text[start.start():]}, "html", truncated="index.html")
+    return ParsedResponse({"index.html": text[start.start():end.end()]}, "html")
+
+
+def continuation_messages(messages: List[Dict], partial: str) -> List[Dict]:
+    """
+    Messages asking the model to carry on from where a cut-off completion
+    stopped, so only the missing tail is generated.
+    """
+    return messages + [
+        {"role": "assistant", "content": partial},
+        {"role": "user", "content": "Your previous reply was cut off. Continue exactly where it "
+                                    "stopped: output only the remaining characters, without "
+                                    "repeating anything or adding commentary."},
+    ]
+
+
+def join_continuation(partial: str, tail: str) -> str:
+    """
+    Append a continuation to the cut-off text. A fence the model opens the
+    continuation with is dropped; repeated overlap isn't, since generated
+    content (runs of markup, padding) repeats too often to trim safely.
+    """
+    if not partial.rstrip().endswith("```"):
+        tail = re.sub(r"^\s*```[\w-]*\n", "", tail, count=1)
+    return partial + tail
@@ -0,0 +1,166 @@
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Parser states
+_SEEK_OBJECT = "seek_object"
+_SEEK_KEY = "seek_key"
+_IN_KEY = "in_key"
+_SEEK_COLON = "seek_colon"
+_SEEK_VALUE = "seek_value"
+_IN_VALUE = "in_value"
+_DONE = "done"
+_FAILED = "failed"
+
+# strict=False tolerates raw newlines/tabs that models leave inside strings
+_decoder = json.JSONDecoder(strict=False)
+
+_UNICODE_ESCAPE = re.compile(r"[0-9a-fA-F]{4}")
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+
+def repair_escapes(raw: str) -> str:
+    """
+    Double the backslash of invalid JSON escapes (\\d, \\s in regexes, a
+    \\u cut short) so the rest of the string still decodes; one linear pass.
+    """
+    out = []
+    i = 0
+    n = len(raw)
+    while i < n:
+        j = raw.find("\\", i)
+        if j == -1:
+            out.append(raw[i:])
+            break
+        out.append(raw[i:j])
+        nxt = raw[j + 1:j + 2]
+        if nxt and nxt in '"\\/bfnrt':
+            out.append(raw[j:j + 2])
+            i = j + 2
+        elif nxt == "u" and _UNICODE_ESCAPE.fullmatch(raw, j + 2, j + 6):
+            out.append(raw[j:j + 6])
+            i = j + 6
+        else:
+            out.append("\\\\")
+            i = j + 1
+    return "".join(out)
+
+
+def decode_string(raw: str) -> str:
+    """Decode the body of a JSON string, tolerating raw control characters and bad escapes"""
+    try:
+        return _decoder.decode('"' + raw + '"')
+    except ValueError:
+        return _decoder.decode('"' + repair_escapes(raw) + '"')
+
+
+class IncrementalFileMapParser:
+    """
+    Incrementally parse a streamed JSON object of {"filename": "content"}.
+
+    Text is fed in arbitrary chunks; each file is returned from feed() as
+    soon as its string value closes. Prose or a ```json fence before the
+    object is skipped. Anything that isn't a flat string map puts the
+    parser in a failed state, and callers fall back to parsing the full
+    completion once it has arrived.
+    """
+
+    def __init__(self):
+        self.state = _SEEK_OBJECT
+        self.files: Dict[str, str] = {}
+        self._raw: List[str] = []
+        self._backslash = False
+        self._key = ""
+
+    @property
+    def complete(self) -> bool:
+        return self.state == _DONE
+
+    @property
+    def failed(self) -> bool:
+        return self.state == _FAILED
+
+    @property
+    def pending(self) -> Optional[Tuple[str, str]]:
+        """The file whose value is still open (cut off so far) and its partial content"""
+        if self.state != _IN_VALUE:
+            return None
+        raw = "".join(self._raw)
+        if self._backslash:
+            # Drop the half of an escape sequence that hasn't arrived
+            raw = raw[:-1]
+        try:
+            return self._key, decode_string(raw)
+        except ValueError:
+            return self._key, raw
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """Consume a chunk of text; return the files completed by it"""
+        completed = []
+        i = 0
+        n = len(chunk)
+        while i < n and self.state not in (_DONE, _FAILED):
+            state = self.state
+            if state in (_IN_KEY, _IN_VALUE):
+                i = self._scan_string(chunk, i, completed)
+                continue
+
+            ch = chunk[i]
+            i += 1
+            if state == _SEEK_OBJECT:
+                if ch == "{":
+                    self.state = _SEEK_KEY
+            elif ch.isspace():
+                continue
+            elif state == _SEEK_KEY:
+                if ch == '"':
+                    self.state = _IN_KEY
+                elif ch == "}":
+                    self.state = _DONE
+                elif ch != ",":
+                    self.state = _FAILED
+            elif state == _SEEK_COLON:
+                self.state = _SEEK_VALUE if ch == ":" else _FAILED
+            elif state == _SEEK_VALUE:
+                self.state = _IN_VALUE if ch == '"' else _FAILED
+        return completed
+
+    def _scan_string(self, chunk: str, i: int, completed: list) -> int:
+        """Scan raw string characters up to the closing quote; return the next index"""
+        start = i
+        n = len(chunk)
+        backslash = self._backslash
+        # Jump between quotes and backslashes rather than stepping through every character
+        while i < n:
+            if backslash:
+                backslash = False
+                i += 1
+                continue
+            match = _STRING_SPECIAL.search(chunk, i)
+            if match is None:
+                i = n
+                break
+            i = match.start()
+            if chunk[i] == '"':
+                break
+            backslash = True
+            i += 1
+        self._raw.append(chunk[start:i])
+        self._backslash = backslash
+        if i == n:
+            return i
+
+        try:
+            value = decode_string("".join(self._raw))
+        except ValueError:
+            self.state = _FAILED
+            return i + 1
+        self._raw = []
+        if self.state == _IN_KEY:
+            self._key = value
+            self.state = _SEEK_COLON
+        else:
+            self.files[self._key] = value
+            completed.append((self._key, value))
+            self.state = _SEEK_KEY
+        return i + 1
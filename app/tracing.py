@@ -0,0 +1,127 @@
+import contextvars
+import functools
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from . import config
+from .metrics import SPAN_SECONDS
+
+# Trace and parent span of the current task; asyncio tasks and to_thread
+# calls inherit them, so spans opened anywhere in a deploy join its trace
+_trace_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+_span_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("span_id", default=None)
+
+
+class TraceStore:
+    """Finished spans of the most recent traces, for the traces endpoint"""
+
+    def __init__(self, max_traces: int = 200, max_spans: int = 1000):
+        self.max_traces = max_traces
+        self.max_spans = max_spans
+        self._traces: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, trace_id: str, record: Dict):
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            if spans is None:
+                spans = self._traces[trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            if len(spans) < self.max_spans:
+                spans.append(record)
+
+    def get(self, trace_id: str) -> Optional[List[Dict]]:
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            return sorted(spans, key=lambda s: s["start"]) if spans is not None else None
+
+    def recent(self, limit: int = 50) -> List[Dict]:
+        """Summary of the newest traces: root span, total duration and span count"""
+        with self._lock:
+            items = list(self._traces.items())[-limit:]
+        summaries = []
+        for trace_id, spans in reversed(items):
+            roots = [s for s in spans if s["parent_id"] is None]
+            root = roots[0] if roots else None
+            summaries.append({
+                "trace_id": trace_id,
+                "name": root["name"] if root else None,
+                "status": root["status"] if root else "running",
+                "duration_ms": root["duration_ms"] if root else None,
+                "spans": len(spans),
+            })
+        return summaries
+
+
+traces = TraceStore(max_traces=config.TRACE_HISTORY)
+
+
+def current_trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+
+@contextmanager
+def trace(trace_id: Optional[str] = None):
+    """Run the enclosed code under a trace id (a new one by default)"""
+    trace_token = _trace_id.set(trace_id or uuid.uuid4().hex)
+    span_token = _span_id.set(None)
+    try:
+        yield _trace_id.get()
+    finally:
+        _span_id.reset(span_token)
+        _trace_id.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time the enclosed code as a span of the current trace. Yields the
+    attribute dict so callers can add attributes (status codes, sizes)
+    before the span ends.
+    """
+    span_id = uuid.uuid4().hex[:16]
+    parent_id = _span_id.get()
+    token = _span_id.set(span_id)
+    start = time.time()
+    status = "ok"
+    try:
+        yield attributes
+    except BaseException as e:
+        status = "cancelled" if type(e).__name__ == "CancelledError" else "error"
+        attributes.setdefault("error", str(e) or type(e).__name__)
+        raise
+    finally:
+        _span_id.reset(token)
+        duration = time.time() - start
+        SPAN_SECONDS.observe(duration, span=name, status=status)
+        record = {
+            "trace_id": _trace_id.get(),
+            "span_id": span_id,
+            "parent_id": parent_id,
+            "name": name,
+            "status": status,
+            "start": start,
+            "duration_ms": round(duration * 1000, 3),
+            "attributes": attributes,
+        }
+        if record["trace_id"] is not None:
+            traces.add(record["trace_id"], record)
+        if config.TRACE_LOG:
+            print(json.dumps({"event": "span", **record}, default=str))
+
+
+def traced(name: str):
+    """Decorator that runs an async function inside a span"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
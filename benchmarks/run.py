@@ -0,0 +1,320 @@
+"""
+Throughput/latency benchmark of the deploy pipeline against in-process fake
+upstreams (see tests/fakes.py); runs offline from the repository root.
+
+    python -m benchmarks.run --concurrency 1,4,16 --requests 32
+    python -m benchmarks.run --json baseline.json
+    python -m benchmarks.run --baseline baseline.json --max-regression 0.25
+    python -m benchmarks.run --parser 100000,1000000
+
+Every request goes through /api/deploy and the real pipeline: attachment
+spooling, prompt packing, the LLM router, the Git Data push, Pages and
+the notification outbox. Only the upstreams are simulated.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+BENCH_ENV = {
+    "OPENAI_API_KEY": "bench-token",
+    "AIPIPE_EMAIL": "bench@example.com",
+    "AIPIPE_BASE_URL": "http://aipipe.bench/openrouter/v1",
+    "GITHUB_TOKEN": "bench-token",
+    "GITHUB_USER": "bench",
+    "GITHUB_API_URL": "http://github.bench",
+    "DEPLOYMENT_SECRET": "bench-secret",
+    "MOCK_MODE": "false",
+    "GENERATION_CACHE_ENABLED": "false",
+    "TRACE_LOG": "false",
+    "OUTBOX_POLL_INTERVAL": "0.05",
+    "PAGES_POLL_MIN_DELAY": "0.1",
+    "PAGES_POLL_MAX_DELAY": "1",
+}
+
+
+def percentile(values: List[float], p: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def summarize(values: List[float]) -> Dict:
+    return {"count": len(values), "p50": percentile(values, 50),
+            "p95": percentile(values, 95), "p99": percentile(values, 99)}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the deploy pipeline against fake upstreams")
+    parser.add_argument("--concurrency", default="1,4,16",
+                        help="comma-separated concurrent clients per run")
+    parser.add_argument("--requests", type=int, default=32, help="deploys per concurrency level")
+    parser.add_argument("--rounds", type=int, default=1,
+                        help="rounds per deploy; round 2+ updates the same repo")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="DEPLOY_WORKERS (defaults to the highest concurrency)")
+    parser.add_argument("--llm-latency", default="1.0:4.0", help="time to first token, median[:p99] seconds")
+    parser.add_argument("--llm-errors", type=float, default=0.0, help="fraction of failed LLM calls")
+    parser.add_argument("--llm-chars-per-second", type=float, default=4000.0)
+    parser.add_argument("--github-latency", default="0.05:0.3", help="median[:p99] seconds per API call")
+    parser.add_argument("--github-errors", type=float, default=0.0)
+    parser.add_argument("--github-writes-per-minute", type=float, default=0.0,
+                        help="pace GitHub writes like production (GitHub allows 80); 0 disables pacing")
+    parser.add_argument("--repo-pool", type=int, default=0,
+                        help="REPO_POOL_SIZE: placeholder repos provisioned before the run")
+    parser.add_argument("--pages-build-seconds", type=float, default=1.0,
+                        help="time the fake Pages takes to build a push (GitHub takes 30-60s)")
+    parser.add_argument("--eval-latency", default="0.02:0.1", help="median[:p99] seconds")
+    parser.add_argument("--eval-errors", type=float, default=0.0)
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed relative p95 increase / throughput drop vs the baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=10.0,
+                        help="ignore p95 increases smaller than this (noise on sub-ms stages)")
+    parser.add_argument("--verbose", action="store_true", help="keep the application's log output")
+    parser.add_argument("--parser", metavar="SIZES",
+                        help="benchmark the response parser on comma-separated response sizes (bytes) instead")
+    return parser.parse_args(argv)
+
+
+async def run_level(main, client, concurrency: int, requests: int, rounds: int, label: str) -> Dict:
+    """Drive `requests` deploys through /api/deploy with `concurrency` clients"""
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    overlap_saved: List[float] = []
+    outcomes = {"succeeded": 0, "failed": 0, "rejected": 0}
+    counter = iter(range(requests))
+
+    async def deploy(index: int):
+        task = f"bench-{label}-{index}"
+        for round_number in range(1, rounds + 1):
+            start = time.perf_counter()
+            response = await client.post("/api/deploy", json={
+                "email": "bench@example.com",
+                "secret": BENCH_ENV["DEPLOYMENT_SECRET"],
+                "task": task,
+                "round": round_number,
+                "nonce": f"{task}-r{round_number}",
+                "brief": f"Benchmark app {task} round {round_number}",
+                "checks": ["Repo has MIT license", "Page has an `h1`",
+                           "js: !!document.querySelector('head > title')"],
+                "evaluation_url": "http://evaluator.bench/notify",
+                "attachments": [{"name": "data.csv",
+                                 "url": "data:text/csv;base64,aWQsdmFsdWUKMSwxMAoyLDIwCg=="}],
+            })
+            if response.status_code >= 300:
+                outcomes["rejected"] += 1
+                return
+            job = main.job_queue.get(response.json()["job_id"])
+            await job.wait()
+            latencies.append(time.perf_counter() - start)
+            outcomes[job.status] += 1
+            for name, info in job.stages.items():
+                if "duration" in info:
+                    stages.setdefault(name, []).append(info["duration"])
+            if job.result and "overlap_saved_seconds" in job.result:
+                overlap_saved.append(job.result["overlap_saved_seconds"])
+
+    async def client_loop():
+        for index in counter:
+            await deploy(index)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    completed = outcomes["succeeded"] + outcomes["failed"]
+    return {
+        "concurrency": concurrency,
+        "requests": requests * rounds,
+        "elapsed_seconds": elapsed,
+        "throughput_per_second": completed / elapsed if elapsed else 0.0,
+        **outcomes,
+        "end_to_end": summarize(latencies),
+        "stages": {name: summarize(values) for name, values in stages.items()},
+        "overlap_saved": summarize(overlap_saved),
+    }
+
+
+async def run(args) -> Dict:
+    from app import http_client
+    from app import main
+    from tests.fakes import FakeAIPipe, FakeEvaluator, FakeGitHub, FakeUpstreams, Latency
+    import httpx
+
+    fakes = FakeUpstreams(
+        os.environ["AIPIPE_BASE_URL"],
+        os.environ["GITHUB_API_URL"],
+        FakeAIPipe(Latency.parse(args.llm_latency), args.llm_errors, args.llm_chars_per_second),
+        FakeGitHub(os.environ["GITHUB_USER"], Latency.parse(args.github_latency), args.github_errors,
+                   pages_build_seconds=args.pages_build_seconds),
+        FakeEvaluator(Latency.parse(args.eval_latency), args.eval_errors),
+    )
+    http_client.use_transport(fakes)
+
+    levels = []
+    async with main.app.router.lifespan_context(main.app):
+        await main.components_ready.wait()
+        pool = main.github_manager.repo_pool
+        deadline = time.monotonic() + 30
+        while len(pool.available) < pool.size and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app),
+                                     base_url="http://api.bench") as client:
+            for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+                result = await run_level(main, client, concurrency, args.requests, args.rounds,
+                                         label=f"c{concurrency}")
+                levels.append(result)
+                print_level(result, file=sys.__stdout__)
+            # Let every tracked deploy settle and the outbox deliver what it released;
+            # the tracker gives up after PAGES_READY_TIMEOUT, so this ends
+            deadline = time.monotonic() + main.pages_tracker.timeout + 30
+            while main.pages_tracker.stats()["watching"] or \
+                    await asyncio.to_thread(main.notification_outbox.pending_count):
+                if time.monotonic() >= deadline:
+                    print("⚠️ Pages tracking or the outbox did not settle", file=sys.__stdout__)
+                    break
+                await asyncio.sleep(0.05)
+            outbox = await asyncio.to_thread(main.notification_outbox.stats)
+            pages = main.pages_tracker.stats()
+
+    return {"levels": levels, "upstreams": fakes.stats(), "outbox": outbox, "pages": pages,
+            "args": vars(args)}
+
+
+def _ms(value) -> str:
+    return f"{value * 1000:8.1f}" if value is not None else "       -"
+
+
+def print_level(result: Dict, file=None):
+    file = file or sys.stdout
+    print(f"\n=== concurrency {result['concurrency']}: {result['requests']} deploys in "
+          f"{result['elapsed_seconds']:.2f}s, {result['throughput_per_second']:.2f}/s "
+          f"({result['succeeded']} ok, {result['failed']} failed, {result['rejected']} rejected)", file=file)
+    print(f"{'':14}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}", file=file)
+    rows = [("end_to_end", result["end_to_end"])] + list(result["stages"].items())
+    for name, s in rows:
+        print(f"{name:14}{_ms(s['p50'])} {_ms(s['p95'])} {_ms(s['p99'])}", file=file)
+    if result.get("overlap_saved"):
+        s = result["overlap_saved"]
+        print(f"{'overlap saved':14}{_ms(s['p50'])} {_ms(s['p95'])} {_ms(s['p99'])}", file=file)
+
+
+def compare(results: Dict, baseline: Dict, max_regression: float, min_delta: float = 0.01) -> List[str]:
+    """Regressions beyond max_regression, per concurrency level present in both runs"""
+    problems = []
+    previous = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    for level in results["levels"]:
+        base = previous.get(level["concurrency"])
+        if base is None:
+            continue
+        c = level["concurrency"]
+        if base["throughput_per_second"] and \
+                level["throughput_per_second"] < base["throughput_per_second"] * (1 - max_regression):
+            problems.append(f"c={c} throughput {level['throughput_per_second']:.2f}/s vs "
+                            f"{base['throughput_per_second']:.2f}/s")
+        pairs = [("end_to_end", level["end_to_end"], base["end_to_end"])] + [
+            (name, s, base["stages"].get(name)) for name, s in level["stages"].items()
+        ]
+        for name, current, before in pairs:
+            if not before or not before.get("p95") or current.get("p95") is None:
+                continue
+            if current["p95"] > before["p95"] * (1 + max_regression) and \
+                    current["p95"] - before["p95"] >= min_delta:
+                problems.append(f"c={c} {name} p95 {current['p95'] * 1000:.1f}ms vs "
+                                f"{before['p95'] * 1000:.1f}ms")
+    return problems
+
+
+def parser_samples(size: int) -> Dict[str, str]:
+    """Completions of roughly `size` characters in the shapes models actually return"""
+    row = '<div class="row" data-id="{i}">Item {i}: "quoted" \\ value</div>\n'
+    html = "<!DOCTYPE html>\n<html><body>\n"
+    html += "".join(row.format(i=i) for i in range(size // len(row)))
+    html += "</body></html>"
+    files = {"index.html": html, "README.md": "# Benchmark\n\nGenerated app.\n", "LICENSE": "MIT License"}
+    clean = json.dumps(files)
+    return {
+        "json": clean,
+        "json_in_prose": "Here is the app you asked for:\n\n```json\n" + clean[:-1] + ",}\n```\nEnjoy!",
+        "raw_newlines": clean.replace("\\n", "\n"),
+        "fenced_blocks": "".join(f"**{name}**\n```\n{content}\n```\n\n" for name, content in files.items()),
+        "truncated": clean[:len(clean) * 2 // 3],
+    }
+
+
+def run_parser(sizes: List[int], repeat: int = 5) -> Dict:
+    from app.response_parser import parse_response
+
+    results = {}
+    print(f"{'':16}{'size KB':>9}{'ms':>9}{'MB/s':>9}  files  complete")
+    for size in sizes:
+        for shape, text in parser_samples(size).items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                parsed = parse_response(text)
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            results[f"{shape}@{size}"] = {"bytes": len(text), "seconds": best, "files": len(parsed.files),
+                                          "complete": parsed.complete, "method": parsed.method}
+            print(f"{shape:16}{len(text) / 1024:9.0f}{best * 1000:9.2f}{len(text) / best / 1e6:9.1f}"
+                  f"  {len(parsed.files):5}  {parsed.complete}")
+    return results
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.parser:
+        results = run_parser([int(s) for s in args.parser.split(",") if s.strip()])
+        if args.json_path:
+            with open(args.json_path, "w") as f:
+                json.dump({"parser": results}, f, indent=2)
+        return 0
+    state_dir = tempfile.mkdtemp(prefix="llm-deployer-bench-")
+    concurrency = max(int(c) for c in args.concurrency.split(",") if c.strip())
+    # Settings are read at import time, so the environment is prepared first
+    os.environ.update(BENCH_ENV)
+    os.environ["STATE_DIR"] = state_dir
+    os.environ["DEPLOY_WORKERS"] = str(args.workers or concurrency)
+    os.environ["REPO_POOL_SIZE"] = str(args.repo_pool)
+    # The fake GitHub has no secondary limits, so pacing is off unless asked for
+    pacing = args.github_writes_per_minute or 1e9
+    os.environ["GITHUB_WRITES_PER_MINUTE"] = str(pacing)
+    os.environ["GITHUB_WRITES_PER_HOUR"] = str(pacing * 60)
+
+    log = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with log:
+        results = asyncio.run(run(args))
+
+    print(f"\nUpstream calls: {json.dumps(results['upstreams'])}")
+    print(f"Outbox: {results['outbox']['delivered']} delivered, {results['outbox']['depth']} pending")
+    pages = results["pages"]
+    unconfirmed = pages["tracked"] - pages["live"]
+    print(f"Pages: {pages['live']} live, {unconfirmed} not confirmed ({pages['watching']} still watched), "
+          f"typical time-to-live {pages['typical_seconds']}s")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json_path}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(results, json.load(f), args.max_regression, args.min_delta_ms / 1000)
+        if problems:
+            print(f"\n❌ {len(problems)} regression(s) over {args.max_regression:.0%}:")
+            for problem in problems:
+                print(f"  - {problem}")
+            return 1
+        print(f"\n✅ No regressions over {args.max_regression:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
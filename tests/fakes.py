@@ -0,0 +1,404 @@
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.github_utils import git_blob_sha
+
+
+class Latency:
+    """Log-normal latency given its median and 99th percentile, in seconds"""
+
+    def __init__(self, median: float = 0.0, p99: Optional[float] = None):
+        self.median = max(0.0, median)
+        self.p99 = p99 if p99 is not None else median
+        # z(0.99) = 2.326
+        self.sigma = math.log(self.p99 / self.median) / 2.326 \
+            if self.median > 0 and self.p99 > self.median else 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        """"median" or "median:p99" """
+        median, _, p99 = spec.partition(":")
+        return cls(float(median), float(p99) if p99 else None)
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        if self.sigma == 0:
+            return self.median
+        return random.lognormvariate(math.log(self.median), self.sigma)
+
+    async def wait(self):
+        delay = self.sample()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class FakeUpstream:
+    """Latency and error injection shared by the fake services"""
+
+    def __init__(self, latency: Latency = None, error_rate: float = 0.0, error_status: int = 500):
+        self.latency = latency or Latency()
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+
+    def should_fail(self) -> bool:
+        if self.error_rate > 0 and random.random() < self.error_rate:
+            self.errors += 1
+            return True
+        return False
+
+    def error_response(self) -> httpx.Response:
+        return httpx.Response(self.error_status, json={"message": "injected failure"})
+
+
+class FakeAIPipe(FakeUpstream):
+    """
+    OpenAI-compatible /chat/completions. Latency is the time to the first
+    token; the completion then streams at chars_per_second.
+    """
+
+    def __init__(self, latency: Latency = None, error_rate: float = 0.0,
+                 chars_per_second: float = 4000.0, html_bytes: int = 3000):
+        super().__init__(latency, error_rate, error_status=500)
+        self.chars_per_second = chars_per_second
+        self.html_bytes = html_bytes
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        body = json.loads(request.content)
+        await self.latency.wait()
+        if self.should_fail():
+            return self.error_response()
+
+        if "<<<<<<< SEARCH" in body["messages"][0]["content"]:
+            content = self._patch(body["messages"])
+        else:
+            content = json.dumps(self._files(body["messages"]))
+        usage = {
+            "prompt_tokens": sum(len(m["content"]) for m in body["messages"]) // 4,
+            "completion_tokens": len(content) // 4,
+        }
+        if not body.get("stream"):
+            await asyncio.sleep(len(content) / self.chars_per_second)
+            return httpx.Response(200, json={
+                "model": body["model"],
+                "choices": [{"message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+        return httpx.Response(200, headers={"Content-Type": "text/event-stream"},
+                              content=self._stream(body["model"], content, usage))
+
+    async def _stream(self, model: str, content: str, usage: Dict):
+        chunk = 256
+        for start in range(0, len(content), chunk):
+            delta = content[start:start + chunk]
+            event = {"model": model, "choices": [{"delta": {"content": delta}, "finish_reason": None}]}
+            yield f"data: {json.dumps(event)}\n\n".encode()
+            await asyncio.sleep(len(delta) / self.chars_per_second)
+        final = {"model": model, "choices": [{"delta": {}, "finish_reason": "stop"}], "usage": usage}
+        yield f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode()
+
+    def _files(self, messages) -> Dict[str, str]:
+        prompt = messages[-1]["content"]
+        brief = re.search(r"BRIEF: (.*)", prompt)
+        brief = brief.group(1) if brief else "Generated app"
+        filler = "<p>" + "lorem ipsum " * max(1, self.html_bytes // 12) + "</p>"
+        return {
+            "index.html": f"<!DOCTYPE html>\n<html><head><title>{brief}</title></head>"
+                          f"<body><h1>{brief}</h1>{filler}</body></html>",
+            "README.md": f"# {brief}\n\nGenerated application.",
+            "LICENSE": "MIT License",
+        }
+
+    def _patch(self, messages) -> str:
+        """Search/replace edits for a round 2+ prompt: a section for the new brief"""
+        brief = re.search(r"NEW BRIEF: (.*)", messages[-1]["content"])
+        brief = brief.group(1) if brief else "Update"
+        return (f"index.html\n<<<<<<< SEARCH\n</body></html>\n=======\n"
+                f"<section>{brief}</section></body></html>\n>>>>>>> REPLACE\n\n"
+                f"README.md\n<<<<<<< SEARCH\nGenerated application.\n=======\n"
+                f"Generated application.\n\n## Update\n\n{brief}\n>>>>>>> REPLACE\n")
+
+
+class FakeGitHub(FakeUpstream):
+    """
+    In-memory GitHub with just enough of the REST API for GitHubManager:
+    repos (including renames), Contents, Git Data (blobs, trees, commits,
+    refs) and Pages. Every push to a Pages repo starts a build that
+    finishes after `pages_build_seconds`; serve_pages() answers for
+    {user}.github.io with the index.html of the latest finished build.
+    """
+
+    def __init__(self, user: str, latency: Latency = None, error_rate: float = 0.0,
+                 rate_limit: int = 5000, pages_build_seconds: float = 0.0):
+        super().__init__(latency, error_rate, error_status=502)
+        self.user = user
+        self.pages_build_seconds = pages_build_seconds
+        self.repos: Dict[str, Dict] = {}
+        self.objects: Dict[str, Dict] = {}
+        # Primary rate limit per hour window, reported in X-RateLimit-* headers
+        self.rate_limit = rate_limit
+        self.rate_used = 0
+        self.rate_reset = time.time() + 3600
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if time.time() >= self.rate_reset:
+            self.rate_used, self.rate_reset = 0, time.time() + 3600
+        if self.rate_used >= self.rate_limit:
+            response = httpx.Response(403, json={"message": "API rate limit exceeded"})
+        else:
+            self.rate_used += 1
+            response = await self._route(request)
+        response.headers.update({
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(max(0, self.rate_limit - self.rate_used)),
+            "X-RateLimit-Reset": str(int(self.rate_reset)),
+            "X-RateLimit-Resource": "core",
+        })
+        return response
+
+    async def _route(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await self.latency.wait()
+        if self.should_fail():
+            return self.error_response()
+        method = request.method
+        path = request.url.path
+        body = json.loads(request.content) if request.content else {}
+
+        if path == "/user":
+            return httpx.Response(200, json={"login": self.user})
+        if path == "/user/repos" and method == "POST":
+            return self._create_repo(body["name"], body.get("description") or "")
+
+        match = re.match(rf"^/repos/{re.escape(self.user)}/([^/]+)(/.*)?$", path)
+        if match is None:
+            return httpx.Response(404, json={"message": "Not Found"})
+        repo = self.repos.get(match.group(1))
+        if repo is None:
+            return httpx.Response(404, json={"message": "Not Found"})
+        rest = match.group(2) or ""
+
+        if rest == "" and method == "PATCH":
+            return self._rename_repo(repo, body["name"], body.get("description"))
+        if rest == "":
+            return self._cacheable(request, repo["meta"])
+        if rest == "/pages":
+            if method == "POST":
+                repo["pages"] = {"html_url": f"https://{self.user}.github.io/{repo['meta']['name']}/",
+                                 "status": "built"}
+                self._build_pages(repo)
+                return httpx.Response(201, json=repo["pages"])
+            if repo["pages"] is None:
+                return httpx.Response(404, json={"message": "Not Found"})
+            return self._cacheable(request, repo["pages"])
+        if rest == "/pages/builds" and method == "GET":
+            if repo["pages"] is None:
+                return httpx.Response(404, json={"message": "Not Found"})
+            return httpx.Response(200, json=[self._build_view(build) for build in reversed(repo["builds"])])
+        if rest.startswith("/contents/"):
+            return self._contents(repo, method, rest[len("/contents/"):], body)
+        if rest == "/git/ref/heads/main":
+            if repo["main"] is None:
+                return httpx.Response(409, json={"message": "Git Repository is empty."})
+            return httpx.Response(200, json={"object": {"sha": repo["main"]}})
+        if rest.startswith("/git/commits/"):
+            commit = self.objects.get(rest[len("/git/commits/"):])
+            if commit is None:
+                return httpx.Response(404, json={"message": "Not Found"})
+            return httpx.Response(200, json={"sha": commit["sha"], "tree": {"sha": commit["tree"]}})
+        if rest.startswith("/git/trees/") and method == "GET":
+            tree = self.objects.get(rest[len("/git/trees/"):])
+            if tree is None:
+                return httpx.Response(404, json={"message": "Not Found"})
+            return httpx.Response(200, json={"sha": tree["sha"], "tree": [
+                {"path": p, "mode": "100644", "type": "blob", "sha": s} for p, s in tree["entries"].items()
+            ]})
+        if rest.startswith("/git/blobs/") and method == "GET":
+            blob = self.objects.get(rest[len("/git/blobs/"):])
+            if blob is None or "content" not in blob:
+                return httpx.Response(404, json={"message": "Not Found"})
+            return httpx.Response(200, json={"sha": blob["sha"], "encoding": "base64",
+                                             "content": base64.b64encode(blob["content"].encode()).decode()})
+        if rest == "/git/blobs" and method == "POST":
+            sha = git_blob_sha(body["content"])
+            self.objects[sha] = {"sha": sha, "content": body["content"]}
+            return httpx.Response(201, json={"sha": sha})
+        if rest == "/git/trees" and method == "POST":
+            entries = dict(self.objects[body["base_tree"]]["entries"]) if body.get("base_tree") else {}
+            for element in body["tree"]:
+                if element["sha"] is None:
+                    entries.pop(element["path"], None)
+                else:
+                    entries[element["path"]] = element["sha"]
+            return httpx.Response(201, json={"sha": self._tree(entries)})
+        if rest == "/git/commits" and method == "POST":
+            return httpx.Response(201, json={"sha": self._commit(body["tree"], body["parents"])})
+        if rest == "/git/refs/heads/main" and method == "PATCH":
+            parents = self.objects.get(body["sha"], {}).get("parents", [])
+            if repo["main"] is not None and repo["main"] not in parents:
+                return httpx.Response(422, json={"message": "Update is not a fast forward"})
+            repo["main"] = body["sha"]
+            self._build_pages(repo)
+            return httpx.Response(200, json={"object": {"sha": body["sha"]}})
+        if rest == "/git/refs" and method == "POST":
+            if repo["main"] is not None:
+                return httpx.Response(422, json={"message": "Reference already exists"})
+            repo["main"] = body["sha"]
+            self._build_pages(repo)
+            return httpx.Response(201, json={"object": {"sha": body["sha"]}})
+        return httpx.Response(404, json={"message": f"Fake GitHub does not handle {method} {rest}"})
+
+    def _create_repo(self, name: str, description: str) -> httpx.Response:
+        if name in self.repos:
+            return httpx.Response(422, json={"message": "name already exists on this account"})
+        meta = {"name": name, "description": description, "html_url": f"https://github.com/{self.user}/{name}",
+                "clone_url": f"https://github.com/{self.user}/{name}.git"}
+        self.repos[name] = {"meta": meta, "main": None, "pages": None, "builds": []}
+        return httpx.Response(201, json=meta)
+
+    def _rename_repo(self, repo: Dict, name: str, description: Optional[str]) -> httpx.Response:
+        if name in self.repos:
+            return httpx.Response(422, json={"message": "name already exists on this account"})
+        del self.repos[repo["meta"]["name"]]
+        if description is not None:
+            repo["meta"]["description"] = description
+        repo["meta"].update(name=name, html_url=f"https://github.com/{self.user}/{name}",
+                            clone_url=f"https://github.com/{self.user}/{name}.git")
+        if repo["pages"] is not None:
+            repo["pages"]["html_url"] = f"https://{self.user}.github.io/{name}/"
+        self.repos[name] = repo
+        return httpx.Response(200, json=repo["meta"])
+
+    def _contents(self, repo: Dict, method: str, file_path: str, body: Dict) -> httpx.Response:
+        entries = self._head_entries(repo)
+        if method == "GET":
+            if file_path not in entries:
+                return httpx.Response(404, json={"message": "Not Found"})
+            return httpx.Response(200, json={"path": file_path, "sha": entries[file_path]})
+        if method == "DELETE":
+            entries.pop(file_path, None)
+        else:
+            content = base64.b64decode(body["content"]).decode("utf-8")
+            sha = git_blob_sha(content)
+            self.objects[sha] = {"sha": sha, "content": content}
+            entries[file_path] = sha
+        parents = [repo["main"]] if repo["main"] else []
+        repo["main"] = self._commit(self._tree(entries), parents)
+        self._build_pages(repo)
+        return httpx.Response(200 if method != "PUT" else 201, json={
+            "content": {"path": file_path, "sha": entries.get(file_path)},
+            "commit": {"sha": repo["main"]},
+        })
+
+    def _build_pages(self, repo: Dict):
+        if repo["pages"] is not None and repo["main"] is not None:
+            repo["builds"].append({"commit": repo["main"], "started": time.monotonic()})
+
+    def _build_view(self, build: Dict) -> Dict:
+        elapsed = time.monotonic() - build["started"]
+        built = elapsed >= self.pages_build_seconds
+        return {"status": "built" if built else "building", "commit": build["commit"],
+                "duration": int(self.pages_build_seconds * 1000) if built else None}
+
+    async def serve_pages(self, request: httpx.Request) -> httpx.Response:
+        """The site as Pages serves it: index.html of each repo's latest finished build"""
+        await self.latency.wait()
+        name = request.url.path.strip("/").split("/")[0]
+        repo = self.repos.get(name)
+        now = time.monotonic()
+        built = [b for b in (repo["builds"] if repo else [])
+                 if now - b["started"] >= self.pages_build_seconds]
+        if not built:
+            return httpx.Response(404, text="Site not found")
+        tree = self.objects[self.objects[built[-1]["commit"]]["tree"]]["entries"]
+        blob = self.objects.get(tree.get("index.html", ""), {})
+        if "content" not in blob:
+            return httpx.Response(404, text="File not found")
+        return httpx.Response(200, text=blob["content"], headers={"Content-Type": "text/html; charset=utf-8"})
+
+    def _head_entries(self, repo: Dict) -> Dict[str, str]:
+        if repo["main"] is None:
+            return {}
+        return dict(self.objects[self.objects[repo["main"]]["tree"]]["entries"])
+
+    def _tree(self, entries: Dict[str, str]) -> str:
+        sha = hashlib.sha1(json.dumps(sorted(entries.items())).encode()).hexdigest()
+        self.objects[sha] = {"sha": sha, "entries": entries}
+        return sha
+
+    def _commit(self, tree: str, parents) -> str:
+        sha = hashlib.sha1(json.dumps([tree, parents, len(self.objects)]).encode()).hexdigest()
+        self.objects[sha] = {"sha": sha, "tree": tree, "parents": list(parents)}
+        return sha
+
+    @staticmethod
+    def _cacheable(request: httpx.Request, data: Dict) -> httpx.Response:
+        etag = '"' + hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(200, json=data, headers={"ETag": etag})
+
+
+class FakeEvaluator(FakeUpstream):
+    """Accepts every notification with 200; remembers what it received"""
+
+    def __init__(self, latency: Latency = None, error_rate: float = 0.0):
+        super().__init__(latency, error_rate, error_status=503)
+        self.received = []
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await self.latency.wait()
+        if self.should_fail():
+            return self.error_response()
+        self.received.append(json.loads(request.content))
+        return httpx.Response(200, json={"status": "ok"})
+
+
+class FakeUpstreams(httpx.AsyncBaseTransport):
+    """
+    In-process stand-ins for every upstream the pipeline talks to, plugged
+    into the shared HTTP client as a transport so the real code paths run
+    without the network. Requests are routed by host: the AIPipe base URL,
+    the GitHub API and Pages sites, and everything else to the evaluator. Install with
+    http_client.use_transport(FakeUpstreams(...)).
+    """
+
+    def __init__(self, aipipe_url: str, github_url: str, aipipe: FakeAIPipe,
+                 github: FakeGitHub, evaluator: FakeEvaluator):
+        self.aipipe_host = urlsplit(aipipe_url).netloc
+        self.github_host = urlsplit(github_url).netloc
+        self.aipipe = aipipe
+        self.github = github
+        self.evaluator = evaluator
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.netloc.decode()
+        if host == self.aipipe_host:
+            return await self.aipipe.handle(request)
+        if host == self.github_host:
+            return await self.github.handle(request)
+        if host.endswith(".github.io"):
+            return await self.github.serve_pages(request)
+        return await self.evaluator.handle(request)
+
+    def stats(self) -> Dict:
+        return {
+            name: {"requests": upstream.requests, "injected_errors": upstream.errors}
+            for name, upstream in (("aipipe", self.aipipe), ("github", self.github),
+                                   ("evaluator", self.evaluator))
+        }
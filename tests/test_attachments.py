@@ -0,0 +1,102 @@
+import asyncio
+import base64
+import hashlib
+import os
+
+import pytest
+
+from app import attachments
+from app.attachments import AttachmentError, AttachmentStore
+
+
+def data_uri(data: bytes, wrap: int = 0) -> str:
+    encoded = base64.b64encode(data).decode("ascii")
+    if wrap:
+        encoded = "\r\n".join(encoded[i:i + wrap] for i in range(0, len(encoded), wrap))
+    return "data:application/octet-stream;base64," + encoded
+
+
+def test_line_wrapped_base64_across_slices(tmp_path, monkeypatch):
+    # Slices that split both 4-character groups and CRLF pairs
+    monkeypatch.setattr(attachments, "_DECODE_CHUNK", 7)
+    data = os.urandom(1000)
+    store = AttachmentStore(str(tmp_path))
+    [handle] = asyncio.run(store.ingest([{"name": "blob.bin", "url": data_uri(data, wrap=76)}]))
+    with open(handle.path, "rb") as f:
+        assert f.read() == data
+    assert handle.sha256 == hashlib.sha256(data).hexdigest()
+
+
+def test_truncated_base64_is_rejected(tmp_path):
+    store = AttachmentStore(str(tmp_path))
+    with pytest.raises(Exception):
+        store._from_data_uri("x.bin", data_uri(b"hello world")[:-3])
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    store = AttachmentStore(str(tmp_path))
+    uri = "data:text/plain,hello"
+    first, second = asyncio.run(store.ingest([{"name": "a.txt", "url": uri}, {"name": "b.txt", "url": uri}]))
+    assert first.path == second.path and first.read_text() == "hello"
+    assert store.counters["ingested"] == 1 and store.counters["deduplicated"] == 1
+
+
+def test_pinned_files_are_not_evicted(tmp_path):
+    store = AttachmentStore(str(tmp_path), max_total_bytes=10)
+    [pinned] = asyncio.run(store.ingest([{"name": "a.txt", "url": "data:text/plain,aaaaaaaa"}]))
+    [other] = asyncio.run(store.ingest([{"name": "b.txt", "url": "data:text/plain,bbbbbbbb"}]))
+    assert os.path.exists(pinned.path) and os.path.exists(other.path)
+    store.release([pinned])
+    asyncio.run(store.ingest([{"name": "c.txt", "url": "data:text/plain,cccccccc"}]))
+    assert not os.path.exists(pinned.path)
+    assert os.path.exists(other.path)
+    assert store.stats()["pinned"] == 2
+
+
+@pytest.mark.parametrize("url", ["http://127.0.0.1/x", "http://10.0.0.1/x", "http://[::1]/x",
+                                 "http://169.254.169.254/latest/meta-data"])
+def test_private_fetch_targets_are_refused(tmp_path, url):
+    store = AttachmentStore(str(tmp_path))
+    with pytest.raises(AttachmentError, match="non-public"):
+        asyncio.run(store._check_host(url))
+
+
+def test_allowed_hosts_skip_the_address_check(tmp_path):
+    store = AttachmentStore(str(tmp_path), allowed_hosts=["127.0.0.1"])
+    asyncio.run(store._check_host("http://127.0.0.1/x"))
+
+
+def test_reopen_pins_spooled_files_until_one_is_gone(tmp_path):
+    store = AttachmentStore(str(tmp_path))
+    handles = asyncio.run(store.ingest([{"name": "a.txt", "url": "data:text/plain,aaa"},
+                                        {"name": "b.txt", "url": "data:text/plain,bbb"}]))
+    store.release(handles)
+    entries = [handle.to_dict() for handle in handles]
+    reopened = store.reopen(entries)
+    assert [h.read_text() for h in reopened] == ["aaa", "bbb"]
+    assert store.stats()["pinned"] == 2
+    store.release(reopened)
+    os.remove(handles[1].path)
+    assert store.reopen(entries) is None
+    assert store.stats()["pinned"] == 0
+
+
+def test_remote_fetch_connects_to_the_checked_address(tmp_path):
+    import ipaddress
+
+    store = AttachmentStore(str(tmp_path))
+    request = store._request("https://files.example.com:8443/a.csv?v=1", ipaddress.ip_address("93.184.216.34"))
+    assert str(request.url) == "https://93.184.216.34:8443/a.csv?v=1"
+    assert request.headers["Host"] == "files.example.com:8443"
+    assert request.extensions["sni_hostname"] == "files.example.com"
+    v6 = store._request("http://files.example.com/a", ipaddress.ip_address("2606:2800:220:1::1"))
+    assert v6.url.host == "2606:2800:220:1::1" and v6.headers["Host"] == "files.example.com"
+
+
+def test_stale_partial_downloads_are_removed(tmp_path):
+    stale, fresh = tmp_path / "old.part", tmp_path / "new.part"
+    stale.write_bytes(b"x")
+    fresh.write_bytes(b"y")
+    os.utime(stale, (0, 0))
+    AttachmentStore(str(tmp_path))
+    assert not stale.exists() and fresh.exists()
@@ -0,0 +1,27 @@
+import asyncio
+import os
+
+from app.cache import GenerationCache
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    cache = GenerationCache(str(tmp_path))
+    asyncio.run(cache.set("ab" * 32, {"index.html": "x"}))
+    reopened = GenerationCache(str(tmp_path))
+    assert asyncio.run(reopened.get("ab" * 32)) == {"index.html": "x"}
+    assert asyncio.run(reopened.get("cd" * 32)) is None
+    assert reopened.stats()["disk_hits"] == 1 and reopened.stats()["misses"] == 1
+
+
+def test_disk_eviction_drops_least_recently_used(tmp_path):
+    cache = GenerationCache(str(tmp_path), memory_entries=1, disk_max_bytes=200)
+    keys = ["a" * 64, "b" * 64, "c" * 64]
+    asyncio.run(cache.set(keys[0], {"f": "1" * 40}))
+    asyncio.run(cache.set(keys[1], {"f": "2" * 40}))
+    # Reading the first from disk makes the second the oldest
+    cache._memory.clear()
+    assert asyncio.run(cache.get(keys[0])) is not None
+    asyncio.run(cache.set(keys[2], {"f": "3" * 40}))
+    on_disk = {name[:-5] for _, _, names in os.walk(tmp_path) for name in names}
+    assert on_disk == {keys[0], keys[2]}
+    assert cache.stats()["disk_bytes"] == sum(os.path.getsize(cache._path(k)) for k in on_disk)
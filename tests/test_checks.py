@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from app.checks import CheckRunner, DocumentIndex, evaluate, evaluate_check, js_syntax_error
+
+HTML = """<!DOCTYPE html><html><head><title>Counter</title></head><body>
+<main id="app" class="container wide">
+  <h1 class="title">Click counter</h1>
+  <form><input type="text" name="q" data-role="search-box"><button id="go" type="submit">Go</button></form>
+  <ul><li><a href="https://example.com/docs">Docs</a></li></ul>
+</main>
+<script>document.querySelector('#go').addEventListener('click', () => {});</script>
+</body></html>"""
+
+FILES = {"index.html": HTML, "README.md": "# Counter\n" + "Usage and setup. " * 20,
+         "LICENSE": "MIT License\nPermission is hereby granted"}
+
+
+@pytest.fixture(scope="module")
+def document():
+    return DocumentIndex(HTML)
+
+
+def tags(document, selector):
+    found = document.select(selector)
+    return None if found is None else [document.elements[i]["tag"] for i in found]
+
+
+@pytest.mark.parametrize("selector, expected", [
+    ("h1", ["h1"]),
+    ("#go", ["button"]),
+    ("main.container.wide", ["main"]),
+    (".missing", []),
+    ("main h1.title", ["h1"]),
+    ("main > h1", ["h1"]),
+    ("main > li", []),
+    ("body li > a", ["a"]),
+    ("input[type=text]", ["input"]),
+    ("[data-role^=search]", ["input"]),
+    ("a[href$='/docs']", ["a"]),
+    ("a[href*=example]", ["a"]),
+    ("main[class~=wide]", ["main"]),
+    ("h1, button", ["h1", "button"]),
+    ("button:hover", ["button"]),
+])
+def test_selector_engine(document, selector, expected):
+    assert tags(document, selector) == expected
+
+
+def test_document_text_and_title(document):
+    assert document.title == "Counter"
+    assert "Click counter" in document.text
+    assert "addEventListener" not in document.text
+    assert len(document.scripts) == 1
+
+
+def test_js_syntax_error():
+    assert js_syntax_error("const a = [1, 2]; function f() { return `x${a}`; }") is None
+    assert js_syntax_error("function f() { return (1; }") is not None
+
+
+@pytest.mark.parametrize("check, status", [
+    ("Page has a `<h1>` heading", "passed"),
+    ("There is a button with id `#go`", "passed"),
+    ("Page shows #result", "failed"),
+    ('Page says "Click counter"', "passed"),
+    ("js: document.querySelector('main > h1') !== null", "passed"),
+    ("js: document.body.textContent.includes('Goodbye')", "failed"),
+    ("regex: /<title>\\w+<\\/title>/", "passed"),
+    ("regex: /" + "a" * 300 + "/", "skipped"),
+    ("Repo has MIT license", "passed"),
+    ("README.md is professional", "passed"),
+    ("The repository contains script.js", "failed"),
+    ("Loads within 2 seconds", "skipped"),
+])
+def test_evaluate_check(document, check, status):
+    assert evaluate_check(check, FILES, document)["status"] == status
+
+
+def test_evaluate_reports_missing_files_and_broken_scripts():
+    report = evaluate({"index.html": "<html><script>if (</script></html>"}, ["Page has `#app`"])
+    failed = {r["check"] for r in report["results"] if r["status"] == "failed"}
+    assert {"README.md exists", "LICENSE exists", "inline script 1 is well-formed", "Page has `#app`"} <= failed
+    assert report["passed"] == 0
+
+
+def test_timed_out_run_terminates_its_workers():
+    async def scenario():
+        runner = CheckRunner(workers=1, timeout=1.0)
+        try:
+            await runner.warm_up()
+            stuck = list(runner._pool._processes.values())
+            runaway = {"index.html": "a" * 40 + "!"}
+            with pytest.raises(asyncio.TimeoutError):
+                await runner.run(runaway, ["regex: /^(a+)+$/"])
+            await asyncio.to_thread(stuck[0].join, 5)
+            assert not stuck[0].is_alive()
+            report = await runner.run(FILES, ["Page has a `<h1>` heading"])
+            assert report["failed"] == 0
+        finally:
+            runner.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from app.jobs import KeyedLocks, StageGraph
+
+
+def test_keyed_locks_admit_waiters_by_round_then_arrival():
+    async def scenario():
+        locks = KeyedLocks()
+        order = []
+        release = asyncio.Event()
+
+        async def holder():
+            async with locks.acquire("repo", order=1):
+                order.append("first")
+                await release.wait()
+
+        async def waiter(name, round):
+            async with locks.acquire("repo", order=round):
+                order.append(name)
+
+        first = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(waiter(name, round))
+                   for name, round in (("r3", 3), ("r2a", 2), ("r1", 1), ("r2b", 2))]
+        await asyncio.sleep(0)
+        assert locks.depth("repo") == 5
+        release.set()
+        await asyncio.gather(first, *waiters)
+        assert order == ["first", "r1", "r2a", "r2b", "r3"]
+        assert locks.depth("repo") == 0 and locks.stats()["keys"] == {}
+
+    asyncio.run(scenario())
+
+
+def test_keyed_locks_other_keys_and_cancelled_waiters():
+    async def scenario():
+        locks = KeyedLocks()
+        release = asyncio.Event()
+
+        async def hold(key):
+            async with locks.acquire(key):
+                await release.wait()
+
+        a = asyncio.create_task(hold("a"))
+        await asyncio.sleep(0)
+        # A different key is not blocked
+        async with locks.acquire("b"):
+            pass
+        waiter = asyncio.create_task(hold("a"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert locks.depth("a") == 1
+        release.set()
+        await a
+        assert locks.depth("a") == 0
+
+    asyncio.run(scenario())
+
+
+def test_stage_graph_overlaps_independent_stages():
+    async def scenario():
+        graph = StageGraph()
+        started = []
+
+        async def stage(name, value):
+            started.append(name)
+            await asyncio.sleep(0.1)
+            return value
+
+        graph.add("generate", lambda r: stage("generate", 1))
+        graph.add("repo", lambda r: stage("repo", 2))
+        graph.add("push", lambda r: stage("push", r["generate"] + r["repo"]), after=["generate", "repo"])
+        results = await graph.run()
+        assert results == {"generate": 1, "repo": 2, "push": 3}
+        assert started[-1] == "push"
+        assert graph.elapsed < 0.25
+
+    asyncio.run(scenario())
+
+
+def test_stage_graph_finishes_independent_stages_before_raising():
+    async def scenario():
+        graph = StageGraph()
+        finished = []
+
+        async def fail(results):
+            raise RuntimeError("repo failed")
+
+        async def slow(results):
+            await asyncio.sleep(0.02)
+            finished.append("generate")
+            return "files"
+
+        async def push(results):
+            finished.append("push")
+
+        graph.add("repo", fail)
+        graph.add("generate", slow)
+        graph.add("push", push, after=["repo", "generate"])
+        with pytest.raises(RuntimeError, match="repo failed"):
+            await graph.run()
+        assert finished == ["generate"]
+
+    asyncio.run(scenario())
+
+
+def test_stage_graph_rejects_unknown_dependencies():
+    with pytest.raises(ValueError):
+        StageGraph().add("push", lambda r: None, after=["repo"])
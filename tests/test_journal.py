@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+from app.journal import DeployJournal, deploy_id
+
+
+def test_deploy_id_is_stable_per_round_and_nonce():
+    assert deploy_id("task", 1, "n") == deploy_id("task", 1, "n")
+    assert deploy_id("task", 1, "n") != deploy_id("task", 2, "n")
+
+
+def lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_replay_resumes_after_the_last_completed_stage(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+
+    async def first_process():
+        journal = DeployJournal(path, fsync=False)
+        assert await journal.begin("d1", {"task": "t", "round": 1}) == 1
+        await asyncio.gather(journal.record("d1", "generate", {"files": {"index.html": "x"}}),
+                             journal.record("d1", "repo", {"repo_url": "https://github.com/o/t"}))
+        await journal.fail("d1", "push failed")
+        await journal.begin("d2", {"task": "u", "round": 1})
+        await journal.complete("d2", {"status": "success"})
+        journal.close()
+
+    asyncio.run(first_process())
+    replayed = DeployJournal(path, fsync=False)
+    assert replayed.completed_stages("d1") == {"generate": {"files": {"index.html": "x"}},
+                                               "repo": {"repo_url": "https://github.com/o/t"}}
+    assert replayed.get("d1")["error"] == "push failed"
+    assert [d["id"] for d in replayed.incomplete()] == ["d1"]
+    assert replayed.get("d2")["result"] == {"status": "success"}
+    # A retry doesn't record the request again, but counts the attempt
+    assert asyncio.run(replayed.begin("d1", {"task": "t", "round": 1})) == 2
+    replayed.close()
+    assert sum(entry["event"] == "accepted" for entry in lines(path)) == 2
+    assert DeployJournal(path, fsync=False).get("d1")["attempts"] == 2
+
+
+def test_replay_skips_a_torn_last_line(tmp_path):
+    path = tmp_path / "journal.jsonl"
+
+    async def write():
+        journal = DeployJournal(str(path), fsync=False)
+        await journal.begin("d1", {"task": "t", "round": 1})
+        await journal.record("d1", "generate", {"files": {}})
+        journal.close()
+
+    asyncio.run(write())
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"id": "d1", "event": "repo", "da')
+    replayed = DeployJournal(str(path), fsync=False)
+    assert list(replayed.completed_stages("d1")) == ["generate"]
+    replayed.close()
+
+
+def test_startup_compaction_drops_expired_deploys(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = DeployJournal(path, fsync=False)
+    asyncio.run(journal.begin("old", {"task": "t", "round": 1}))
+    journal.close()
+    entries = lines(path)
+    for entry in entries:
+        entry["at"] -= 7200
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(entry) + "\n" for entry in entries)
+    replayed = DeployJournal(path, ttl=3600, fsync=False)
+    assert replayed.get("old") is None
+    replayed.close()
+    assert lines(path) == []
+
+
+def test_runtime_compaction_keeps_one_line_per_stage(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+
+    async def scenario():
+        journal = DeployJournal(path, fsync=False, compact_after=10)
+        await journal.begin("d1", {"task": "t", "round": 1})
+        for attempt in range(10):
+            await journal.record("d1", "generate", {"files": {"index.html": str(attempt)}})
+        await journal.record("d1", "repo", {"repo_url": "u"})
+        journal.close()
+
+    asyncio.run(scenario())
+    # Rewritten on the 10th append, then three more appended
+    assert [entry["event"] for entry in lines(path)] == ["accepted", "attempt", "generate",
+                                                         "generate", "generate", "repo"]
+    assert DeployJournal(path, fsync=False).completed_stages("d1")["generate"] == {"files": {"index.html": "9"}}
@@ -0,0 +1,90 @@
+import asyncio
+
+from app.llm_router import CircuitBreaker, LLMEndpoint, LLMRouter
+
+
+def make_router(**kwargs):
+    endpoints = [LLMEndpoint("a/model", "http://a"), LLMEndpoint("b/model", "http://b")]
+    options = dict(hedge_initial_delay=0.05, hedge_min_delay=0.05, failure_threshold=1, cooldown=0.05)
+    options.update(kwargs)
+    return LLMRouter(endpoints, **options)
+
+
+def test_breaker_opens_after_threshold_and_half_opens_after_cooldown():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    asyncio.run(asyncio.sleep(0.06))
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_abandoned_trial_lets_the_next_request_try_again():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+    breaker.record_failure()
+    asyncio.run(asyncio.sleep(0.06))
+    assert breaker.allow()
+    breaker.abandon_trial()
+    assert breaker.state == "open"
+    assert breaker.allow() and breaker.state == "half_open"
+
+
+def test_trial_that_loses_a_hedge_does_not_wedge_the_breaker():
+    router = make_router()
+    a, b = router.endpoints
+
+    async def attempt(endpoint, claim):
+        if endpoint is a:
+            # Slow enough to be hedged, and cancelled when b wins
+            await asyncio.sleep(1)
+        return "ok" if claim() else None
+
+    async def scenario():
+        a.breaker.record_failure()
+        await asyncio.sleep(0.06)
+        # a's half-open trial is launched first, b wins the hedge
+        assert await router.run(attempt) == "ok"
+        assert router.counters["hedge_wins"] == 1
+        assert a.breaker.state == "open"
+        await asyncio.sleep(0.06)
+        assert a.breaker.allow()
+
+    asyncio.run(scenario())
+
+
+def test_trial_cancelled_with_the_caller_is_abandoned():
+    router = make_router(hedge=False)
+    a, _ = router.endpoints
+
+    async def attempt(endpoint, claim):
+        await asyncio.sleep(1)
+        return None
+
+    async def scenario():
+        a.breaker.record_failure()
+        await asyncio.sleep(0.06)
+        task = asyncio.create_task(router.run(attempt))
+        await asyncio.sleep(0.01)
+        assert a.breaker.state == "half_open"
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert a.breaker.state == "open" and a.breaker.allow()
+
+    asyncio.run(scenario())
+
+
+def test_failed_attempt_falls_back_to_the_next_endpoint():
+    router = make_router(hedge=False, failure_threshold=5)
+
+    async def attempt(endpoint, claim):
+        if endpoint.model == "a/model":
+            return None
+        return "from b" if claim() else None
+
+    assert asyncio.run(router.run(attempt)) == "from b"
+    assert router.counters["fallbacks"] == 1
+    assert router.endpoints[0].breaker.failures == 1
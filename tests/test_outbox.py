@@ -0,0 +1,30 @@
+import asyncio
+
+from app.outbox import NotificationOutbox
+
+
+def test_held_notification_goes_out_on_release_and_failures_retry(tmp_path):
+    async def scenario():
+        calls = []
+
+        async def deliver(url, payload):
+            calls.append(payload["n"])
+            return len(calls) > 1  # The first delivery fails
+
+        outbox = NotificationOutbox(str(tmp_path / "outbox.db"), deliver, base_delay=0.01,
+                                    max_delay=0.02, poll_interval=0.01)
+        await outbox.start()
+        held = await outbox.enqueue("http://eval/x", {"n": 1}, hold=60)
+        await asyncio.sleep(0.05)
+        assert calls == [] and outbox.pending_count() == 1
+        await outbox.release(held)
+        for _ in range(200):
+            if outbox.pending_count() == 0:
+                break
+            await asyncio.sleep(0.01)
+        await outbox.stop()
+        assert calls == [1, 1]
+        stats = outbox.stats()
+        assert stats["delivered"] == 1 and stats["retries"] == 1 and stats["depth"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+from app.pages_tracker import PagesTracker
+
+
+class Builds:
+    """get_pages_build answers 'built' after `ready` seconds"""
+
+    def __init__(self, ready: float):
+        self.ready = ready
+        self.started = time.monotonic()
+        self.polls = []
+
+    async def get_pages_build(self, repo_name, commit_sha):
+        self.polls.append(time.monotonic() - self.started)
+        return {"status": "built" if self.polls[-1] >= self.ready else "building"}
+
+
+def track(tracker: PagesTracker, builds: Builds):
+    async def scenario():
+        done = asyncio.get_running_loop().create_future()
+        tracker.track(builds, "o/r", "abc1234", "https://o.github.io/r/", None, done.set_result)
+        return await done
+
+    return asyncio.run(scenario())
+
+
+def test_first_poll_waits_min_delay_until_a_deploy_went_live(monkeypatch):
+    async def serves(url, expected):
+        return True
+
+    monkeypatch.setattr(PagesTracker, "_serves", staticmethod(serves))
+    tracker = PagesTracker(min_delay=0.05, max_delay=1.0)
+    assert tracker.stats()["typical_seconds"] is None
+    builds = Builds(ready=0.0)
+    outcome = track(tracker, builds)
+    assert outcome["outcome"] == "live"
+    assert builds.polls[0] < 0.5
+    # Later deploys start from the observed time-to-live
+    assert tracker.typical == outcome["seconds"]
+    assert tracker.stats()["watching"] == 0
@@ -0,0 +1,60 @@
+import pytest
+
+from app.patching import Edit, PatchError, RevisionStore, apply_edits, parse_edits, validate
+
+FILES = {"index.html": "<html>\n<body>\n  <h1>Old</h1>  \n</body>\n</html>\n", "README.md": "# App\n", "old.js": "x()"}
+
+
+def test_parse_search_replace_blocks_and_delete():
+    text = ("Here is the patch:\n**index.html**\n```html\n<<<<<<< SEARCH\n  <h1>Old</h1>\n=======\n"
+            "  <h1>New</h1>\n>>>>>>> REPLACE\n```\nDELETE old.js\n")
+    assert parse_edits(text) == [Edit("index.html", "  <h1>Old</h1>", "  <h1>New</h1>"), Edit("old.js", "", None)]
+
+
+def test_unterminated_block_raises():
+    with pytest.raises(PatchError):
+        parse_edits("index.html\n<<<<<<< SEARCH\n<h1>Old</h1>\n=======\n<h1>New")
+
+
+def test_search_without_path_raises():
+    with pytest.raises(PatchError):
+        parse_edits("<<<<<<< SEARCH\na\n=======\nb\n>>>>>>> REPLACE")
+
+
+def test_apply_tolerates_trailing_whitespace():
+    after = apply_edits(FILES, [Edit("index.html", "<body>\n  <h1>Old</h1>", "<body>\n  <h1>New</h1>")])
+    assert "<h1>New</h1>" in after["index.html"] and "Old" not in after["index.html"]
+    assert FILES["index.html"].count("Old") == 1
+
+
+def test_apply_creates_and_deletes_files():
+    after = apply_edits(FILES, [Edit("style.css", "", "h1 {}"), Edit("old.js", "", None)])
+    assert after["style.css"] == "h1 {}\n"
+    assert "old.js" not in after
+
+
+@pytest.mark.parametrize("edit", [
+    Edit("missing.js", "", None),
+    Edit("missing.js", "a", "b"),
+    Edit("README.md", "", "new"),
+    Edit("index.html", "<h2>", "<h3>"),
+    Edit("index.html", "html>", "x"),
+])
+def test_apply_rejects_edits_that_do_not_fit(edit):
+    with pytest.raises(PatchError):
+        apply_edits(FILES, [edit])
+
+
+def test_validate_flags_only_new_breakage():
+    assert validate(FILES, {**FILES, "index.html": "<html>\n<body>\n</html>"}) == ["index.html: 1 <body> vs 0 </body>"]
+    assert validate(FILES, {"README.md": "# App\n"}) == ["index.html was deleted"]
+    assert validate(FILES, {**FILES, "README.md": " "}) == ["README.md is empty"]
+    broken = {"index.html": "<html><body>"}
+    assert validate(broken, {"index.html": "<html><body><p>x</p>"}) == []
+
+
+def test_revision_store_round_trip(tmp_path):
+    store = RevisionStore(str(tmp_path))
+    assert store.load("owner/repo") is None
+    store.save("owner/repo", "abc123", {"index.html": "x"})
+    assert store.load("owner/repo") == {"commit_sha": "abc123", "files": {"index.html": "x"}}
@@ -0,0 +1,35 @@
+import json
+
+from app.attachments import AttachmentHandle
+from app.prompt_budget import PromptPacker, completion_budget
+
+
+def handle(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return AttachmentHandle(name, str(path), "0" * 64, len(text.encode()), "application/json", "data")
+
+
+ROWS = json.dumps({"rows": [{"id": i, "label": f"row number {i}", "ok": True} for i in range(2000)]})
+
+
+def test_json_within_the_read_limit_is_reduced_to_its_schema(tmp_path):
+    [section] = PromptPacker(budget=200, read_limit=len(ROWS)).pack([handle(tmp_path, "data.json", ROWS)])
+    assert "[schema of the JSON document]" in section
+    assert '"number"' in section and "2000 items" in section
+
+
+def test_json_beyond_the_read_limit_falls_back_to_its_prefix(tmp_path, monkeypatch):
+    def no_whole_read(*args, **kwargs):
+        raise AssertionError("the whole document was loaded")
+
+    monkeypatch.setattr(json, "load", no_whole_read)
+    [section] = PromptPacker(budget=200, read_limit=4096).pack([handle(tmp_path, "data.json", ROWS)])
+    assert "schema" not in section and "[... file truncated ...]" in section
+
+
+def test_completion_budget_is_sized_from_the_expected_output():
+    assert completion_budget(1000, 16000, 4000, 256) == 4000
+    assert completion_budget(1000, 16000, 4000, 256, expected_tokens=1500) == 1500
+    assert completion_budget(15000, 16000, 4000, 256) == 950
+    assert completion_budget(16000, 16000, 4000, 256) == 256
@@ -0,0 +1,78 @@
+import json
+
+from app.response_parser import join_continuation, parse_response
+
+FILES = {"index.html": "<!DOCTYPE html>\n<html><body><h1>Hi</h1></body></html>", "README.md": "# App", "LICENSE": "MIT"}
+
+
+def test_clean_json():
+    parsed = parse_response(json.dumps(FILES))
+    assert parsed.method == "json" and parsed.complete
+    assert parsed.files == FILES
+
+
+def test_json_after_braces_in_prose():
+    parsed = parse_response("Uses {curly} syntax.\n" + json.dumps(FILES))
+    assert parsed.method == "json"
+    assert parsed.files == FILES
+
+
+def test_json_after_a_non_file_map_object():
+    parsed = parse_response('Config like {"debug": true} works.\n' + json.dumps(FILES))
+    assert parsed.files == FILES
+
+
+def test_fenced_json_with_trailing_comma_and_raw_newlines():
+    text = 'Here you go:\n```json\n{"index.html": "<p>a\nb</p>", "README.md": "x",}\n```\nEnjoy!'
+    parsed = parse_response(text)
+    assert parsed.files == {"index.html": "<p>a\nb</p>", "README.md": "x"}
+
+
+def test_nested_files_object():
+    parsed = parse_response(json.dumps({"files": {"index.html": "x", "README.md": "y"}}))
+    assert parsed.files == {"index.html": "x", "README.md": "y"}
+
+
+def test_truncated_json_keeps_the_partial_file():
+    text = json.dumps(FILES)
+    parsed = parse_response(text[:text.index("# App") + 3])
+    assert not parsed.complete
+    assert parsed.truncated == "README.md"
+    assert parsed.files["index.html"] == FILES["index.html"]
+    assert parsed.files["README.md"] == "# A"
+
+
+def test_fenced_blocks_named_by_info_string_or_line_above():
+    text = ("**index.html**\n```html\n<html>\n</html>\n```\n"
+            "```css style.css\nbody { color: red }\n```\n"
+            "File: README.md\n```markdown\n# Readme\n```\n")
+    parsed = parse_response(text)
+    assert parsed.method == "fenced" and parsed.complete
+    assert parsed.files == {"index.html": "<html>\n</html>", "style.css": "body { color: red }", "README.md": "# Readme"}
+
+
+def test_fence_inside_a_longer_fence_is_content():
+    text = "````markdown README.md\n# Usage\n```bash\nrun\n```\n````\n"
+    parsed = parse_response(text)
+    assert parsed.files == {"README.md": "# Usage\n```bash\nrun\n```"}
+
+
+def test_unclosed_fence_is_truncated():
+    parsed = parse_response("```html index.html\n<html><body>")
+    assert parsed.truncated == "index.html" and not parsed.complete
+    assert parsed.files == {"index.html": "<html><body>"}
+
+
+def test_bare_html_document():
+    parsed = parse_response("Sure!\n<!DOCTYPE html><html><body>x</body></html>\nThanks")
+    assert parsed.method == "html"
+    assert parsed.files == {"index.html": "<!DOCTYPE html><html><body>x</body></html>"}
+
+
+def test_nothing_recognisable():
+    parsed = parse_response("I can't help with that.")
+    assert parsed.method == "none" and parsed.files == {}
+
+
+def test_join_continuation_drops_an_opening_fence():
+    assert join_continuation('{"a": "hel', '```json\nlo"}') == '{"a": "hello"}'